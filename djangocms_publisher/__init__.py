@@ -1,2 +1,4 @@
 # -*- coding: utf-8 -*-
 __version__ = '0.0.1'
+
+default_app_config = 'djangocms_publisher.apps.PublisherConfig'
@@ -4,8 +4,10 @@ from __future__ import unicode_literals
 from collections import OrderedDict
 from copy import copy
 
+from django import forms
 from django.conf.urls import url
-from django.core.exceptions import PermissionDenied
+from django.contrib.admin.utils import flatten_fieldsets
+from django.core.exceptions import PermissionDenied, ValidationError
 from django.core.urlresolvers import reverse
 from django.forms.widgets import Media
 from django.http import HttpResponseRedirect, QueryDict
@@ -13,6 +15,9 @@ from django.template.loader import render_to_string
 from django.utils.translation import ugettext as _
 
 from . import admin_views
+from .conf import get_setting
+from .exceptions import PublisherRevisionConflict
+from .models import PublisherJob
 
 
 class AdminUrls(object):
@@ -67,7 +72,73 @@ class AdminUrls(object):
         return self.get_url('delete', **kwargs)
 
 
+class PublisherRevisionFormMixin(object):
+    """
+    Adds the revision of the draft the form was rendered with as a hidden
+    field and refuses to save if the draft was saved by someone else in the
+    meantime.
+    """
+    def __init__(self, *args, **kwargs):
+        super(PublisherRevisionFormMixin, self).__init__(*args, **kwargs)
+        if self.instance.pk and self.instance.publisher.is_draft_version:
+            self.fields['publisher_expected_revision'] = forms.IntegerField(
+                widget=forms.HiddenInput,
+                required=False,
+                initial=self.instance.publisher_revision,
+            )
+
+    def clean(self):
+        cleaned_data = super(PublisherRevisionFormMixin, self).clean()
+        expected_revision = cleaned_data.get('publisher_expected_revision')
+        if expected_revision is not None:
+            try:
+                self.instance.publisher.check_revision(expected_revision)
+            except PublisherRevisionConflict:
+                raise ValidationError(
+                    _(
+                        'This draft was changed by someone else in the '
+                        'meantime. Reload the page to get the latest version.'
+                    ),
+                    code='revision_conflict',
+                )
+        return cleaned_data
+
+
+class PublisherScheduleFormMixin(object):
+    """
+    Saves the scheduling fields named in publisher_schedule_fields. They are
+    not editable on the model, so a ModelForm neither creates form fields for
+    them (PublisherAdminMixin declares them) nor sets them on the instance.
+    """
+    publisher_schedule_fields = ()
+
+    def __init__(self, *args, **kwargs):
+        super(PublisherScheduleFormMixin, self).__init__(*args, **kwargs)
+        for name in self.publisher_schedule_fields:
+            self.initial.setdefault(name, getattr(self.instance, name))
+
+    def clean(self):
+        cleaned_data = super(PublisherScheduleFormMixin, self).clean()
+        for name in self.publisher_schedule_fields:
+            if name in cleaned_data:
+                setattr(self.instance, name, cleaned_data[name])
+        return cleaned_data
+
+
+# Not editable on the model. Name them in the fieldsets (or fields) of a
+# PublisherAdminMixin admin to edit them.
+PUBLISHER_SCHEDULE_FIELDS = ('publisher_publish_at', 'publisher_unpublish_at')
+
+
 class PublisherAdminMixinBase(object):
+    # Publish in the background with a PublisherJob. None means the
+    # PUBLISHER_ADMIN_ASYNC_PUBLISH setting decides.
+    publisher_async_publish = None
+    # Refuse to save (and publish) drafts that were saved by someone else
+    # since the change form was rendered. The model needs
+    # PublisherRevisionModelMixin.
+    publisher_check_revision = False
+
     @property
     def media(self):
         return super(PublisherAdminMixinBase, self).media + Media(
@@ -78,6 +149,46 @@ class PublisherAdminMixinBase(object):
             },
         )
 
+    def get_form(self, request, obj=None, **kwargs):
+        form = kwargs.get('form', self.form)
+        if (
+            self.publisher_check_revision and
+            not issubclass(form, PublisherRevisionFormMixin)
+        ):
+            kwargs['form'] = type(
+                str('PublisherRevision{}'.format(form.__name__)),
+                (PublisherRevisionFormMixin, form),
+                {},
+            )
+        if 'fields' in kwargs:
+            fields = kwargs['fields']
+        else:
+            fields = flatten_fieldsets(self.get_fieldsets(request, obj))
+        readonly_fields = self.get_readonly_fields(request, obj)
+        schedule_fields = tuple(
+            name for name in PUBLISHER_SCHEDULE_FIELDS
+            if fields and name in fields and name not in readonly_fields
+        )
+        if schedule_fields:
+            kwargs['fields'] = [
+                name for name in fields if name not in schedule_fields
+            ]
+            form = kwargs.get('form', self.form)
+            attrs = {
+                name: self.formfield_for_dbfield(
+                    self.model._meta.get_field(name),
+                    request=request,
+                )
+                for name in schedule_fields
+            }
+            attrs['publisher_schedule_fields'] = schedule_fields
+            kwargs['form'] = type(
+                str('PublisherSchedule{}'.format(form.__name__)),
+                (PublisherScheduleFormMixin, form),
+                attrs,
+            )
+        return super(PublisherAdminMixinBase, self).get_form(request, obj=obj, **kwargs)
+
     def get_readonly_fields(self, request, obj=None):
         readonly_fields = (
             super(PublisherAdminMixinBase, self)
@@ -131,6 +242,25 @@ class PublisherAdminMixinBase(object):
     def has_publish_permission(self, request, obj):
         return self.has_change_permission(request, obj)
 
+    def publisher_get_async_publish(self, request, obj):
+        if self.publisher_async_publish is None:
+            return get_setting('ADMIN_ASYNC_PUBLISH')
+        return self.publisher_async_publish
+
+    def publisher_get_job_url(self, job, status=False, get=None):
+        opts = self.model._meta
+        url = reverse(
+            'admin:{}_{}_publisher_job{}'.format(
+                opts.app_label,
+                opts.model_name,
+                '_status' if status else '',
+            ),
+            args=(job.pk,),
+        )
+        if get:
+            url = '{}?{}'.format(url, get.urlencode())
+        return url
+
     def publisher_get_buttons(self, request, obj):
         is_enabled = self.publisher_get_is_enabled(request, obj)
 
@@ -287,20 +417,54 @@ class PublisherAdminMixinBase(object):
         happened, so clicking on "publish" on a draft will save current changes
         in the form before publishing.
         """
-        response = self.publisher_handle_actions(request, obj)
+        response = self.publisher_handle_actions(request, obj, saved=True)
         if response:
             return response
         return super(PublisherAdminMixinBase, self).response_change(request, obj)
 
-    def publisher_handle_actions(self, request, obj):
+    def publisher_get_expected_revision(self, request, obj, saved=False):
+        """
+        The revision of the draft the submitted change form was based on
+        (None without publisher_check_revision). If the form was saved by
+        this request, that save is accounted for.
+        """
+        if not obj.publisher.is_draft_version or not obj.publisher.has_revision:
+            return None
+        try:
+            expected_revision = int(request.POST['publisher_expected_revision'])
+        except (KeyError, ValueError):
+            return None
+        if saved:
+            # response_change(): the form was valid for expected_revision
+            # and saved once.
+            expected_revision += 1
+        return expected_revision
+
+    def publisher_handle_actions(self, request, obj, saved=False):
         """
         Used to handle the publisher workflow actions on response_change and
-        change_view.
+        change_view. saved is True if the form for obj was saved by this
+        request.
         """
         if request.POST and '_publish' in request.POST:
             if not self.has_publish_permission(request, obj):
                 raise PermissionDenied
-            published = obj.publisher.publish()
+            if self.publisher_get_async_publish(request, obj):
+                job = PublisherJob.objects.enqueue(
+                    obj,
+                    action='publish',
+                    user=request.user,
+                )
+                return HttpResponseRedirect(
+                    self.publisher_get_job_url(job, get=request.GET)
+                )
+            published = obj.publisher.publish(
+                expected_revision=self.publisher_get_expected_revision(
+                    request,
+                    obj,
+                    saved=saved,
+                ),
+            )
             return HttpResponseRedirect(self.publisher_get_detail_admin_url(published, get=request.GET))
         return None
 
@@ -318,6 +482,29 @@ class PublisherAdminMixinBase(object):
             name=url_name,
         )
 
+    def publisher_get_job_urlpatterns(self):
+        opts = self.model._meta
+        url_name = '{0}_{1}_publisher_job'.format(
+            opts.app_label,
+            opts.model_name,
+        )
+        return [
+            url(
+                r'^publisher-job/(?P<job_id>\d+)/$',
+                self.admin_site.admin_view(
+                    admin_views.PublisherJobProgress.as_view(admin=self)
+                ),
+                name=url_name,
+            ),
+            url(
+                r'^publisher-job/(?P<job_id>\d+)/status/$',
+                self.admin_site.admin_view(
+                    admin_views.PublisherJobStatus.as_view(admin=self)
+                ),
+                name=url_name + '_status',
+            ),
+        ]
+
     def publisher_get_urls(self):
         return [
             self.publisher_get_action_urlpattern(admin_views.RequestDeletion),
@@ -325,7 +512,7 @@ class PublisherAdminMixinBase(object):
             self.publisher_get_action_urlpattern(admin_views.CreateDraft),
             self.publisher_get_action_urlpattern(admin_views.DiscardDraft),
             self.publisher_get_action_urlpattern(admin_views.Publish),
-        ]
+        ] + self.publisher_get_job_urlpatterns()
 
     def get_urls(self):
         urlpatterns = super(PublisherAdminMixinBase, self).get_urls()
@@ -2,12 +2,17 @@
 from __future__ import unicode_literals
 
 from django.contrib.auth import get_permission_codename
-from django.core.exceptions import PermissionDenied
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ObjectDoesNotExist, PermissionDenied
 from django.http import HttpResponseRedirect, JsonResponse
+from django.shortcuts import get_object_or_404
 from django.utils.encoding import force_text
+from django.utils.functional import cached_property
 from django.utils.html import escape
 from django.utils.translation import ugettext_lazy as _
-from django.views.generic import DetailView
+from django.views.generic import DetailView, TemplateView, View
+
+from .models import PublisherJob
 
 
 class AdminViewMixin(object):
@@ -43,7 +48,10 @@ class AdminViewMixin(object):
         })
         return context
 
-    def get_success_url(self, obj, edit=True):
+    def get_success_url(self, obj, edit=True, set_edit_mode=True):
+        # With set_edit_mode the edit mode of the toolbar is switched in the
+        # session right away (only for requests that change something).
+        # Otherwise leaving the edit mode is part of the url.
         redirect = self.request.POST.get(
             'redirect',
             self.request.GET.get('redirect', 'admin')
@@ -59,7 +67,11 @@ class AdminViewMixin(object):
             except TypeError:
                 url = obj.get_absolute_url()
             get = self.request.GET.copy()
-            self.request.session['cms_edit'] = edit
+            if set_edit_mode:
+                self.request.session['cms_edit'] = edit
+            elif not edit:
+                from cms.utils.conf import get_cms_setting
+                get[get_cms_setting('CMS_TOOLBAR_URL__EDIT_OFF')] = ''
             return '{}?{}'.format(url, get.urlencode())
         return obj.publisher.admin_urls.change(get=self.request.GET)
 
@@ -69,6 +81,40 @@ class AdminViewMixin(object):
         else:
             return HttpResponseRedirect(url)
 
+    def get_job_data(self, job):
+        # url is where to go next: the progress page while the job is not
+        # done, the result afterwards.
+        data = {
+            'job': job.pk,
+            'status': job.status,
+            'error': job.error,
+            'status_url': self.admin.publisher_get_job_url(
+                job,
+                status=True,
+                get=self.request.GET,
+            ),
+            'url': self.admin.publisher_get_job_url(job, get=self.request.GET),
+        }
+        if job.status == PublisherJob.STATUS_DONE:
+            result = job.get_result()
+            if result:
+                # Also used by the status GET requests, which must not
+                # change the session.
+                data['url'] = self.get_success_url(
+                    result,
+                    edit=False,
+                    set_edit_mode=False,
+                )
+        return data
+
+    def response_job(self, job):
+        if self.request.is_ajax():
+            return JsonResponse(data=self.get_job_data(job), status=202)
+        else:
+            return HttpResponseRedirect(
+                self.admin.publisher_get_job_url(job, get=self.request.GET)
+            )
+
 
 class AdminConfirmationViewMixin(object):
     template_name = 'admin/djangocms_publisher/confirmation.html'
@@ -210,7 +256,55 @@ class Publish(AdminViewMixin, AdminConfirmationViewMixin, DetailView):
         obj = self.get_object()
         if not self.admin.has_publish_permission(request, obj):
             raise PermissionDenied
+        if self.admin.publisher_get_async_publish(request, obj):
+            job = PublisherJob.objects.enqueue(
+                obj,
+                action='publish',
+                user=request.user,
+            )
+            return self.response_job(job)
         published_obj = obj.publisher.publish()
         return self.response_redirect(
             self.get_success_url(published_obj, edit=False)
         )
+
+
+class PublisherJobMixin(AdminViewMixin):
+    @cached_property
+    def job(self):
+        return get_object_or_404(
+            PublisherJob,
+            pk=self.kwargs['job_id'],
+            content_type=ContentType.objects.get_for_model(self.admin.model),
+        )
+
+    def get_object(self):
+        # The draft is usually gone once it has been published.
+        try:
+            return self.job.get_object()
+        except ObjectDoesNotExist:
+            return self.job.get_result()
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.has_change_permission():
+            raise PermissionDenied
+        return super(PublisherJobMixin, self).dispatch(request, *args, **kwargs)
+
+
+class PublisherJobProgress(PublisherJobMixin, TemplateView):
+    template_name = 'admin/djangocms_publisher/publisher_job.html'
+
+    def get_context_data(self, **kwargs):
+        context = super(PublisherJobProgress, self).get_context_data(**kwargs)
+        context.update({
+            'title': _('Publishing'),
+            'object': self.get_object(),
+            'job': self.job,
+            'job_data': self.get_job_data(self.job),
+        })
+        return context
+
+
+class PublisherJobStatus(PublisherJobMixin, View):
+    def get(self, request, *args, **kwargs):
+        return JsonResponse(data=self.get_job_data(self.job))
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.apps import AppConfig, apps
+from django.utils.translation import ugettext_lazy as _
+
+
+class PublisherConfig(AppConfig):
+    name = 'djangocms_publisher'
+    verbose_name = _('django CMS Publisher')
+
+    def ready(self):
+        from .models import PublisherModelMixin
+        from .utils import relations
+
+        # Walking the model metadata for the relations to rewrite on every
+        # publish is expensive. Do it once for all publisher models.
+        relations.build_relations_plans(
+            model for model in apps.get_models()
+            if issubclass(model, PublisherModelMixin)
+        )
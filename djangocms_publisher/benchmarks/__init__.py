@@ -0,0 +1,3 @@
+# -*- coding: utf-8 -*-
+from .parler_workflows import *  # noqa: F401,F403
+from .workflows import *  # noqa: F401,F403
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import os
+from collections import namedtuple
+
+from django.conf import settings
+
+from djangocms_publisher.test_project.test_app.models import (
+    ExternalThing,
+    Thing,
+    ThingAttachment,
+)
+from djangocms_publisher.test_project.test_app_parler.models import ParlerThing
+from djangocms_publisher.test_project.test_app_parler.models import \
+    ThingAttachment as ParlerThingAttachment
+
+
+class Sizes(namedtuple('Sizes', ['objects', 'relations', 'languages'])):
+    """
+    The size of the generated graphs:
+     - objects: number of publisher objects (N)
+     - relations: number of reverse relations per object (M), e.g
+       attachments and external objects pointing to it
+     - languages: number of translations per parler object (L)
+    """
+    __slots__ = ()
+
+
+def get_sizes():
+    # Configurable with environment variables, e.g
+    # PUBLISHER_BENCHMARK_OBJECTS=1000 python test_settings.py
+    languages = [code for code, name in settings.LANGUAGES]
+    return Sizes(
+        objects=int(os.environ.get('PUBLISHER_BENCHMARK_OBJECTS', 10)),
+        relations=int(os.environ.get('PUBLISHER_BENCHMARK_RELATIONS', 5)),
+        languages=min(
+            int(os.environ.get('PUBLISHER_BENCHMARK_LANGUAGES', 2)),
+            len(languages),
+        ),
+    )
+
+
+def build_thing(relations, published=False, name='Thing'):
+    """
+    Creates a Thing with relations attachments (copied when publishing) and
+    relations ExternalThings pointing to it with a ForeignKey and a
+    ManyToMany (rewritten when publishing).
+    """
+    thing = Thing.objects.create(
+        name=name,
+        publisher_is_published_version=published,
+    )
+    ThingAttachment.objects.bulk_create([
+        ThingAttachment(thing=thing, name='attachment {}'.format(i))
+        for i in range(relations)
+    ])
+    ExternalThing.objects.bulk_create([
+        ExternalThing(thing=thing, name='external {}'.format(i))
+        for i in range(relations)
+    ])
+    ExternalThing.things.through.objects.bulk_create([
+        ExternalThing.things.through(externalthing_id=external.pk, thing_id=thing.pk)
+        for external in ExternalThing.objects.filter(thing=thing)
+    ])
+    return thing
+
+
+def build_thing_with_draft(relations, name='Thing'):
+    # A published Thing with a draft that has changes.
+    published = build_thing(relations, published=True, name=name)
+    draft = published.publisher.create_draft()
+    draft.name = '{} changed'.format(name)
+    draft.save()
+    return published, draft
+
+
+def build_things(sizes, published=False):
+    return [
+        build_thing(
+            sizes.relations,
+            published=published,
+            name='Thing {}'.format(i),
+        )
+        for i in range(sizes.objects)
+    ]
+
+
+def build_parler_thing(relations, languages, published=False):
+    """
+    Creates a ParlerThing with a translation in each of the first languages
+    of LANGUAGES and relations attachments.
+    """
+    thing = ParlerThing.objects.create(publisher_is_published_version=published)
+    for code, name in settings.LANGUAGES[:languages]:
+        thing.translations.create(
+            language_code=code,
+            name='{} translation'.format(code),
+        )
+    ParlerThingAttachment.objects.bulk_create([
+        ParlerThingAttachment(thing=thing, name='attachment {}'.format(i))
+        for i in range(relations)
+    ])
+    return thing
+
+
+def build_parler_thing_with_draft(relations, languages):
+    # A published ParlerThing with a draft of its 'en' translation.
+    published = build_parler_thing(relations, languages, published=True)
+    published.set_current_language('en')
+    draft = published.publisher.create_draft()
+    draft.name = 'en translation changed'
+    draft.save()
+    return published, draft
+
+
+def build_parler_things(sizes, published=False):
+    return [
+        build_parler_thing(
+            sizes.relations,
+            languages=sizes.languages,
+            published=published,
+        )
+        for i in range(sizes.objects)
+    ]
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import sys
+from collections import namedtuple
+from contextlib import contextmanager
+from timeit import default_timer
+
+from django.db import connection
+from django.db.models.sql.constants import GET_ITERATOR_CHUNK_SIZE
+from django.test.testcases import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .graphs import get_sizes
+
+# The operations run in a transaction inside the transaction of the test:
+# SAVEPOINT and RELEASE SAVEPOINT.
+ATOMIC = 2
+
+
+def batches(count, size=GET_ITERATOR_CHUNK_SIZE):
+    # Number of queries to handle count rows in batches of size, e.g the
+    # DELETEs of the deletion Collector.
+    return -(-count // size)
+
+
+class Result(namedtuple('Result', ['operation', 'duration', 'queries', 'budget'])):
+    __slots__ = ()
+
+
+class BenchmarkTestCase(TestCase):
+    """
+    Measures publisher operations on generated graphs (see graphs.py).
+    Every measured operation has a query budget (that depends on the sizes).
+    The test fails if the operation makes more queries than that.
+    The timings are written to stderr after the tests of the class ran.
+    """
+    @classmethod
+    def setUpClass(cls):
+        super(BenchmarkTestCase, cls).setUpClass()
+        cls.sizes = get_sizes()
+        cls.results = []
+
+    @classmethod
+    def tearDownClass(cls):
+        sys.stderr.write('\n{} {}\n'.format(cls.__name__, tuple(cls.sizes)))
+        for result in cls.results:
+            sys.stderr.write(
+                '  {:<40} {:>9.2f}ms {:>6} queries (budget {})\n'.format(
+                    result.operation,
+                    result.duration * 1000,
+                    result.queries,
+                    result.budget,
+                )
+            )
+        super(BenchmarkTestCase, cls).tearDownClass()
+
+    def copy_relations(self, replace=False):
+        """
+        Queries of publisher_copy_relations() of the test apps: reading the
+        3 ManyToManyFields from the old and the new object (to set them),
+        finding the attachments of the new object (with replace, there are
+        some and they are deleted: the ManyToMany rows and the attachments),
+        reading the attachments of the old object and saving a copy of each.
+        """
+        relations = self.sizes.relations
+        return (
+            3 * 2 +
+            1 + (2 if replace and relations else 0) +
+            1 + relations
+        )
+
+    @contextmanager
+    def measure(self, operation, budget):
+        with CaptureQueriesContext(connection) as queries:
+            started = default_timer()
+            yield
+            duration = default_timer() - started
+        self.results.append(Result(
+            operation=operation,
+            duration=duration,
+            queries=len(queries),
+            budget=budget,
+        ))
+        if len(queries) > budget:
+            self.fail(
+                '{} made {} queries, the budget is {}:\n{}'.format(
+                    operation,
+                    len(queries),
+                    budget,
+                    '\n'.join(query['sql'] for query in queries),
+                )
+            )
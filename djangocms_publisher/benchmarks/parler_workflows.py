@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+from djangocms_publisher.test_project.test_app_parler.models import ParlerThing
+from djangocms_publisher.utils.copying import refresh_from_db
+
+from .graphs import (
+    build_parler_thing,
+    build_parler_thing_with_draft,
+    build_parler_things,
+)
+from .helpers import ATOMIC, BenchmarkTestCase
+
+# Queries of the operations on the test app's ParlerThing, see the budgets
+# below.
+# lock(): SELECT ... FOR UPDATE of the draft/published master pair.
+LOCK = 1
+# update_relations(): one UPDATE per relation pointing to ParlerThing (the
+# ManyToManyFields to self in both directions, ThingAttachment and
+# publisher_published_version).
+REWRITE = 9
+# The translations are saved with update_or_create(): SELECT and INSERT
+# (or UPDATE) in its own transaction and a savepoint around the write.
+SAVE_TRANSLATION = 2 * ATOMIC + 2
+
+
+class ParlerPublisherBenchmarks(BenchmarkTestCase):
+    # The budgets are derived from the sizes (see graphs.Sizes): each
+    # ParlerThing has M attachments and L translations.
+
+    def test_publish(self):
+        draft = build_parler_thing(
+            self.sizes.relations,
+            languages=self.sizes.languages,
+        )
+        draft.set_current_language('en')
+        budget = (
+            ATOMIC +
+            # Publishing the master, without deleting the draft master and
+            # without rewriting relations.
+            ATOMIC +
+            LOCK +
+            1 +  # INSERT of the published master
+            self.copy_relations() +
+            1 +  # UPDATE of publisher_published_version of the draft master
+            1 +  # SELECT of the published master
+            SAVE_TRANSLATION +
+            1 +  # DELETE of the draft translation
+            1 +  # SELECT whether the draft master has translations left
+            1  # SELECT of the published master of the returned translation
+        )
+        if self.sizes.languages == 1:
+            # The draft master goes away with its last translation, with
+            # the deletion Collector: SELECT of its translations, drafts and
+            # attachments, DELETE of the ManyToMany rows, translations and
+            # the master (and of the attachments).
+            budget += 3 + 7
+            if self.sizes.relations:
+                budget += 2
+        with self.measure('publish (translation)', budget=budget):
+            draft.publisher.publish()
+
+    def test_create_draft(self):
+        published = build_parler_thing(
+            self.sizes.relations,
+            languages=self.sizes.languages,
+            published=True,
+        )
+        published = refresh_from_db(published)
+        published.set_current_language('en')
+        budget = (
+            ATOMIC +
+            1 +  # SELECT of an existing draft translation
+            ATOMIC +
+            1 +  # SELECT of an existing draft translation (again)
+            1 +  # SELECT of an existing draft master
+            # create_draft() of the master
+            ATOMIC +
+            LOCK +
+            1 +  # SELECT of an existing draft master (after locking)
+            1 +  # SELECT of the published master to copy
+            1 +  # INSERT of the draft master
+            self.copy_relations() +
+            1 +  # SELECT of the returned draft master
+            SAVE_TRANSLATION
+        )
+        with self.measure('create_draft (translation)', budget=budget):
+            published.publisher.create_draft()
+
+    def test_discard_draft(self):
+        published, draft = build_parler_thing_with_draft(
+            self.sizes.relations,
+            languages=self.sizes.languages,
+        )
+        draft = refresh_from_db(draft)
+        draft.set_current_language('en')
+        budget = (
+            ATOMIC +
+            ATOMIC +
+            1 +  # SELECT of the draft translation
+            1 +  # DELETE of the draft translation
+            1 +  # SELECT whether the draft master has translations left
+            # discard_draft() of the draft master, which only had the 'en'
+            # translation.
+            ATOMIC +
+            1 +  # SELECT of the published master
+            REWRITE +
+            1 +  # EXISTS of rows referencing the draft master
+            1  # DELETE of the draft master
+        )
+        with self.measure('discard_draft (translation)', budget=budget):
+            draft.publisher.discard_draft()
+
+    def test_request_deletion(self):
+        published, draft = build_parler_thing_with_draft(
+            self.sizes.relations,
+            languages=self.sizes.languages,
+        )
+        published = refresh_from_db(published)
+        published.set_current_language('en')
+        budget = (
+            ATOMIC +
+            ATOMIC +
+            1 +  # SELECT of the published translation
+            1 +  # UPDATE of publisher_deletion_requested
+            # discard_draft() of the draft translation
+            ATOMIC +
+            1 +  # SELECT of the draft translation
+            1 +  # DELETE of the draft translation
+            1  # SELECT of the published master of the returned translation
+        )
+        with self.measure('request_deletion (translation)', budget=budget):
+            published.publisher.request_deletion()
+
+    def test_queryset_publish(self):
+        build_parler_things(self.sizes)
+        # The masters and translations are copied in bulk, the test app
+        # copies the attachments one by one.
+        objects = self.sizes.objects
+        budget = (
+            ATOMIC +
+            1 +  # SELECT of the drafts with translations
+            2 +  # validation: SELECT of the drafts and their translations
+            # Publishing the masters through the bulk path.
+            1 +  # SELECT of the pks of the drafts
+            LOCK +
+            1 +  # SELECT of the locked drafts
+            objects * (
+                1 +  # INSERT of the published master
+                self.copy_relations()
+            ) +
+            REWRITE +  # for all drafts at once
+            1 +  # UPDATE of publisher_published_version of the drafts
+            # Publishing the translations.
+            2 +  # SELECT of the draft and the published masters
+            2 +  # SELECT of the draft and the published translations
+            objects * self.sizes.languages +  # INSERT of the translations
+            1 +  # DELETE of the draft translations
+            1 +  # EXISTS of rows referencing the draft masters
+            1  # DELETE of the draft masters
+        )
+        with self.measure('publisher_publish', budget=budget):
+            ParlerThing.objects.publisher_drafts().publisher_publish()
+
+    def test_queryset_prefetch_counterparts(self):
+        build_parler_things(self.sizes, published=True)
+        # SELECT of the objects and of all their counterparts.
+        with self.measure('publisher_prefetch_counterparts', budget=2):
+            for obj in ParlerThing.objects.publisher_prefetch_counterparts():
+                obj.publisher.has_pending_changes
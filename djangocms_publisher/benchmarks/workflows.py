@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+from djangocms_publisher.test_project.test_app.models import Thing
+
+from .graphs import build_thing, build_thing_with_draft, build_things
+from .helpers import ATOMIC, BenchmarkTestCase, batches
+
+# Queries of the operations on the test app's Thing, see the budgets below.
+# lock(): SELECT ... FOR UPDATE of the draft/published pair.
+LOCK = 1
+# get_fingerprint(): the attachments and the 3 ManyToManyFields.
+FINGERPRINT = 4
+# update_relations(): one UPDATE per relation pointing to Thing (the
+# ManyToManyFields to self in both directions, ThingAttachment,
+# publisher_published_version, ExternalThing and its through table).
+REWRITE = 11
+
+
+class PublisherBenchmarks(BenchmarkTestCase):
+    # The budgets are derived from the sizes (see graphs.Sizes): each Thing
+    # has M attachments, M ExternalThings pointing to it with a ForeignKey
+    # and M with a ManyToManyField.
+
+    def delete_drafts(self, objects=1, bulk=False):
+        if not self.sizes.relations:
+            # Nothing references the drafts (EXISTS), a single DELETE.
+            return 2
+        # The attachments keep the drafts referenced, the deletion Collector
+        # deletes them together with the drafts. Its DELETEs of the drafts
+        # and of the attachments run in batches.
+        return (
+            1 +  # EXISTS of rows referencing the drafts
+            (1 if bulk else 0) +  # SELECT of the drafts to collect
+            3 +  # SELECT of drafts, attachments and ExternalThings pointing to them
+            7 +  # DELETE of the ManyToMany rows
+            batches(objects) +
+            batches(objects * self.sizes.relations)
+        )
+
+    def test_publish(self):
+        draft = build_thing(self.sizes.relations)
+        budget = (
+            ATOMIC +
+            LOCK +
+            FINGERPRINT +
+            1 +  # INSERT of the published version
+            self.copy_relations() +
+            # Publisher.update_relations() and the generic rewrite of
+            # publish_draft() both run.
+            2 * REWRITE +
+            self.delete_drafts() +
+            1  # SELECT of the returned published version
+        )
+        with self.measure('publish (new)', budget=budget):
+            published = draft.publisher.publish()
+        draft = published.publisher.create_draft()
+        draft.name = 'Thing changed'
+        draft.save()
+        budget = (
+            ATOMIC +
+            LOCK +
+            1 +  # SELECT of the published version
+            FINGERPRINT +
+            1 +  # UPDATE of the published version
+            self.copy_relations(replace=True) +
+            2 * REWRITE +
+            self.delete_drafts() +
+            1  # SELECT of the returned published version
+        )
+        with self.measure('publish (changes)', budget=budget):
+            draft.publisher.publish()
+
+    def test_create_draft(self):
+        published = build_thing(self.sizes.relations, published=True)
+        budget = (
+            ATOMIC +
+            LOCK +
+            1 +  # SELECT of an existing draft
+            1 +  # SELECT of the published version to copy
+            1 +  # INSERT of the draft
+            self.copy_relations() +
+            1  # SELECT of the returned draft
+        )
+        with self.measure('create_draft', budget=budget):
+            published.publisher.create_draft()
+
+    def test_discard_draft(self):
+        published, draft = build_thing_with_draft(self.sizes.relations)
+        budget = (
+            ATOMIC +
+            1 +  # SELECT of the published version
+            REWRITE +
+            self.delete_drafts()
+        )
+        with self.measure('discard_draft', budget=budget):
+            draft.publisher.discard_draft()
+
+    def test_request_deletion(self):
+        published, draft = build_thing_with_draft(self.sizes.relations)
+        budget = (
+            ATOMIC +
+            1 +  # SELECT of the draft
+            1 +  # UPDATE of publisher_deletion_requested
+            # discard_draft() of the draft
+            ATOMIC +
+            REWRITE +
+            self.delete_drafts()
+        )
+        with self.measure('request_deletion', budget=budget):
+            published.publisher.request_deletion()
+
+    def test_queryset_publish(self):
+        build_things(self.sizes)
+        objects = self.sizes.objects
+        budget = (
+            ATOMIC +
+            1 +  # SELECT of the pks of the drafts
+            LOCK +
+            1 +  # SELECT of the locked drafts
+            objects * (
+                FINGERPRINT +
+                1 +  # INSERT of the published version
+                self.copy_relations()
+            ) +
+            REWRITE +  # for all drafts at once
+            self.delete_drafts(objects, bulk=True)
+        )
+        with self.measure('publisher_publish', budget=budget):
+            Thing.objects.publisher_drafts().publisher_publish()
+
+    def test_queryset_unpublish(self):
+        build_things(self.sizes, published=True)
+        budget = (
+            ATOMIC +
+            1 +  # SELECT of the published versions
+            1 +  # SELECT of their drafts (prefetched)
+            self.sizes.objects * (
+                1 +  # UPDATE turning the published version into the draft
+                1  # SELECT of the returned draft
+            )
+        )
+        with self.measure('publisher_unpublish', budget=budget):
+            Thing.objects.publisher_unpublish()
+
+    def test_queryset_prefetch_counterparts(self):
+        for i in range(self.sizes.objects):
+            build_thing_with_draft(self.sizes.relations)
+        # SELECT of the objects and of all their counterparts.
+        with self.measure('publisher_prefetch_counterparts', budget=2):
+            for obj in Thing.objects.publisher_prefetch_counterparts():
+                obj.publisher.has_pending_changes
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+
+DEFAULTS = {
+    # Number of objects the publisher_worker claims and processes per
+    # transaction.
+    'WORKER_BATCH_SIZE': 100,
+    # Number of threads of the publisher_worker.
+    'WORKER_CONCURRENCY': 1,
+    # Publish in the background (with a PublisherJob run by the
+    # publisher_worker) from the admin. Can also be set per admin with
+    # PublisherAdminMixin.publisher_async_publish.
+    'ADMIN_ASYNC_PUBLISH': False,
+    # Seconds after which a PublisherJob that is still running (e.g. because
+    # its worker died) is claimed and run again. Must be longer than the
+    # longest job. The same goes for purges of soft deleted objects.
+    'JOB_TIMEOUT': 60 * 60,
+    # Fail right away (DatabaseError) instead of waiting when the rows of an
+    # object are locked by a concurrent publisher operation.
+    'LOCK_NOWAIT': False,
+    # Seconds to wait for such a lock (PostgreSQL and MySQL). None uses the
+    # database default.
+    'LOCK_TIMEOUT': None,
+    # Record the time and the number of queries of each phase of publishing
+    # in djangocms_publisher.instrumentation.aggregator.
+    'INSTRUMENTATION': False,
+    # Dotted paths to instrumentation.Collector subclasses that receive the
+    # same records.
+    'COLLECTORS': (),
+    # Number of rows the publisher_worker deletes per transaction when it
+    # purges soft deleted objects (see publisher_soft_delete).
+    'PURGE_CHUNK_SIZE': 1000,
+    # Aliases of replicas of the default database. routers.PublisherReplicaRouter
+    # reads published content from them.
+    'REPLICA_DATABASES': (),
+    # Passed to asgiref's sync_to_async() by the async API (apublish(), ...).
+    # True (like Django) runs them all in the same thread, one after the
+    # other. False runs every operation in a thread of its own, the
+    # connections opened in those threads are not closed by the publisher.
+    'ASYNC_THREAD_SENSITIVE': True,
+}
+
+
+def get_setting(name):
+    # Read on every call (not on import), so override_settings works.
+    return getattr(settings, 'PUBLISHER_{}'.format(name), DEFAULTS[name])
@@ -2,17 +2,187 @@
 from __future__ import unicode_literals
 
 from django.db import models
+from django.utils import timezone
 from django.utils.functional import cached_property
-from parler.models import TranslatedFields
+from parler.models import TranslatedFields, TranslatedFieldsModel
 
 from cms.utils.i18n import get_current_language
 
-from ...models import PublisherModelMixin
+from ... import identity, instrumentation, signals
+from ...models import PublisherModelMixin, PublisherQuerySetMixin
+from ...utils import bulk, relations
+from ...utils.copying import get_copy_plan, get_fields_to_copy
 from .publisher.master import ParlerMasterPublisher
 from .publisher.translation import ParlerTranslationPublisher
 from .publisher.translation_aware import ParlerPublisher
 
 
+class ParlerPublisherQuerySetMixin(PublisherQuerySetMixin):
+    def _publisher_counterparts_queryset(self):
+        # The translations of the counterparts are needed to resolve the
+        # state of the translations.
+        return (
+            super(ParlerPublisherQuerySetMixin, self)
+            ._publisher_counterparts_queryset()
+            .prefetch_related('translations')
+        )
+
+    def _publisher_publish(self, validate, delete, update_relations, now):
+        # The masters are published through the bulk path of
+        # PublisherQuerySetMixin (without deleting the drafts), then all
+        # their draft translations are copied over in bulk. Only drafts with
+        # translations are published, like in the language aware publisher.
+        model = self.model
+        using = self.db
+        now = now or timezone.now()
+        translations_model = model._parler_meta.root_model
+        master_pks = set(
+            translations_model.objects
+            .using(using)
+            .filter(master__in=self.publisher_drafts())
+            .values_list('master_id', flat=True)
+        )
+        if not master_pks:
+            return model.objects.using(using).none()
+        drafts = self.filter(pk__in=master_pks)
+        if validate:
+            with instrumentation.phase(
+                'validate',
+                model=model,
+                operation='publisher_publish',
+                using=using,
+            ):
+                for draft in drafts.prefetch_related('translations'):
+                    for translation in draft.translations.all():
+                        draft.set_current_language(translation.language_code)
+                        draft.publisher_can_publish()
+        published = super(ParlerPublisherQuerySetMixin, drafts)._publisher_publish(
+            validate=False,
+            delete=False,
+            update_relations=update_relations,
+            now=now,
+        )
+        # Locked by the master publish.
+        draft_masters = model._base_manager.using(using).in_bulk(master_pks)
+        published_masters = {obj.pk: obj for obj in published}
+        published_by_draft = {
+            pk: draft.publisher_published_version_id
+            for pk, draft in draft_masters.items()
+        }
+        draft_translations = list(
+            translations_model.objects
+            .using(using)
+            .filter(master_id__in=master_pks)
+            .order_by('master_id', 'language_code')
+        )
+        existing = {
+            (translation.master_id, translation.language_code): translation
+            for translation in (
+                translations_model.objects
+                .using(using)
+                .filter(master_id__in=published_by_draft.values())
+            )
+        }
+        started = signals.send_pre(
+            signals.pre_publish,
+            sender=translations_model,
+            pairs=[
+                (
+                    translation,
+                    existing.get((
+                        published_by_draft[translation.master_id],
+                        translation.language_code,
+                    )),
+                )
+                for translation in draft_translations
+            ],
+            bulk=True,
+        )
+        pairs = []
+        to_create = []
+        to_update = []
+        exclude_fields = {'master', 'language_code'}
+        for translation in draft_translations:
+            published_pk = published_by_draft[translation.master_id]
+            published_translation = existing.get(
+                (published_pk, translation.language_code),
+            )
+            if published_translation is None:
+                published_translation = translations_model(
+                    master_id=published_pk,
+                    language_code=translation.language_code,
+                )
+                to_create.append(published_translation)
+            else:
+                to_update.append(published_translation)
+            fields_to_copy = get_fields_to_copy(
+                translation,
+                exclude_fields=exclude_fields,
+                by_attname=True,
+            )
+            fields_to_copy['publisher_translation_published_at'] = now
+            for name, value in fields_to_copy.items():
+                setattr(published_translation, name, value)
+            pairs.append((translation, published_translation))
+        with instrumentation.phase(
+            'copy_object',
+            model=translations_model,
+            operation='publisher_publish',
+            using=using,
+        ):
+            bulk.bulk_create(translations_model, to_create, using=using)
+            bulk.bulk_update(
+                translations_model,
+                to_update,
+                [
+                    field.name
+                    for field in get_copy_plan(translations_model, exclude_fields)
+                ] + ['publisher_translation_published_at'],
+                using=using,
+            )
+        with instrumentation.phase(
+            'copy_relations',
+            model=translations_model,
+            operation='publisher_publish',
+            using=using,
+        ):
+            for translation, published_translation in pairs:
+                translation.master = draft_masters[translation.master_id]
+                published_translation.master = (
+                    published_masters[published_translation.master_id]
+                )
+                published_translation.publisher.copy_relations(
+                    old_obj=translation,
+                )
+        if delete:
+            with instrumentation.phase(
+                'delete',
+                model=model,
+                operation='publisher_publish',
+                using=using,
+            ):
+                translations_model._base_manager.using(using).filter(
+                    pk__in=[translation.pk for translation in draft_translations],
+                ).delete()
+                # All draft translations of the masters were published.
+                if not relations.fast_delete(model, list(master_pks), using=using):
+                    model._base_manager.using(using).filter(pk__in=master_pks).delete()
+        signals.send_post(
+            signals.post_publish,
+            sender=translations_model,
+            pairs=pairs,
+            started=started,
+            using=using,
+            bulk=True,
+        )
+        return published
+
+    def _publisher_get_publisher(self, obj):
+        # The masters are published (without their translations) and
+        # unpublished (all languages at once) as a whole.
+        return obj.master_publisher
+
+
 class ParlerPublisherModelMixin(PublisherModelMixin):
 
     class Meta:
@@ -61,6 +231,17 @@ class ParlerPublisherModelMixin(PublisherModelMixin):
         return ''
 
 
+def _save_translation(self, *args, **kwargs):
+    TranslatedFieldsModel.save(self, *args, **kwargs)
+    identity.invalidate()
+
+
+def _delete_translation(self, *args, **kwargs):
+    result = TranslatedFieldsModel.delete(self, *args, **kwargs)
+    identity.invalidate()
+    return result
+
+
 class ParlerPublisherTranslatedFields(TranslatedFields):
     def __init__(self, meta=None, **fields):
         fields['publisher_translation_published_at'] = models.DateTimeField(
@@ -75,6 +256,10 @@ class ParlerPublisherTranslatedFields(TranslatedFields):
             db_index=True,
         )
 
+        # Saving or deleting a translation changes which counterparts exist
+        # (see identity.invalidate()).
+        fields['save'] = _save_translation
+        fields['delete'] = _delete_translation
         fields['publisher'] = cached_property(
             lambda self: ParlerTranslationPublisher(
                 instance=self,
@@ -1,14 +1,17 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
-from django.db import transaction
 from django.utils import timezone
 from django.utils.functional import cached_property
 
+from .... import identity, instrumentation, signals
 from ....models import Publisher
-from ....publisher import PUBLISHER_STATE_CHOICES
+from ....publisher import PublisherState, atomic_operation, has_soft_delete
+from ....utils.compat import get_cached_value
 from ....utils.copying import get_fields_to_copy, refresh_from_db
 
+NOT_CACHED = object()
+
 
 class ParlerTranslationPublisher(Publisher):
     """
@@ -24,100 +27,195 @@ class ParlerTranslationPublisher(Publisher):
         return not self.is_published_version
 
     @property
-    def has_published_version(self):
-        if self.is_published_version:
-            return True
-        return bool(self.get_published_version())
+    def is_deleted(self):
+        return self.instance.master.master_publisher.is_deleted
 
-    @property
-    def has_pending_changes(self):
-        return bool(self.get_draft_version())
+    def get_snapshot(self):
+        # Only one of these queries: the other version is the instance itself.
+        if self.is_deleted:
+            return PublisherState(
+                has_published_version=False,
+                has_pending_changes=False,
+                has_pending_deletion_request=False,
+            )
+        published = self.get_published_version()
+        draft = self.get_draft_version()
+        return PublisherState(
+            has_published_version=bool(published),
+            has_pending_changes=bool(draft),
+            has_pending_deletion_request=bool(
+                published and
+                published.publisher_translation_deletion_requested
+            ),
+        )
 
-    @property
-    def has_pending_deletion_request(self):
-        published_translation = self.get_published_version()
-        if (
-            published_translation and
-            published_translation.publisher_translation_deletion_requested
-        ):
-            return True
-        return False
+    def reset_snapshot(self):
+        self.__dict__.pop('snapshot', None)
+        self.__dict__.pop('_counterpart', None)
 
-    def get_draft_version(self):
-        if self.is_draft_version:
-            return self.instance
-        draft_master = self.instance.master.master_publisher.get_draft_version()
-        if not draft_master:
+    @cached_property
+    def _counterpart(self):
+        # The translation in the same language on the other version of the
+        # master. One query, with the master joined in (or none if it is in
+        # the identity map). Loading self.instance.master costs one more
+        # query unless it is cached, e.g. for translations loaded through
+        # master.translations or selected with select_related('master').
+        master = self.instance.master
+        if self.is_published_version:
+            field = master._meta.get_field('publisher_draft_version')
+        else:
+            field = master._meta.get_field('publisher_published_version')
+        counterpart_master = get_cached_value(master, field, default=NOT_CACHED)
+        if counterpart_master is None:
             return None
-        return (
-            draft_master
-            .translations
+        elif counterpart_master is not NOT_CACHED:
+            prefetched = getattr(counterpart_master, '_prefetched_objects_cache', {})
+            if 'translations' in prefetched:
+                # publisher_prefetch_counterparts() was used.
+                for translation in prefetched['translations']:
+                    if translation.language_code == self.instance.language_code:
+                        return translation
+                return None
+        queryset = (
+            self.instance._meta.model.objects
             .filter(language_code=self.instance.language_code)
-            .first()
+            .select_related('master')
+        )
+        if self.is_published_version:
+            queryset = queryset.filter(
+                master__publisher_published_version=master.pk,
+            )
+            key = identity.get_key(master._meta.model, master.pk, 'draft')
+        elif master.publisher_published_version_id:
+            queryset = queryset.filter(
+                master_id=master.publisher_published_version_id,
+            )
+            if has_soft_delete(master._meta.model):
+                queryset = queryset.filter(
+                    master__publisher_deleted_at__isnull=True,
+                )
+            key = identity.get_key(
+                master._meta.model,
+                master.publisher_published_version_id,
+            )
+        else:
+            return None
+        return identity.lookup(
+            key + ('translation', self.instance.language_code),
+            queryset.first,
         )
 
+    def get_draft_version(self):
+        if self.is_draft_version:
+            return self.instance
+        return self._counterpart
+
     def get_published_version(self):
         if self.is_published_version:
             return self.instance
-        if not self.instance.master.publisher_published_version_id:
-            return None
-        # FIXME: make more efficient. Use parler caches?
-        return (
-            self
-            .instance
-            .master
-            .publisher_published_version
-            .translations
-            .filter(language_code=self.instance.language_code)
-            .first()
-        )
+        return self._counterpart
 
-    def publish(self, validate=True, delete=True, update_relations=True, now=None):
+    def publish(
+        self,
+        validate=True,
+        delete=True,
+        update_relations=True,
+        now=None,
+        in_database=None,
+        expected_revision=None,
+        using=None,
+    ):
         now = now or timezone.now()
         draft_translation = self.get_draft_version()
         if draft_translation != self.instance:
-            return draft_translation.publisher.publish()
+            return draft_translation.publisher.publish(using=using)
         draft_master = self.instance.master
+        model = draft_translation._meta.model
+        published_translation = self.get_published_version()
+        started = signals.send_pre(
+            signals.pre_publish,
+            sender=model,
+            pairs=[(draft_translation, published_translation)],
+        )
 
         # Ensure we have a published master for this translation
         published_master = draft_master.master_publisher.publish(
             delete=False,
             update_relations=False,
+            in_database=in_database,
+            expected_revision=expected_revision,
+            using=using,
         )
         # Publish the translation
         fields_to_copy = get_fields_to_copy(
             draft_translation,
             exclude_fields={'master', 'language_code'},
+            by_attname=True,
         )
         fields_to_copy['publisher_translation_published_at'] = now
-        published_translation, translation_created = (
-            published_master
-            .translations
-            .update_or_create(
-                language_code=draft_translation.language_code,
-                defaults=fields_to_copy,
+        with instrumentation.phase(
+            'copy_object',
+            model=model,
+            operation='publish_translation',
+            using=using,
+        ):
+            published_translation, translation_created = (
+                published_master
+                .translations
+                .update_or_create(
+                    language_code=draft_translation.language_code,
+                    defaults=fields_to_copy,
+                )
             )
-        )
 
-        published_translation.publisher.copy_relations(
-            old_obj=draft_translation,
-        )
+        with instrumentation.phase(
+            'copy_relations',
+            model=model,
+            operation='publish_translation',
+            using=using,
+        ):
+            published_translation.publisher.copy_relations(
+                old_obj=draft_translation,
+            )
         if delete:
             # Delete the draft translation
-            draft_translation.delete()
+            with instrumentation.phase(
+                'delete',
+                model=model,
+                operation='publish_translation',
+                using=using,
+            ):
+                draft_translation.delete(using=using)
+        self.reset_snapshot()
+        signals.send_post(
+            signals.post_publish,
+            sender=model,
+            pairs=[(draft_translation, published_translation)],
+            started=started,
+            using=using,
+        )
         return published_translation
 
-    @transaction.atomic
-    def create_draft(self):
+    @atomic_operation
+    def create_draft(self, using=None):
         assert self.is_published_version
+        model = self.instance._meta.model
+        started = signals.send_pre(
+            signals.pre_create_draft,
+            sender=model,
+            pairs=[(None, self.instance)],
+        )
         if self.has_pending_deletion_request:
-            self.discard_deletion_request()
+            self.discard_deletion_request(using=using)
         published_master = self.instance.master
         published_translation = self.instance
-        draft_master, draft_master_created = published_master.master_publisher.get_or_create_draft()
+        draft_master, draft_master_created = (
+            published_master.master_publisher.get_or_create_draft(using=using)
+        )
         fields_to_copy = get_fields_to_copy(
             published_translation,
             exclude_fields={'master', 'language_code'},
+            by_attname=True,
         )
         draft_translation, draft_translation_created = (
             draft_master
@@ -130,6 +228,14 @@ class ParlerTranslationPublisher(Publisher):
         draft_translation.publisher.copy_relations(
             old_obj=published_translation,
         )
+        self.reset_snapshot()
+        signals.send_post(
+            signals.post_create_draft,
+            sender=model,
+            pairs=[(draft_translation, published_translation)],
+            started=started,
+            using=using,
+        )
         return draft_translation
 
     def copy_relations(self, old_obj):
@@ -140,76 +246,75 @@ class ParlerTranslationPublisher(Publisher):
         old_master_obj.set_current_language(language_code)
         new_master_obj.publisher_copy_relations_for_translation(old_obj=old_master_obj)
 
-    def get_or_create_draft(self):
+    def get_or_create_draft(self, using=None):
         draft = self.get_draft_version()
         if draft:
             return draft, False
-        return self.create_draft(), True
+        return self.create_draft(using=using), True
 
-    @transaction.atomic
-    def publish_deletion(self):
+    @atomic_operation
+    def publish_deletion(self, using=None):
         assert self.instance.publisher_translation_deletion_requested
-        self.instance.delete()
+        model = self.instance._meta.model
+        started = signals.send_pre(
+            signals.pre_publish_deletion,
+            sender=model,
+            pairs=[(None, self.instance)],
+        )
+        self.instance.delete(using=using)
+        self.reset_snapshot()
+        signals.send_post(
+            signals.post_publish_deletion,
+            sender=model,
+            pairs=[(None, self.instance)],
+            started=started,
+            using=using,
+        )
 
-    @transaction.atomic
-    def request_deletion(self):
+    @atomic_operation
+    def request_deletion(self, using=None):
         published = self.get_published_version()
         if self.instance != published:
-            return published.publisher.request_deletion()
+            return published.publisher.request_deletion(using=using)
+        draft = published.publisher.get_draft_version()
+        model = published._meta.model
+        started = signals.send_pre(
+            signals.pre_request_deletion,
+            sender=model,
+            pairs=[(draft, published)],
+        )
         published.publisher_translation_deletion_requested = True
         published.save(
             update_fields=['publisher_translation_deletion_requested'],
+            using=using,
         )
-        draft = published.publisher.get_draft_version()
         if draft:
-            draft.publisher.discard_draft()
+            draft.publisher.discard_draft(using=using)
+        self.reset_snapshot()
+        signals.send_post(
+            signals.post_request_deletion,
+            sender=model,
+            pairs=[(draft, published)],
+            started=started,
+            using=using,
+        )
 
     def update_relations_exclude(self, old_obj):
         return ()
 
-    @transaction.atomic
-    def discard_deletion_request(self):
+    @atomic_operation
+    def discard_deletion_request(self, using=None):
         self.instance.publisher_translation_deletion_requested = False
         self.instance.save(
             update_fields=['publisher_translation_deletion_requested'],
+            using=using,
         )
+        self.reset_snapshot()
 
     @property
     def state(self):
-        choices = dict(PUBLISHER_STATE_CHOICES)
-        published = self.get_published_version()
-        draft = self.get_draft_version()
-        is_published = bool(published)
-        has_pending_changes = bool(draft)
-        has_pending_deletion_request = published and published.publisher.has_pending_deletion_request
-        if published:
-            language_code = published.language_code
-        else:
-            language_code = draft.language_code
-        state_dict = {
-            'is_published': is_published,
-            'has_pending_changes': has_pending_changes,
-            'has_pending_deletion_request': has_pending_deletion_request,
-            'language_code': language_code,
-        }
-        if has_pending_deletion_request:
-            state_id = 'pending_deletion'
-            css_class = 'pending_deletion'
-        elif is_published and has_pending_changes:
-            state_id = 'pending_changes'
-            css_class = 'dirty'
-        elif is_published and not has_pending_changes:
-            state_id = 'published'
-            css_class = 'published'
-        elif not is_published and has_pending_changes:
-            state_id = 'not_published'
-            css_class = 'unpublished'
-        else:
-            state_id = 'empty'
-            css_class = 'empty'
-        state_dict['identifier'] = state_id
-        state_dict['css_class'] = css_class
-        state_dict['text'] = choices[state_id]
+        state_dict = super(ParlerTranslationPublisher, self).state
+        state_dict['language_code'] = self.instance.language_code
         return state_dict
 
     def user_can_publish(self, user):
@@ -217,6 +322,8 @@ class ParlerTranslationPublisher(Publisher):
 
     def available_actions(self, user):
         actions = {}
+        if self.is_deleted:
+            return actions
         if self.has_pending_deletion_request:
             actions['discard_requested_deletion'] = {}
             actions['publish_deletion'] = {}
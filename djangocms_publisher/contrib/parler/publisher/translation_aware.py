@@ -5,12 +5,13 @@ from collections import OrderedDict
 
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
-from django.db import transaction
 from django.utils import timezone
 from django.utils.functional import cached_property
 from django.utils.translation import ugettext_lazy as _
 
+from .... import instrumentation
 from ....models import Publisher
+from ....publisher import atomic_operation
 from ....utils.copying import refresh_from_db
 
 
@@ -55,19 +56,29 @@ class ParlerPublisher(Publisher):
         return self.instance.get_translation(self.language_code)
 
     @property
-    def has_published_version(self):
-        return self.get_translation().publisher.has_published_version
+    def snapshot(self):
+        # The state depends on the current language, so it is taken from
+        # (and memoized on) the publisher of the translation.
+        return self.get_translation().publisher.snapshot
 
-    @property
-    def has_pending_changes(self):
-        return self.get_translation().publisher.has_pending_changes
-
-    @property
-    def has_pending_deletion_request(self):
-        return self.get_translation().publisher.has_pending_deletion_request
+    def reset_snapshot(self):
+        super(ParlerPublisher, self).reset_snapshot()
+        try:
+            self.get_translation().publisher.reset_snapshot()
+        except ObjectDoesNotExist:
+            pass
 
-    @transaction.atomic
-    def publish(self, validate=True, delete=True, update_relations=True, now=None):
+    @atomic_operation
+    def publish(
+        self,
+        validate=True,
+        delete=True,
+        update_relations=True,
+        now=None,
+        in_database=None,
+        expected_revision=None,
+        using=None,
+    ):
         # publish the master object (but don't delete it)
         # publish this translation
         # delete myself (translation)
@@ -79,10 +90,20 @@ class ParlerPublisher(Publisher):
                 delete=delete,
                 update_relations=update_relations,
                 now=now,
+                in_database=in_database,
+                expected_revision=expected_revision,
+                using=using,
             )
 
+        model = self.instance._meta.model
         if validate:
-            self.can_publish()
+            with instrumentation.phase(
+                'validate',
+                model=model,
+                operation='publish_translation',
+                using=using,
+            ):
+                self.can_publish()
         now = now or timezone.now()
         language_code = self.instance.language_code
 
@@ -91,41 +112,56 @@ class ParlerPublisher(Publisher):
             delete=False,
             update_relations=False,
             now=now,
+            in_database=in_database,
+            expected_revision=expected_revision,
+            using=using,
         )
 
         if delete:
-            # Delete the draft translation
-            draft_translation.delete()
-            # If there are no more translation drafts: delete the master draft too.
-            if not draft_translation.master.translations.all().exists():
-                # FIXME: update_relations before master is deleted.
-                draft_translation.master.delete()
-        published = refresh_from_db(published_translation.master)
+            with instrumentation.phase(
+                'delete',
+                model=model,
+                operation='publish_translation',
+                using=using,
+            ):
+                # Delete the draft translation
+                draft_translation.delete(using=using)
+                # If there are no more translation drafts: delete the master draft too.
+                if not draft_translation.master.translations.using(using).exists():
+                    # FIXME: update_relations before master is deleted.
+                    draft_translation.master.delete(using=using)
+        with instrumentation.phase(
+            'refetch',
+            model=model,
+            operation='publish_translation',
+            using=using,
+        ):
+            published = refresh_from_db(published_translation.master, using=using)
         published.set_current_language(language_code)
         return published
 
-    @transaction.atomic
-    def create_draft(self):
+    @atomic_operation
+    def create_draft(self, using=None):
         assert self.is_published_version
         # published_translation = self.instance
         if self.has_pending_deletion_request:
-            self.discard_deletion_request()
+            self.discard_deletion_request(using=using)
         language_code = self.instance.language_code
         published_translation = self.get_translation()
-        draft_translation = published_translation.publisher.create_draft()
+        draft_translation = published_translation.publisher.create_draft(using=using)
         draft = draft_translation.master
         draft.set_current_language(language_code)
         return draft
 
-    @transaction.atomic
-    def discard_draft(self, update_relations=True):
+    @atomic_operation
+    def discard_draft(self, update_relations=True, using=None):
         try:
             translation = self.get_translation()
-            translation.publisher.discard_draft()
+            translation.publisher.discard_draft(using=using)
         except ObjectDoesNotExist:
             pass
-        if not self.instance.translations.all().exists():
-            self.instance.master_publisher.discard_draft()
+        if not self.instance.translations.using(using).exists():
+            self.instance.master_publisher.discard_draft(using=using)
 
     def copy_relations(self, old_obj):
         # Call a method on the master object so any app specific relations can
@@ -139,30 +175,30 @@ class ParlerPublisher(Publisher):
     def can_publish(self):
         self.instance.publisher_can_publish()
 
-    @transaction.atomic
-    def publish_deletion(self):
+    @atomic_operation
+    def publish_deletion(self, using=None):
         translation = self.instance.get_translation(self.instance.language_code)
         translation.publish_deletion()
-        if not self.instance.translations.all().exists():
-            self.instance.delete()
+        if not self.instance.translations.using(using).exists():
+            self.instance.delete(using=using)
 
-    @transaction.atomic
-    def request_deletion(self):
+    @atomic_operation
+    def request_deletion(self, using=None):
         published = self.get_published_version()
         if self.instance != published:
-            return published.publisher.request_deletion()
+            return published.publisher.request_deletion(using=using)
         language_code = published.language_code
         published_translation = published.get_translation(language_code)
-        published_translation.publisher.request_deletion()
-        return refresh_from_db(self.instance)
+        published_translation.publisher.request_deletion(using=using)
+        return refresh_from_db(self.instance, using=using)
 
-    @transaction.atomic
-    def discard_deletion_request(self):
+    @atomic_operation
+    def discard_deletion_request(self, using=None):
         assert self.is_published_version
         if self.instance.master_publisher.has_pending_deletion_request:
-            self.instance.master_publisher.discard_deletion_request()
+            self.instance.master_publisher.discard_deletion_request(using=using)
         translation = self.instance.get_translation(self.instance.language_code)
-        translation.publisher.discard_deletion_request()
+        translation.publisher.discard_deletion_request(using=using)
 
     def all_translations(self, prefer_drafts=True):
         return self.all_translations_dict(prefer_drafts=prefer_drafts).values()
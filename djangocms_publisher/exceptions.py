@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+
+class PublisherRevisionConflict(Exception):
+    """
+    The draft was saved by someone else since the revision the caller based
+    its changes on.
+    """
+    def __init__(self, obj, expected_revision, revision):
+        self.obj = obj
+        self.expected_revision = expected_revision
+        self.revision = revision
+        super(PublisherRevisionConflict, self).__init__(
+            '{!r} is at revision {}, expected revision {}.'.format(
+                obj,
+                revision,
+                expected_revision,
+            )
+        )
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import copy
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db.models import Model
+
+_local = threading.local()
+
+
+def copy_instance(obj, related=True):
+    """
+    A shallow copy of the model instance obj. Attributes set on the copy
+    (e.g. the current language of django-parler models) and its caches are
+    its own. With related, the cached related objects (e.g. the master of a
+    parler translation) are copied as well.
+    """
+    if obj is None:
+        return None
+
+    def copy_value(value):
+        if related and isinstance(value, Model):
+            return copy_instance(value, related=False)
+        return value
+
+    new = obj.__class__.__new__(obj.__class__)
+    new.__dict__.update(obj.__dict__)
+    new._state = copy.copy(obj._state)
+    if hasattr(obj._state, 'fields_cache'):
+        # The cached related objects on newer django versions.
+        new._state.fields_cache = {
+            name: copy_value(value)
+            for name, value in obj._state.fields_cache.items()
+        }
+    for name, value in obj.__dict__.items():
+        if isinstance(value, Model):
+            # A cached related object (e.g. _master_cache).
+            new.__dict__[name] = copy_value(value)
+        elif getattr(value, 'instance', None) is obj:
+            # Bound to obj (e.g. the cached publisher), recreated on access.
+            del new.__dict__[name]
+        elif name == '_translations_cache' and value is not None:
+            # django-parler: {translations model: {language_code: translation}}
+            new._translations_cache = defaultdict(dict, (
+                (model, dict(translations))
+                for model, translations in value.items()
+            ))
+        elif isinstance(value, dict):
+            # e.g. _prefetched_objects_cache
+            new.__dict__[name] = dict(value)
+    return new
+
+
+class IdentityMap(object):
+    """
+    The draft/published counterparts (and parler translations) that were
+    looked up while the map is active, so they are only loaded once. Keys
+    are built with get_key(). None is stored for counterparts that don't
+    exist. Every lookup returns its own copy (see copy_instance()), so
+    callers can't change the objects of other callers.
+    """
+
+    def __init__(self):
+        self.objects = {}
+        self.hits = 0
+
+    def lookup(self, key, load):
+        try:
+            obj = self.objects[key]
+        except KeyError:
+            obj = self.objects[key] = load()
+        else:
+            self.hits += 1
+        return copy_instance(obj)
+
+    def clear(self):
+        self.objects.clear()
+
+
+def get_identity_map():
+    # The identity map of the current thread or None.
+    return getattr(_local, 'identity_map', None)
+
+
+@contextmanager
+def identity_map():
+    """
+    Activates an identity map (for this thread) in the block, e.g. for the
+    duration of a request (see middleware.PublisherIdentityMapMiddleware).
+    Nested blocks share the outer map. Yields the IdentityMap.
+    """
+    previous = get_identity_map()
+    current = _local.identity_map = previous or IdentityMap()
+    try:
+        yield current
+    finally:
+        _local.identity_map = previous
+
+
+def get_key(model, pk, *extra):
+    return (model._meta.label_lower, pk) + extra
+
+
+def lookup(key, load):
+    """
+    Returns the object stored under key in the active identity map. It is
+    loaded with load() (and stored) the first time. Without an identity map
+    load() is called every time.
+    """
+    current = get_identity_map()
+    if current is None:
+        return load()
+    return current.lookup(key, load)
+
+
+def invalidate():
+    # Called by publisher operations and by saves, deletes and queryset
+    # updates of publisher models (and their parler translations): they
+    # change which counterparts exist.
+    current = get_identity_map()
+    if current is not None:
+        current.clear()
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import threading
+from collections import deque, namedtuple
+from contextlib import contextmanager
+from timeit import default_timer
+
+from django.db import connections, router
+
+from .conf import get_setting
+
+# The phases of publishing an object:
+#  - validate: publisher_can_publish()
+#  - copy_object: writing the fields of the draft to the published version
+#  - copy_relations: publisher_copy_relations() (e.g placeholders)
+#  - update_relations: switching other objects over to the published version
+#  - delete: deleting (or linking) the draft
+#  - refetch: loading the published version again
+# create_draft() records copy_object, copy_relations and refetch (in the
+# other direction).
+# The operations they are recorded for:
+#  - publish: Publisher.publish()
+#  - publisher_publish: publishing a queryset in bulk
+#  - publish_translation: publishing a translation of a parler model
+#  - create_draft: Publisher.create_draft()
+PHASES = (
+    'validate',
+    'copy_object',
+    'copy_relations',
+    'update_relations',
+    'delete',
+    'refetch',
+)
+
+
+class PhaseStats(namedtuple('PhaseStats', ['count', 'duration', 'queries'])):
+    """
+    The number of times a phase ran, the total time it took (in seconds) and
+    the total number of queries it made.
+    """
+    __slots__ = ()
+
+    def add(self, duration, queries):
+        return PhaseStats(
+            count=self.count + 1,
+            duration=self.duration + duration,
+            queries=self.queries + queries,
+        )
+
+
+class Collector(object):
+    """
+    Receives a record for every phase of a publisher operation. Subclass it
+    and register the instance with register_collector() (or list its dotted
+    path in the PUBLISHER_COLLECTORS setting) to e.g forward the timings to
+    statsd.
+    """
+    def record(self, model, operation, phase, duration, queries):
+        raise NotImplementedError
+
+
+class Aggregator(Collector):
+    """
+    Sums up the records in memory, per (model label, operation, phase).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, model, operation, phase, duration, queries):
+        key = (model._meta.label, operation, phase)
+        with self._lock:
+            stats = self._stats.get(key, PhaseStats(0, 0.0, 0))
+            self._stats[key] = stats.add(duration=duration, queries=queries)
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+# Collects when PUBLISHER_INSTRUMENTATION is True.
+aggregator = Aggregator()
+
+_collectors = []
+
+
+def register_collector(collector):
+    if collector not in _collectors:
+        _collectors.append(collector)
+
+
+def unregister_collector(collector):
+    if collector in _collectors:
+        _collectors.remove(collector)
+
+
+_configured_collectors = {}
+
+
+def get_collectors():
+    collectors = list(_collectors)
+    paths = tuple(get_setting('COLLECTORS'))
+    if paths not in _configured_collectors:
+        from django.utils.module_loading import import_string
+
+        _configured_collectors[paths] = [
+            import_string(path)() for path in paths
+        ]
+    collectors.extend(_configured_collectors[paths])
+    if get_setting('INSTRUMENTATION'):
+        collectors.append(aggregator)
+    return collectors
+
+
+@contextmanager
+def phase(name, model, operation, using=None):
+    """
+    Records the time and the number of queries of the block as the phase
+    name of operation on model. Does nothing unless there are collectors.
+    """
+    collectors = get_collectors()
+    if not collectors:
+        yield
+        return
+    connection = connections[using or router.db_for_write(model)]
+    # Django 1.11 has no execute_wrapper(). The queries are counted with the
+    # debug cursor instead, in a log of their own (queries_log has a maxlen).
+    queries_logged = connection.queries_logged
+    force_debug_cursor = connection.force_debug_cursor
+    queries_log = connection.queries_log
+    connection.force_debug_cursor = True
+    connection.queries_log = deque(maxlen=queries_log.maxlen)
+    started = default_timer()
+    try:
+        yield
+    finally:
+        duration = default_timer() - started
+        queries = len(connection.queries_log)
+        if queries_logged:
+            queries_log.extend(connection.queries_log)
+        connection.queries_log = queries_log
+        connection.force_debug_cursor = force_debug_cursor
+        for collector in collectors:
+            collector.record(
+                model=model,
+                operation=operation,
+                phase=name,
+                duration=duration,
+                queries=queries,
+            )
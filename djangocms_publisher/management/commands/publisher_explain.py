@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Shows what publishing drafts would do: the rows of each relation '
+        'that would be switched over to the published version, the rows '
+        'that would be deleted together with the draft and the size of the '
+        'copied fields. Nothing is changed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'model',
+            metavar='app_label.ModelName',
+            help='The publisher model.',
+        )
+        parser.add_argument(
+            'pks',
+            nargs='*',
+            metavar='pk',
+            help='Only explain these drafts (default: all drafts).',
+        )
+        parser.add_argument(
+            '--min-rows',
+            type=int,
+            default=0,
+            help=(
+                'Only show drafts that would write or delete at least '
+                'MIN_ROWS rows.'
+            ),
+        )
+
+    def handle(self, *args, **options):
+        model = apps.get_model(options['model'])
+        drafts = model._base_manager.filter(
+            publisher_is_published_version=False,
+        ).order_by('pk')
+        if options['pks']:
+            drafts = drafts.filter(pk__in=options['pks'])
+        for draft in drafts.iterator():
+            estimate = draft.publisher.estimate_publish()
+            if estimate.rows < options['min_rows']:
+                continue
+            self.stdout.write(
+                '{} {}: {} rows, {} characters copied'.format(
+                    model._meta.label,
+                    draft.pk,
+                    estimate.rows,
+                    estimate.payload,
+                )
+            )
+            for relation in estimate.relations:
+                if relation.exclude == 'all':
+                    self.stdout.write('  rewrite {}.{}: excluded'.format(
+                        relation.model._meta.label,
+                        relation.field_name,
+                    ))
+                    continue
+                line = '  rewrite {}.{}: {} rows'.format(
+                    relation.model._meta.label,
+                    relation.field_name,
+                    relation.rows,
+                )
+                if relation.exclude:
+                    line += ' (excluding {})'.format(', '.join(relation.exclude))
+                self.stdout.write(line)
+            for deletion in estimate.deletions:
+                if deletion.rows:
+                    self.stdout.write('  delete {}.{}: {} rows'.format(
+                        deletion.model._meta.label,
+                        deletion.field_name,
+                        deletion.rows,
+                    ))
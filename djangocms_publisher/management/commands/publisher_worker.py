@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from ...conf import get_setting
+from ...utils import scheduling
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs pending publisher jobs, publishes drafts with a due '
+        'publisher_publish_at, unpublishes published versions with a due '
+        'publisher_unpublish_at and purges soft deleted objects.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'models',
+            nargs='*',
+            metavar='app_label.ModelName',
+            help='Only process these models (default: all publisher models).',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Number of objects claimed per transaction.',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=None,
+            help='Number of worker threads.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help=(
+                'Keep running and check for due objects every INTERVAL '
+                'seconds. By default the command exits after one pass.'
+            ),
+        )
+
+    def handle(self, *args, **options):
+        models = scheduling.get_publisher_models(options['models'])
+        batch_size = (
+            options['batch_size'] or get_setting('WORKER_BATCH_SIZE')
+        )
+        concurrency = (
+            options['concurrency'] or get_setting('WORKER_CONCURRENCY')
+        )
+        while True:
+            count = scheduling.run_workers(
+                models,
+                batch_size=batch_size,
+                concurrency=concurrency,
+            )
+            if options['verbosity'] >= 1:
+                self.stdout.write('Processed {} jobs and scheduled objects.'.format(count))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
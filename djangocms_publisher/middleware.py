@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from .identity import identity_map
+from .routers import pin_to_primary
+
+
+class PublisherPrimaryMiddleware(object):
+    """
+    Keeps the requests that change things (POST, ...) and the requests of
+    staff users (who edit and publish) on the primary database, so they read
+    their own writes. Only the other requests read published content from
+    the replicas (see routers.PublisherReplicaRouter). Must come after
+    AuthenticationMiddleware.
+    """
+    safe_methods = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.use_primary(request):
+            return self.get_response(request)
+        with pin_to_primary():
+            return self.get_response(request)
+
+    def use_primary(self, request):
+        user = getattr(request, 'user', None)
+        return (
+            request.method not in self.safe_methods or
+            bool(user is not None and user.is_staff)
+        )
+
+
+class PublisherIdentityMapMiddleware(object):
+    """
+    Activates an identity map for each request, so the draft/published
+    counterparts of an object are only loaded once per request, no matter
+    how often the toolbar, the templates and the views ask for them (see
+    identity.identity_map()).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with identity_map():
+            return self.get_response(request)
@@ -1,16 +1,102 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
-from django.db import models
-from django.db.models import Q
+import logging
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.db import models, router, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.query import ModelIterable
+from django.utils import timezone
+from django.utils.encoding import force_text, python_2_unicode_compatible
 from django.utils.functional import cached_property
+from django.utils.translation import ugettext_lazy as _
+
+from . import identity, instrumentation, signals
+from .conf import get_setting
+from .publisher import (
+    Publisher,
+    has_fingerprint,
+    has_soft_delete,
+    prefetch_counterparts,
+)
+from .routers import pin_to_primary
+from .utils import aio, bulk, database, relations, scheduling
+from .utils.copying import get_copy_plan
 
-from .publisher import Publisher
+logger = logging.getLogger(__name__)
 
 
 class PublisherQuerySetMixin(object):
+    _publisher_prefetch_counterparts = False
+
+    def _clone(self, **kwargs):
+        clone = super(PublisherQuerySetMixin, self)._clone(**kwargs)
+        clone._publisher_prefetch_counterparts = self._publisher_prefetch_counterparts
+        return clone
+
+    def _fetch_all(self):
+        prefetch = (
+            self._result_cache is None and
+            self._publisher_prefetch_counterparts and
+            issubclass(self._iterable_class, ModelIterable)
+        )
+        super(PublisherQuerySetMixin, self)._fetch_all()
+        if prefetch:
+            prefetch_counterparts(
+                self._result_cache,
+                queryset=self._publisher_counterparts_queryset(),
+            )
+
+    def _publisher_counterparts_queryset(self):
+        return self.model._base_manager.using(self._db)
+
+    def _publisher_not_soft_deleted(self):
+        # The filter for rows that are not soft deleted (empty for models
+        # without PublisherSoftDeleteModelMixin).
+        if not has_soft_delete(self.model):
+            return {}
+        return {'publisher_deleted_at__isnull': True}
+
+    def _publisher_using(self):
+        # The database the operations of this queryset write to.
+        return self._db or router.db_for_write(self.model)
+
+    def update(self, **kwargs):
+        count = super(PublisherQuerySetMixin, self).update(**kwargs)
+        identity.invalidate()
+        return count
+    update.alters_data = True
+
+    def delete(self):
+        result = super(PublisherQuerySetMixin, self).delete()
+        identity.invalidate()
+        return result
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def publisher_prefetch_counterparts(self):
+        """
+        Loads the draft/published counterparts of all rows with one extra
+        query when the queryset is evaluated, so get_draft_version() and
+        get_published_version() don't query per object.
+        """
+        clone = self._clone()
+        clone._publisher_prefetch_counterparts = True
+        return clone
+
     def publisher_published(self):
-        return self.filter(publisher_is_published_version=True)
+        clone = self.filter(
+            publisher_is_published_version=True,
+            **self._publisher_not_soft_deleted()
+        )
+        # Lets routers.PublisherReplicaRouter send the reads to a replica.
+        clone._hints = dict(clone._hints, publisher_published=True)
+        return clone
 
     def publisher_drafts(self):
         return self.filter(publisher_is_published_version=False)
@@ -19,14 +105,23 @@ class PublisherQuerySetMixin(object):
         return self.filter(
             publisher_is_published_version=True,
             publisher_deletion_requested=True,
+            **self._publisher_not_soft_deleted()
         )
 
+    def publisher_soft_deleted(self):
+        # Deleted with publish_deletion() (publisher_soft_delete), but not
+        # purged yet.
+        if not has_soft_delete(self.model):
+            return self.none()
+        return self.filter(publisher_deleted_at__isnull=False)
+
     def publisher_pending_changes(self):
         return self.filter(
             Q(publisher_is_published_version=False) |
             Q(
                 publisher_is_published_version=True,
                 publisher_draft_version__isnull=False,
+                **self._publisher_not_soft_deleted()
             )
         )
 
@@ -51,12 +146,16 @@ class PublisherQuerySetMixin(object):
                 Q(
                     publisher_is_published_version=True,
                     publisher_draft_version__isnull=True,
+                    **self._publisher_not_soft_deleted()
                 )
             )
         else:
             return self.filter(
                 # published objects
-                Q(publisher_is_published_version=True) |
+                Q(
+                    publisher_is_published_version=True,
+                    **self._publisher_not_soft_deleted()
+                ) |
                 # OR drafts without a published version
                 Q(
                     publisher_is_published_version=False,
@@ -70,6 +169,329 @@ class PublisherQuerySetMixin(object):
     def publisher_draft_or_published_only_prefer_published(self):
         return self.publisher_draft_or_published_only(prefer_drafts=False)
 
+    def publisher_with_state(self):
+        """
+        Annotates every row with the flags needed for the publisher state
+        (publisher_has_draft, publisher_has_published and
+        publisher_deletion_requested_effective). obj.publisher.state and
+        obj.publisher.available_actions() use them instead of querying.
+        Soft deleted published versions count as gone.
+        """
+        objects = self.model._base_manager
+        return self.annotate(
+            # the row itself is a draft or a draft points to it
+            publisher_has_draft=Exists(objects.filter(
+                Q(pk=OuterRef('pk'), publisher_is_published_version=False) |
+                Q(publisher_published_version=OuterRef('pk'))
+            )),
+            # the row itself is published or it points to a published version
+            publisher_has_published=Exists(objects.filter(
+                Q(pk=OuterRef('pk'), publisher_is_published_version=True) |
+                Q(pk=OuterRef('publisher_published_version')),
+                **self._publisher_not_soft_deleted()
+            )),
+            publisher_deletion_requested_effective=Exists(objects.filter(
+                Q(pk=OuterRef('pk')) |
+                Q(pk=OuterRef('publisher_published_version')),
+                publisher_is_published_version=True,
+                publisher_deletion_requested=True,
+                **self._publisher_not_soft_deleted()
+            )),
+        )
+
+    def publisher_publish(self, validate=True, delete=True, update_relations=True, now=None):
+        """
+        Publishes all drafts in this queryset in one transaction. Published
+        versions that don't exist yet are created in bulk, existing ones are
+        overwritten with one UPDATE per batch. Published objects in the
+        queryset are ignored.
+        Like all operations of the queryset, it works on the database of the
+        queryset (.using()) or where the routers send the writes.
+        Returns a queryset of the resulting published versions.
+        """
+        using = self._publisher_using()
+        identity.invalidate()
+        try:
+            with pin_to_primary(), transaction.atomic(using=using):
+                return self.using(using)._publisher_publish(
+                    validate=validate,
+                    delete=delete,
+                    update_relations=update_relations,
+                    now=now,
+                )
+        finally:
+            identity.invalidate()
+
+    def _publisher_publish(self, validate, delete, update_relations, now):
+        # See publisher_publish(). The queryset is on the database to write
+        # to.
+        model = self.model
+        using = self.db
+        rows = list(
+            self.publisher_drafts()
+            .values_list('pk', 'publisher_published_version_id')
+        )
+        if not rows:
+            return model.objects.using(using).none()
+        pks = [pk for pk, published_pk in rows]
+        # Lock the drafts and their published versions (like
+        # Publisher.lock()) and only then load the drafts, so they are
+        # current.
+        database.lock(
+            model._base_manager.using(using).filter(
+                pk__in=pks + [published_pk for pk, published_pk in rows if published_pk],
+            ),
+            nowait=get_setting('LOCK_NOWAIT'),
+            timeout=get_setting('LOCK_TIMEOUT'),
+        )
+        drafts = list(self.publisher_drafts().filter(pk__in=pks))
+        if not drafts:
+            return model.objects.using(using).none()
+        if validate:
+            with instrumentation.phase(
+                'validate',
+                model=model,
+                operation='publisher_publish',
+                using=using,
+            ):
+                for draft in drafts:
+                    draft.publisher_can_publish()
+        now = now or timezone.now()
+
+        # Soft deleted published versions are not reused, a new published
+        # version is created instead.
+        existing = (
+            model._base_manager
+            .using(using)
+            .filter(**self._publisher_not_soft_deleted())
+            .in_bulk([
+                draft.publisher_published_version_id
+                for draft in drafts
+                if draft.publisher_published_version_id
+            ])
+        )
+        started = signals.send_pre(
+            signals.pre_publish,
+            sender=model,
+            pairs=[
+                (draft, existing.get(draft.publisher_published_version_id))
+                for draft in drafts
+            ],
+            bulk=True,
+        )
+        pairs = []
+        to_create = []
+        to_update = []
+        update_fields = [
+            'publisher_is_published_version',
+            'publisher_published_at',
+        ]
+        if has_fingerprint(model):
+            update_fields.append('publisher_fingerprint')
+        for draft in drafts:
+            published = existing.get(draft.publisher_published_version_id)
+            if published is None:
+                published = model()
+                to_create.append(published)
+            else:
+                to_update.append(published)
+            published.publisher_is_published_version = True
+            published.publisher_published_at = now
+            if has_fingerprint(model):
+                published.publisher_fingerprint = self._publisher_get_publisher(draft).get_fingerprint() or ''
+            self._publisher_get_publisher(published).copy_object(
+                old_obj=draft,
+                commit=False,
+            )
+            pairs.append((draft, published))
+
+        # * update the live versions with the data from the drafts
+        with instrumentation.phase(
+            'copy_object',
+            model=model,
+            operation='publisher_publish',
+            using=using,
+        ):
+            bulk.bulk_create(model, to_create, using=using)
+            copy_plan = get_copy_plan(
+                model,
+                exclude_fields=(
+                    self._publisher_get_publisher(drafts[0])
+                    .copy_object_exclude_fields()
+                ),
+            )
+            bulk.bulk_update(
+                model,
+                to_update,
+                [field.name for field in copy_plan] + update_fields,
+                using=using,
+            )
+        with instrumentation.phase(
+            'copy_relations',
+            model=model,
+            operation='publisher_publish',
+            using=using,
+        ):
+            for draft, published in pairs:
+                self._publisher_get_publisher(published).copy_relations(
+                    old_obj=draft,
+                )
+
+        if update_relations:
+            # * find any other objects still pointing to the drafts and
+            #   switch them to the live versions. Drafts that share the same
+            #   excludes are updated together.
+            with instrumentation.phase(
+                'update_relations',
+                model=model,
+                operation='publisher_publish',
+                using=using,
+            ):
+                for draft, published in pairs:
+                    publisher = self._publisher_get_publisher(published)
+                    if publisher.overrides_update_relations:
+                        # Like publish(): the custom rewrites first.
+                        publisher.update_relations(old_obj=draft, using=using)
+                groups = OrderedDict()
+                for draft, published in pairs:
+                    ignore = (
+                        self._publisher_get_publisher(published)
+                        .update_relations_exclude(old_obj=draft)
+                    )
+                    key = relations.ignore_stuff_key(ignore)
+                    groups.setdefault(key, (ignore, OrderedDict()))[1][draft] = published
+                for ignore, objs in groups.values():
+                    relations.update_relations_bulk(
+                        objs,
+                        exclude=relations.ignore_stuff_to_dict(ignore),
+                        using=using,
+                    )
+        with instrumentation.phase(
+            'delete',
+            model=model,
+            operation='publisher_publish',
+            using=using,
+        ):
+            if delete:
+                # * Delete the drafts
+                draft_pks = [draft.pk for draft in drafts]
+                if not relations.fast_delete(model, draft_pks, using=using):
+                    model._base_manager.using(using).filter(pk__in=draft_pks).delete()
+                for draft in drafts:
+                    draft.pk = None
+            else:
+                created = [
+                    draft for draft, published in pairs
+                    if draft.publisher_published_version_id != published.pk
+                ]
+                for draft, published in pairs:
+                    draft.publisher_published_version = published
+                bulk.bulk_update(
+                    model,
+                    created,
+                    ['publisher_published_version'],
+                    using=using,
+                )
+        signals.send_post(
+            signals.post_publish,
+            sender=model,
+            pairs=pairs,
+            started=started,
+            using=using,
+            bulk=True,
+        )
+        return model.objects.using(using).filter(
+            pk__in=[published.pk for draft, published in pairs],
+        )
+
+    def _publisher_arun(self, method, *args, **kwargs):
+        # Runs method in a worker thread (see utils.aio.run_in_thread()).
+        # Resulting querysets are evaluated there as well.
+        def run():
+            result = getattr(self, method)(*args, **kwargs)
+            if isinstance(result, models.QuerySet):
+                result = list(result)
+            return result
+        return aio.run_in_thread(run)
+
+    # Async variants for async views. They return awaitables that resolve to
+    # lists of objects (instead of querysets). To run an operation on many
+    # independent objects concurrently, see utils.aio.run_each().
+
+    def apublisher_published(self):
+        return self._publisher_arun('publisher_published')
+
+    def apublisher_drafts(self):
+        return self._publisher_arun('publisher_drafts')
+
+    def apublisher_draft_or_published_only(self, prefer_drafts=False):
+        return self._publisher_arun(
+            'publisher_draft_or_published_only',
+            prefer_drafts=prefer_drafts,
+        )
+
+    def apublisher_publish(self, **kwargs):
+        return self._publisher_arun('publisher_publish', **kwargs)
+
+    def apublisher_unpublish(self):
+        return self._publisher_arun('publisher_unpublish')
+
+    def _publisher_get_publisher(self, obj):
+        # The publisher that handles obj as a whole (in the bulk operations).
+        return obj.publisher
+
+    def publisher_unpublish(self):
+        """
+        Unpublishes all published objects in this queryset. Drafts in the
+        queryset are ignored.
+        Returns the number of unpublished objects.
+        """
+        using = self._publisher_using()
+        identity.invalidate()
+        try:
+            with pin_to_primary(), transaction.atomic(using=using):
+                return self.using(using)._publisher_unpublish()
+        finally:
+            identity.invalidate()
+
+    def _publisher_unpublish(self):
+        # See publisher_unpublish(). The queryset is on the database to write
+        # to.
+        model = self.model
+        using = self.db
+        published_objs = list(
+            self.publisher_published().publisher_prefetch_counterparts()
+        )
+        if not published_objs:
+            return 0
+        pairs = [
+            (self._publisher_get_publisher(obj).get_draft_version(), obj)
+            for obj in published_objs
+        ]
+        started = signals.send_pre(
+            signals.pre_unpublish,
+            sender=model,
+            pairs=pairs,
+            bulk=True,
+        )
+        drafts = [
+            self._publisher_get_publisher(published).unpublish_published(
+                draft=draft,
+                published=published,
+                using=using,
+            )
+            for draft, published in pairs
+        ]
+        signals.send_post(
+            signals.post_unpublish,
+            sender=model,
+            pairs=list(zip(drafts, published_objs)),
+            started=started,
+            using=using,
+            bulk=True,
+        )
+        return len(published_objs)
+
 
 class PublisherQuerySet(PublisherQuerySetMixin, models.QuerySet):
     pass
@@ -111,8 +533,27 @@ class PublisherModelMixin(models.Model):
     def publisher(self):
         return Publisher(instance=self, name='publisher')
 
+    def save(self, *args, **kwargs):
+        super(PublisherModelMixin, self).save(*args, **kwargs)
+        identity.invalidate()
+
+    def delete(self, *args, **kwargs):
+        result = super(PublisherModelMixin, self).delete(*args, **kwargs)
+        identity.invalidate()
+        return result
+
     # USER OVERRIDABLE
     publisher_copy_object_exclude_fields = ()
+    # Copy rows inside the database (INSERT ... SELECT) instead of loading
+    # and saving them in python. Faster for models with large fields, but
+    # save() and the model signals are not called for the copy.
+    publisher_copy_in_database = False
+    # Only mark the published version as deleted in publish_deletion() (it
+    # disappears from publisher_published() and
+    # publisher_draft_or_published_only() right away). The publisher_worker
+    # command deletes it later, in chunks. For objects with big cascades.
+    # The model needs PublisherSoftDeleteModelMixin.
+    publisher_soft_delete = False
 
     def publisher_copy_relations(self, old_obj):
         # At this point the basic fields on the model have all already been
@@ -145,3 +586,275 @@ class PublisherModelMixin(models.Model):
         # Return True or False.
         return True
     # /USER OVERRIDABLE
+
+
+class PublisherRevisionModelMixin(models.Model):
+    """
+    Optional, in addition to PublisherModelMixin: counts the saves of a draft
+    in publisher_revision to detect conflicting edits (see
+    Publisher.check_revision() and PublisherAdminMixin.publisher_check_revision).
+    """
+    # Incremented on every save of a draft. New drafts start at 1.
+    publisher_revision = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+    )
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if not self.publisher_is_published_version and (
+            update_fields is None or
+            any(not name.startswith('publisher_') for name in update_fields)
+        ):
+            # A change to the content of the draft (not just to the
+            # publisher bookkeeping).
+            self.publisher_revision += 1
+            if update_fields is not None:
+                kwargs['update_fields'] = (
+                    list(update_fields) + ['publisher_revision']
+                )
+        super(PublisherRevisionModelMixin, self).save(*args, **kwargs)
+
+
+class PublisherFingerprintModelMixin(models.Model):
+    """
+    Optional, in addition to PublisherModelMixin: stores a fingerprint of the
+    content in publisher_fingerprint to skip publishing drafts without any
+    changes (see Publisher.get_fingerprint()).
+    """
+    # The fingerprint of the draft the published version was published from.
+    publisher_fingerprint = models.CharField(
+        max_length=40,
+        blank=True,
+        default='',
+        editable=False,
+    )
+
+    class Meta:
+        abstract = True
+
+    def publisher_get_fingerprint_data(self):
+        # The relations excluded in publisher_update_relations_exclude() and
+        # the ManyToManyFields are part of the fingerprint already. Return
+        # the content of anything else publisher_copy_relations() copies
+        # (e.g placeholder plugins) as json serializable values.
+        return None
+
+
+class PublisherScheduleModelMixin(models.Model):
+    """
+    Optional, in addition to PublisherModelMixin: publishes and unpublishes
+    objects at a given time (with the publisher_worker command).
+    """
+    # Set on a draft to have it published by the publisher_worker command.
+    # Not editable: name it in the fieldsets of the admin to edit it.
+    publisher_publish_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        default=None,
+        editable=False,
+        db_index=True,
+    )
+    # Copied to the published version, which is then unpublished by the
+    # publisher_worker command. Not editable, like publisher_publish_at.
+    publisher_unpublish_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        default=None,
+        editable=False,
+        db_index=True,
+    )
+
+    class Meta:
+        abstract = True
+
+
+class PublisherSoftDeleteModelMixin(models.Model):
+    """
+    Optional, in addition to PublisherModelMixin: adds the column needed
+    for publisher_soft_delete.
+    """
+    # Set by publish_deletion() with publisher_soft_delete. The object is
+    # purged by the publisher_worker command.
+    publisher_deleted_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        default=None,
+        editable=False,
+        db_index=True,
+    )
+    # Set when a publisher_worker claims the object to purge it. Other
+    # workers leave it alone until PUBLISHER_JOB_TIMEOUT has passed.
+    publisher_purge_started_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        default=None,
+        editable=False,
+    )
+
+    class Meta:
+        abstract = True
+
+
+class PublisherJobQuerySet(models.QuerySet):
+    def enqueue(self, obj, action='publish', user=None):
+        """
+        Creates a job to run the publisher action on obj in the background
+        (see the publisher_worker command). If the same action is already
+        pending for obj, that job is returned instead.
+        """
+        assert action in PublisherJob.ACTIONS
+        if hasattr(obj, 'get_current_language'):
+            # django-parler: the action is for the current language.
+            language_code = obj.get_current_language()
+        else:
+            language_code = ''
+        values = {
+            'content_type': ContentType.objects.get_for_model(obj),
+            'object_id': force_text(obj.pk),
+            'language_code': language_code,
+            'action': action,
+        }
+        job = (
+            self.filter(status=PublisherJob.STATUS_PENDING, **values)
+            .order_by('pk')
+            .first()
+        )
+        if job is not None:
+            return job
+        return self.create(
+            user=user if user and user.is_authenticated else None,
+            **values
+        )
+
+    def claimable(self, now=None):
+        # Pending jobs and running jobs that exceeded PUBLISHER_JOB_TIMEOUT.
+        now = now or timezone.now()
+        return self.filter(
+            Q(status=PublisherJob.STATUS_PENDING) |
+            Q(
+                status=PublisherJob.STATUS_RUNNING,
+                started_at__lt=now - timedelta(seconds=get_setting('JOB_TIMEOUT')),
+            )
+        )
+
+    def claim(self, batch_size):
+        """
+        Marks up to batch_size claimable jobs (see claimable()) as running
+        and returns them. Jobs claimed by another worker at the same time are
+        skipped.
+        """
+        with transaction.atomic(using=self.db):
+            pks = scheduling.claim(
+                self.claimable(),
+                batch_size=batch_size,
+            )
+            self.filter(pk__in=pks).update(
+                status=PublisherJob.STATUS_RUNNING,
+                started_at=timezone.now(),
+            )
+        return list(self.filter(pk__in=pks).order_by('pk'))
+
+
+@python_2_unicode_compatible
+class PublisherJob(models.Model):
+    """
+    A publisher action that was requested in the admin and is run by the
+    publisher_worker command.
+    """
+    ACTIONS = ('publish',)
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, _('Pending')),
+        (STATUS_RUNNING, _('Running')),
+        (STATUS_DONE, _('Done')),
+        (STATUS_FAILED, _('Failed')),
+    )
+
+    content_type = models.ForeignKey(
+        ContentType,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    object_id = models.CharField(max_length=255)
+    language_code = models.CharField(max_length=15, blank=True, default='')
+    action = models.CharField(max_length=30)
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        db_index=True,
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        blank=True,
+        null=True,
+        default=None,
+        on_delete=models.SET_NULL,
+        related_name='+',
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(blank=True, null=True, default=None)
+    finished_at = models.DateTimeField(blank=True, null=True, default=None)
+    result_object_id = models.CharField(max_length=255, blank=True, default='')
+    error = models.TextField(blank=True, default='')
+
+    objects = PublisherJobQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _('publisher job')
+        verbose_name_plural = _('publisher jobs')
+
+    def __str__(self):
+        return '{} {} {} ({})'.format(
+            self.action,
+            self.content_type.model,
+            self.object_id,
+            self.status,
+        )
+
+    def get_object(self, pk=None):
+        model = self.content_type.model_class()
+        obj = model._base_manager.get(pk=pk or self.object_id)
+        if self.language_code:
+            obj.set_current_language(self.language_code)
+        return obj
+
+    def get_result(self):
+        # The object returned by the action (e.g the published version).
+        if not self.result_object_id:
+            return None
+        try:
+            return self.get_object(pk=self.result_object_id)
+        except ObjectDoesNotExist:
+            return None
+
+    def run(self):
+        model = self.content_type.model_class()
+        try:
+            with transaction.atomic(using=router.db_for_write(model)):
+                obj = self.get_object()
+                result = getattr(obj.publisher, self.action)()
+        except ValidationError as e:
+            self.status = self.STATUS_FAILED
+            self.error = ' '.join(e.messages)
+        except Exception as e:
+            logger.exception('Publisher job %s failed', self.pk)
+            self.status = self.STATUS_FAILED
+            self.error = force_text(e)
+        else:
+            self.status = self.STATUS_DONE
+            self.result_object_id = force_text(result.pk) if result else ''
+        self.finished_at = timezone.now()
+        self.save(update_fields=[
+            'status',
+            'error',
+            'result_object_id',
+            'finished_at',
+        ])
@@ -1,18 +1,56 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+from collections import namedtuple
+from functools import wraps
+
 from django.core.exceptions import ObjectDoesNotExist
-from django.db import transaction
+from django.db import router, transaction
+from django.db.models import Q
 from django.utils import timezone
 from django.utils.functional import cached_property
 from django.utils.translation import ugettext_lazy as _
 
-from .utils import relations
+from . import identity, instrumentation, signals
+from .conf import get_setting
+from .exceptions import PublisherRevisionConflict
+from .routers import pin_to_primary
+from .utils import aio, database, relations
+from .utils.compat import (
+    delete_cached_value,
+    get_cached_value,
+    set_cached_value,
+)
 from .utils.copying import (
-    DEFAULT_COPY_EXCLUDE_FIELDS,
     copy_object,
+    get_changed_fields,
+    get_copy_exclude_fields,
+    get_copy_plan,
+    get_fingerprint,
     refresh_from_db,
 )
+from .utils.estimate import estimate_publish
+
+
+def has_revision(model):
+    from .models import PublisherRevisionModelMixin
+    return issubclass(model, PublisherRevisionModelMixin)
+
+
+def has_fingerprint(model):
+    from .models import PublisherFingerprintModelMixin
+    return issubclass(model, PublisherFingerprintModelMixin)
+
+
+def has_soft_delete(model):
+    from .models import PublisherSoftDeleteModelMixin
+    return issubclass(model, PublisherSoftDeleteModelMixin)
+
+
+def has_schedule(model):
+    from .models import PublisherScheduleModelMixin
+    return issubclass(model, PublisherScheduleModelMixin)
+
 
 PUBLISHER_STATE_CHOICES = (
     ('published', 'Published'),
@@ -24,6 +62,45 @@ PUBLISHER_STATE_CHOICES = (
     ('empty', 'No Content'),
 )
 
+NOT_CACHED = object()
+
+# Annotations added by PublisherQuerySetMixin.publisher_with_state()
+STATE_ANNOTATIONS = (
+    'publisher_has_draft',
+    'publisher_has_published',
+    'publisher_deletion_requested_effective',
+)
+
+
+class PublisherState(namedtuple('PublisherState', [
+    'has_published_version',
+    'has_pending_changes',
+    'has_pending_deletion_request',
+])):
+    """
+    Immutable snapshot of the publishing state flags of an object.
+    """
+    __slots__ = ()
+
+
+def atomic_operation(method):
+    """
+    Runs a publisher operation in a transaction on the database it writes to
+    (see Publisher.get_using()), which is passed on to it as using. Reads in
+    the operation don't go to replicas (see routers.pin_to_primary()). The
+    identity map is invalidated before and after.
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        using = kwargs['using'] = self.get_using(kwargs.get('using'))
+        identity.invalidate()
+        try:
+            with pin_to_primary(), transaction.atomic(using=using):
+                return method(self, *args, **kwargs)
+        finally:
+            identity.invalidate()
+    return wrapper
+
 
 class Publisher(object):
     """
@@ -53,6 +130,15 @@ class Publisher(object):
         from .admin import AdminUrls
         return AdminUrls(self.instance)
 
+    def get_using(self, using=None):
+        """
+        The alias of the database the operations write to: using if given,
+        otherwise where the routers send writes of the instance (by default
+        the database it was loaded from).
+        """
+        instance = self.instance
+        return using or router.db_for_write(instance._meta.model, instance=instance)
+
     @property
     def is_published_version(self):
         return self.instance.publisher_is_published_version
@@ -66,167 +152,835 @@ class Publisher(object):
         return self.instance.publisher_published_at
 
     @property
-    def has_pending_changes(self):
+    def is_deleted(self):
+        # Soft deleted by publish_deletion() (publisher_soft_delete) and
+        # waiting to be purged. It is gone as far as publishing goes.
+        return (
+            self.has_soft_delete and
+            self.instance.publisher_deleted_at is not None
+        )
+
+    @property
+    def has_soft_delete(self):
+        # The model can be soft deleted (PublisherSoftDeleteModelMixin).
+        return has_soft_delete(self.instance._meta.model)
+
+    @property
+    def has_revision(self):
+        # The model counts the saves of drafts (PublisherRevisionModelMixin).
+        return has_revision(self.instance._meta.model)
+
+    @property
+    def has_fingerprint(self):
+        # The model skips unchanged publishes (PublisherFingerprintModelMixin).
+        return has_fingerprint(self.instance._meta.model)
+
+    @property
+    def has_schedule(self):
+        # The model can be (un)published at a given time
+        # (PublisherScheduleModelMixin).
+        return has_schedule(self.instance._meta.model)
+
+    @cached_property
+    def snapshot(self):
+        return self.get_snapshot()
+
+    def get_snapshot(self):
+        """
+        Resolves all the state flags at once with at most one query. The
+        counterpart that was loaded to do so is cached on the instance, so
+        get_draft_version() and get_published_version() don't query again.
+        If the instance was loaded with publisher_with_state(), the
+        annotations are used and there is no query at all.
+        """
+        instance = self.instance
+        if self.is_deleted:
+            return PublisherState(
+                has_published_version=False,
+                has_pending_changes=False,
+                has_pending_deletion_request=False,
+            )
+        if all(hasattr(instance, name) for name in STATE_ANNOTATIONS):
+            return PublisherState(
+                has_published_version=bool(instance.publisher_has_published),
+                has_pending_changes=bool(instance.publisher_has_draft),
+                has_pending_deletion_request=bool(
+                    instance.publisher_deletion_requested_effective
+                ),
+            )
         if self.is_draft_version:
-            return True
-        try:
             # Query! :-(
-            # Can be avoided by using
-            # .select_related('draft') in the queryset.
-            return bool(self.instance.publisher_draft_version)
-        except ObjectDoesNotExist:
-            return False
+            published = self.get_published_version()
+            return PublisherState(
+                has_published_version=bool(published),
+                has_pending_changes=True,
+                has_pending_deletion_request=bool(
+                    published and published.publisher_deletion_requested
+                ),
+            )
+        # Query! :-(
+        # Can be avoided by using
+        # .select_related('publisher_draft_version') in the queryset.
+        return PublisherState(
+            has_published_version=True,
+            has_pending_changes=bool(self.get_counterpart()),
+            has_pending_deletion_request=self.instance.publisher_deletion_requested,
+        )
+
+    def reset_snapshot(self):
+        # Forget the resolved state and the cached counterparts.
+        self.__dict__.pop('snapshot', None)
+        opts = self.instance._meta
+        for field_name in ('publisher_published_version', 'publisher_draft_version'):
+            delete_cached_value(self.instance, opts.get_field(field_name))
+        for name in STATE_ANNOTATIONS:
+            self.instance.__dict__.pop(name, None)
+
+    @property
+    def has_pending_changes(self):
+        return self.snapshot.has_pending_changes
 
     @property
     def has_pending_deletion_request(self):
-        published = self.get_published_version()
-        if not published:
-            return False
-        if self.instance != published:
-            return self.get_publisher(published).has_pending_deletion_request
-        return self.instance.publisher_deletion_requested
+        return self.snapshot.has_pending_deletion_request
 
     @property
     def has_published_version(self):
-        if self.is_published_version:
-            return True
-        # Query! :-(
-        return bool(self.get_published_version())
+        return self.snapshot.has_published_version
+
+    def get_counterpart(self):
+        """
+        Returns the draft of the published version or the published version
+        of the draft (None if there is none) and caches it on the instance.
+        If an identity map is active (see identity.identity_map()), the
+        counterpart is looked up there before querying.
+        """
+        instance = self.instance
+        opts = instance._meta
+        if instance.publisher_is_published_version:
+            field = opts.get_field('publisher_draft_version')
+            key = identity.get_key(opts.model, instance.pk, 'draft')
+        elif instance.publisher_published_version_id:
+            field = opts.get_field('publisher_published_version')
+            key = identity.get_key(
+                opts.model,
+                instance.publisher_published_version_id,
+            )
+        else:
+            return None
+        counterpart = get_cached_value(instance, field, default=NOT_CACHED)
+        if counterpart is NOT_CACHED:
+            counterpart = identity.lookup(
+                key,
+                lambda: self.load_counterpart(field),
+            )
+            set_cached_value(instance, field, counterpart)
+        return counterpart
+
+    def load_counterpart(self, field):
+        # DB Query
+        try:
+            return getattr(self.instance, field.name)
+        except ObjectDoesNotExist:
+            return None
 
     def get_draft_version(self):
         if self.is_draft_version:
             return self.instance
         elif self.has_pending_changes:
-            # DB Query
-            return self.instance.publisher_draft_version
+            return self.get_counterpart()
         return None
 
     def get_published_version(self):
         if self.is_published_version:
             return self.instance
         elif self.instance.publisher_published_version_id:
-            # DB Query
-            return self.instance.publisher_published_version
+            published = self.get_counterpart()
+            if published is not None and self.get_publisher(published).is_deleted:
+                # Soft deleted, publishing creates a new published version.
+                return None
+            return published
         return None
 
-    def update_relations(self, old_obj):
+    def lock(self, using=None):
+        """
+        Locks the rows of the instance and its draft/published counterpart
+        until the end of the transaction, so concurrent operations on the same
+        object run one after the other. The publisher fields of the instance
+        are updated with the locked (current) values and the state is
+        resolved again. Returns the pks of the locked rows, which does not
+        include the instance if it was deleted in the meantime.
+        See the PUBLISHER_LOCK_NOWAIT and PUBLISHER_LOCK_TIMEOUT settings.
+        """
+        instance = self.instance
+        model = instance._meta.model
+        pks = {instance.pk}
+        if instance.publisher_published_version_id:
+            pks.add(instance.publisher_published_version_id)
+        fields = (
+            'publisher_is_published_version',
+            'publisher_published_version_id',
+            'publisher_deletion_requested',
+        )
+        if self.has_soft_delete:
+            fields += ('publisher_deleted_at',)
+        if self.has_revision:
+            fields += ('publisher_revision',)
+        rows = database.lock(
+            model._base_manager
+            .using(self.get_using(using))
+            .filter(Q(pk__in=pks) | Q(publisher_published_version__in=pks)),
+            fields=fields,
+            nowait=get_setting('LOCK_NOWAIT'),
+            timeout=get_setting('LOCK_TIMEOUT'),
+        )
+        for row in rows:
+            if row[0] != instance.pk:
+                continue
+            if row[2] != instance.publisher_published_version_id:
+                delete_cached_value(
+                    instance,
+                    model._meta.get_field('publisher_published_version'),
+                )
+            for name, value in zip(fields, row[1:]):
+                setattr(instance, name, value)
+        self.reset_snapshot()
+        return {row[0] for row in rows}
+
+    def check_revision(self, expected_revision, using=None):
+        """
+        Raises PublisherRevisionConflict if the draft was saved since
+        expected_revision was read from it. The row stays locked until the
+        end of the transaction, so it can't change until then.
+        Only for models with PublisherRevisionModelMixin.
+        """
+        assert self.has_revision
+        instance = self.instance
+        model = instance._meta.model
+        rows = database.lock(
+            model._base_manager
+            .using(self.get_using(using))
+            .filter(pk=instance.pk),
+            fields=('publisher_revision',),
+            nowait=get_setting('LOCK_NOWAIT'),
+            timeout=get_setting('LOCK_TIMEOUT'),
+        )
+        revision = rows[0][1] if rows else None
+        if revision != expected_revision:
+            raise PublisherRevisionConflict(
+                obj=instance,
+                expected_revision=expected_revision,
+                revision=revision,
+            )
+
+    @property
+    def overrides_update_relations(self):
+        method = type(self).update_relations
+        return (
+            getattr(method, '__func__', method) is not
+            getattr(Publisher.update_relations, '__func__', Publisher.update_relations)
+        )
+
+    def update_relations(self, old_obj, using=None):
+        """
+        Switches the objects pointing to old_obj over to the instance. Called
+        by publish() (followed by the generic rewrite of all relations).
+        publisher_publish() rewrites the relations of all drafts in bulk and
+        only calls this for each draft if a subclass overrides it (see
+        overrides_update_relations).
+        """
         new_obj = self.instance
         relations.update_relations(
             old_obj=old_obj,
             new_obj=new_obj,
             exclude=relations.ignore_stuff_to_dict(
                 self.update_relations_exclude(old_obj=old_obj)
-            )
+            ),
+            using=self.get_using(using),
         )
 
-    @transaction.atomic
-    def publish(self, validate=True, delete=True, update_relations=True, now=None):
+    @atomic_operation
+    def publish(
+        self,
+        validate=True,
+        delete=True,
+        update_relations=True,
+        now=None,
+        in_database=None,
+        expected_revision=None,
+        using=None,
+    ):
+        """
+        Publishes the draft. All operations take using, the alias of the
+        database to work on (see get_using()).
+        With in_database=True (default: publisher_copy_in_database on the
+        model) the draft is copied to the published row inside the database
+        and a deferred instance of the published version is returned.
+        With expected_revision (only for models with
+        PublisherRevisionModelMixin), PublisherRevisionConflict is raised if
+        the draft was saved since that revision.
+        """
+        assert not self.is_deleted
+        assert expected_revision is None or self.has_revision
         draft = self.get_draft_version()
         if draft != self.instance:
-            return self.get_publisher(draft).publish(validate=validate, delete=delete, update_relations=update_relations)
+            return self.get_publisher(draft).publish(
+                validate=validate,
+                delete=delete,
+                update_relations=update_relations,
+                now=now,
+                in_database=in_database,
+                expected_revision=expected_revision,
+                using=using,
+            )
         assert self.is_draft_version
+        if draft.pk not in self.lock(using=using):
+            # A concurrent publish got here first and deleted the draft.
+            published = self.get_published_version()
+            if published is None:
+                raise draft.DoesNotExist('The draft does not exist anymore.')
+            return published
+        if (
+            expected_revision is not None and
+            draft.publisher_revision != expected_revision
+        ):
+            raise PublisherRevisionConflict(
+                obj=draft,
+                expected_revision=expected_revision,
+                revision=draft.publisher_revision,
+            )
         published = self.get_published_version()
+        model = draft._meta.model
         if validate:
-            draft.publisher_can_publish()
+            with instrumentation.phase(
+                'validate',
+                model=model,
+                operation='publish',
+                using=using,
+            ):
+                draft.publisher_can_publish()
         now = now or timezone.now()
+        if in_database is None:
+            in_database = draft.publisher_copy_in_database
+        started = signals.send_pre(
+            signals.pre_publish,
+            sender=model,
+            pairs=[(draft, published)],
+        )
+        published = self.publish_draft(
+            published=published,
+            delete=delete,
+            update_relations=update_relations,
+            now=now,
+            in_database=in_database,
+            using=using,
+        )
+        signals.send_post(
+            signals.post_publish,
+            sender=model,
+            pairs=[(draft, published)],
+            started=started,
+            using=using,
+        )
+        return published
 
-        # * update the live version with the data from the draft
-        if not published:
-            # There is no published version yet. Create one.
-            published = draft._meta.model()
-            published_created = True
+    def publish_draft(self, published, delete, update_relations, now, in_database, using):
+        # The actual publishing, see publish().
+        draft = self.instance
+        model = draft._meta.model
+        fingerprint = self.get_fingerprint() or ''
+        unchanged = bool(
+            fingerprint and
+            published and
+            published.publisher_fingerprint == fingerprint
+        )
+        published_created = not published
+        if unchanged:
+            # The draft has exactly the same content as the published
+            # version. There is nothing to copy, only the relations are
+            # switched over and the draft goes away.
+            published_publisher = self.get_publisher(published)
         else:
-            published_created = False
-        published.publisher_is_published_version = True
-        published.publisher_published_at = now
-        published_publisher = self.get_publisher(published)
-        published_publisher.copy_object(old_obj=draft)  # saves
+            published_publisher = self.copy_to_published(
+                published=published,
+                fingerprint=fingerprint,
+                now=now,
+                in_database=in_database,
+                using=using,
+            )
+            published = published_publisher.instance
         if update_relations:
             # * find any other objects still pointing to the draft version and
             #   switch them to the live version. (otherwise cascade or set null
             #   would yield unexpected results)
-            published_publisher.update_relations(old_obj=draft)
-            relations.update_relations(
-                old_obj=draft,
-                new_obj=published,
-                exclude=relations.ignore_stuff_to_dict(
-                    self.get_publisher(draft).update_relations_exclude(old_obj=draft)
+            with instrumentation.phase(
+                'update_relations',
+                model=model,
+                operation='publish',
+                using=using,
+            ):
+                published_publisher.update_relations(old_obj=draft, using=using)
+                relations.update_relations(
+                    old_obj=draft,
+                    new_obj=published,
+                    exclude=relations.ignore_stuff_to_dict(
+                        self.get_publisher(draft).update_relations_exclude(old_obj=draft)
+                    ),
+                    using=using,
                 )
-            )
-        if delete:
-            # * Delete draft (self)
-            draft.delete()
-        elif published_created:
-            draft.publisher_published_version = published
-            draft.save()
+        with instrumentation.phase(
+            'delete',
+            model=model,
+            operation='publish',
+            using=using,
+        ):
+            if delete:
+                # * Delete draft (self)
+                relations.delete_object(draft, using=using)
+            elif published_created:
+                draft.publisher_published_version = published
+                draft.save(using=using)
+        self.reset_snapshot()
+        if unchanged:
+            published_publisher.reset_snapshot()
+            return published
+        if in_database:
+            # Already a fresh (deferred) instance.
+            return published
         # Refresh from db to get the latest version without any cached stuff.
         # refresh_from_db() does not work in some cases because parler
         # caches translations at _translations_cache which may remain with stale
-        # data.
-        published = self.instance._meta.model.objects.get(pk=published.pk)
+        # data. It is read from the database that was written to, not from a
+        # replica that may lag behind.
+        with instrumentation.phase(
+            'refetch',
+            model=model,
+            operation='publish',
+            using=using,
+        ):
+            published = model.objects.using(using).get(pk=published.pk)
         return published
 
-    def get_or_create_draft(self):
+    def copy_to_published(self, published, fingerprint, now, in_database, using):
+        # Writes the draft and its relations to its published version
+        # (creating it if needed) and returns the Publisher of the published
+        # version. See publish_draft().
+        draft = self.instance
+        model = draft._meta.model
+        extra_values = {'publisher_published_at': now}
+        if self.has_fingerprint:
+            extra_values['publisher_fingerprint'] = fingerprint
+        # * update the live version with the data from the draft
+        with instrumentation.phase(
+            'copy_object',
+            model=model,
+            operation='publish',
+            using=using,
+        ):
+            if in_database:
+                published = self.copy_to_published_in_database(
+                    published=published,
+                    extra_values=extra_values,
+                    using=using,
+                )
+                published_publisher = self.get_publisher(published)
+            elif not published:
+                # There is no published version yet. Create one.
+                published = model(**extra_values)
+                published.publisher_is_published_version = True
+                published_publisher = self.get_publisher(published)
+                published_publisher.copy_object(old_obj=draft, commit=False)
+                published.save(using=using)
+            else:
+                # Only write the columns that were actually changed on the
+                # draft.
+                published_publisher = self.get_publisher(published)
+                published_publisher.copy_changes(
+                    old_obj=draft,
+                    extra_values=extra_values,
+                    force=(
+                        self.has_fingerprint and
+                        published.publisher_fingerprint != fingerprint
+                    ),
+                    with_relations=False,
+                    using=using,
+                )
+        with instrumentation.phase(
+            'copy_relations',
+            model=model,
+            operation='publish',
+            using=using,
+        ):
+            published_publisher.copy_relations(old_obj=draft)
+        return published_publisher
+
+    def copy_to_published_in_database(self, published, extra_values, using=None):
+        # Writes the draft to its published version (creating it if needed)
+        # with a single UPDATE ... FROM or INSERT ... SELECT.
+        draft = self.instance
+        model = draft._meta.model
+        opts = model._meta
+        copy_fields = get_copy_plan(
+            model,
+            exclude_fields=self.copy_object_exclude_fields(),
+        )
+        values = dict(extra_values, publisher_is_published_version=True)
+        if published:
+            database.copy_row(
+                model=model,
+                from_pk=draft.pk,
+                to_pk=published.pk,
+                copy_fields=copy_fields,
+                values=values,
+                using=using,
+            )
+            pk = published.pk
+        else:
+            values.update({
+                'publisher_published_version_id': None,
+                'publisher_deletion_requested': False,
+            })
+            pk = database.clone_row(
+                model=model,
+                pk=draft.pk,
+                copy_fields=copy_fields,
+                values=values,
+                using=using,
+            )
+        values[opts.pk.attname] = pk
+        return database.get_deferred_instance(model, values, using=using)
+
+    def estimate_publish(self, update_relations=True, delete=True, using=None):
+        """
+        Returns a PublishEstimate of what publish() would do, without changing
+        anything: how many rows of each relation would be switched over to
+        the published version (and which update_relations_exclude() rules
+        apply), how many rows would be deleted together with the draft and
+        how large the copied fields are. It takes a single query.
+        Whatever publisher_copy_relations() copies is not included.
+        Returns None if there is no draft.
+        """
+        draft = self.get_draft_version()
+        if not draft:
+            return None
+        draft_publisher = self.get_publisher(draft)
+        return estimate_publish(
+            draft,
+            copy_fields=get_copy_plan(
+                draft._meta.model,
+                exclude_fields=draft_publisher.copy_object_exclude_fields(),
+            ),
+            exclude=relations.ignore_stuff_to_dict(
+                draft_publisher.update_relations_exclude(old_obj=draft),
+            ),
+            update_relations=update_relations,
+            delete=delete,
+            using=draft_publisher.get_using(using),
+        )
+
+    def get_or_create_draft(self, using=None):
         draft = self.get_draft_version()
         if draft:
             return draft, False
-        return self.create_draft(), True
+        return self.create_draft(using=using), True
 
-    @transaction.atomic
-    def create_draft(self):
+    @atomic_operation
+    def create_draft(self, in_database=None, using=None):
+        """
+        Creates a draft from the published version.
+        With in_database=True (default: publisher_copy_in_database on the
+        model) the row is cloned inside the database and a deferred
+        instance is returned, which only loads fields when accessed.
+        If a draft exists already (e.g created by a concurrent request), it is
+        returned instead.
+        """
+        assert not self.is_deleted
+        if self.instance.pk not in self.lock(using=using):
+            raise self.instance.DoesNotExist(
+                'The published version does not exist anymore.'
+            )
+        existing_draft = self.get_draft_version()
+        if existing_draft:
+            return existing_draft
+        published = self.instance
+        model = published._meta.model
+        started = signals.send_pre(
+            signals.pre_create_draft,
+            sender=model,
+            pairs=[(None, published)],
+        )
         if self.has_pending_deletion_request:
-            self.discard_deletion_request()
-        draft = self.instance._meta.model.objects.get(pk=self.instance.pk)
-        draft.pk = draft.id = None
-        draft.publisher_is_published_version = False
-        draft.publisher_published_version = self.instance
-        draft.save()
-        self.get_publisher(draft).copy_relations(old_obj=self.instance)
-        return refresh_from_db(draft)
-
-    @transaction.atomic
-    def discard_draft(self, update_relations=True):
+            self.discard_deletion_request(using=using)
+        if in_database is None:
+            in_database = self.instance.publisher_copy_in_database
+        with instrumentation.phase(
+            'copy_object',
+            model=model,
+            operation='create_draft',
+            using=using,
+        ):
+            if in_database:
+                draft = self.clone_in_database(using=using)
+            else:
+                draft = model.objects.using(using).get(pk=self.instance.pk)
+                draft.pk = draft.id = None
+                draft.publisher_is_published_version = False
+                draft.publisher_published_version = self.instance
+                if self.has_fingerprint:
+                    draft.publisher_fingerprint = ''
+                if self.has_revision:
+                    # Incremented to 1 by save(), like for new drafts.
+                    draft.publisher_revision = 0
+                draft.save(using=using)
+        with instrumentation.phase(
+            'copy_relations',
+            model=model,
+            operation='create_draft',
+            using=using,
+        ):
+            self.get_publisher(draft).copy_relations(old_obj=self.instance)
+        self.reset_snapshot()
+        if not in_database:
+            with instrumentation.phase(
+                'refetch',
+                model=model,
+                operation='create_draft',
+                using=using,
+            ):
+                draft = refresh_from_db(draft, using=using)
+        signals.send_post(
+            signals.post_create_draft,
+            sender=model,
+            pairs=[(draft, published)],
+            started=started,
+            using=using,
+        )
+        return draft
+
+    def clone_in_database(self, using=None):
+        # Clones the published row into a new draft with INSERT ... SELECT.
+        published = self.instance
+        model = published._meta.model
+        opts = model._meta
+        values = {
+            'publisher_is_published_version': False,
+            'publisher_published_version_id': published.pk,
+            'publisher_deletion_requested': False,
+        }
+        if self.has_revision:
+            # save() is not called, start where a saved new draft would.
+            values['publisher_revision'] = 1
+        pk = database.clone_row(
+            model=model,
+            pk=published.pk,
+            copy_fields=list(get_copy_plan(
+                model,
+                exclude_fields=self.copy_object_exclude_fields(),
+            )) + [opts.get_field('publisher_published_at')],
+            values=values,
+            using=using,
+        )
+        values[opts.pk.attname] = pk
+        return database.get_deferred_instance(model, values, using=using)
+
+    @atomic_operation
+    def discard_draft(self, update_relations=True, using=None):
         draft = self.get_draft_version()
         if not draft:
             return
         published = self.get_published_version()
+        model = draft._meta.model
+        started = signals.send_pre(
+            signals.pre_discard_draft,
+            sender=model,
+            pairs=[(draft, published)],
+        )
         if not published:
-            self.instance.delete()
-            return
-        if update_relations:
-            relations.update_relations(
-                old_obj=draft,
-                new_obj=published,
-                exclude=relations.ignore_stuff_to_dict(
-                    self.update_relations_exclude(old_obj=draft),
+            self.instance.delete(using=using)
+        else:
+            if update_relations:
+                relations.update_relations(
+                    old_obj=draft,
+                    new_obj=published,
+                    exclude=relations.ignore_stuff_to_dict(
+                        self.update_relations_exclude(old_obj=draft),
+                    ),
+                    using=using,
                 )
-            )
-        draft.delete()
+            relations.delete_object(draft, using=using)
+            self.reset_snapshot()
+            self.get_publisher(published).reset_snapshot()
+        signals.send_post(
+            signals.post_discard_draft,
+            sender=model,
+            pairs=[(draft, published)],
+            started=started,
+            using=using,
+        )
 
-    @transaction.atomic
-    def request_deletion(self):
+    @atomic_operation
+    def request_deletion(self, using=None):
+        assert not self.is_deleted
         draft = self.get_draft_version()
         published = self.get_published_version()
+        model = published._meta.model
+        started = signals.send_pre(
+            signals.pre_request_deletion,
+            sender=model,
+            pairs=[(draft, published)],
+        )
         published.publisher_deletion_requested = True
-        published.save(update_fields=['publisher_deletion_requested'])
+        published.save(update_fields=['publisher_deletion_requested'], using=using)
         if draft:
-            self.get_publisher(draft).discard_draft()
+            self.get_publisher(draft).discard_draft(using=using)
+        self.reset_snapshot()
+        self.get_publisher(published).reset_snapshot()
+        signals.send_post(
+            signals.post_request_deletion,
+            sender=model,
+            pairs=[(draft, published)],
+            started=started,
+            using=using,
+        )
         return published
 
-    @transaction.atomic
-    def discard_deletion_request(self):
+    @atomic_operation
+    def discard_deletion_request(self, using=None):
+        assert not self.is_deleted
         published = self.get_published_version()
         published.publisher_deletion_requested = False
-        published.save(update_fields=['publisher_deletion_requested'])
+        published.save(update_fields=['publisher_deletion_requested'], using=using)
+        self.reset_snapshot()
+        self.get_publisher(published).reset_snapshot()
 
-    @transaction.atomic
-    def publish_deletion(self):
+    @atomic_operation
+    def unpublish(self, update_relations=True, using=None):
+        """
+        Takes the published version offline and keeps its content as a
+        draft. If there is a draft already, the published version is deleted
+        (relations pointing to it are switched over to the draft first).
+        Otherwise the published version is turned into the draft.
+        Returns the draft.
+        """
+        published = self.get_published_version()
+        draft = self.get_draft_version()
+        if not published:
+            return draft
+        model = published._meta.model
+        started = signals.send_pre(
+            signals.pre_unpublish,
+            sender=model,
+            pairs=[(draft, published)],
+        )
+        draft = self.unpublish_published(
+            draft=draft,
+            published=published,
+            update_relations=update_relations,
+            using=using,
+        )
+        signals.send_post(
+            signals.post_unpublish,
+            sender=model,
+            pairs=[(draft, published)],
+            started=started,
+            using=using,
+        )
+        return draft
+
+    def unpublish_published(self, draft, published, update_relations=True, using=None):
+        # The actual unpublishing, see unpublish().
+        using = self.get_using(using)
+        if draft:
+            draft.publisher_published_version = None
+            update_fields = ['publisher_published_version']
+            if self.has_schedule:
+                draft.publisher_unpublish_at = None
+                update_fields.append('publisher_unpublish_at')
+            draft.save(using=using, update_fields=update_fields)
+            if update_relations:
+                relations.update_relations(
+                    old_obj=published,
+                    new_obj=draft,
+                    exclude=relations.ignore_stuff_to_dict(
+                        self.get_publisher(draft).update_relations_exclude(old_obj=published)
+                    ),
+                    using=using,
+                )
+            relations.delete_object(published, using=using)
+        else:
+            draft = published
+            draft.publisher_is_published_version = False
+            draft.publisher_published_at = None
+            draft.publisher_deletion_requested = False
+            update_fields = [
+                'publisher_is_published_version',
+                'publisher_published_at',
+                'publisher_deletion_requested',
+            ]
+            if self.has_schedule:
+                draft.publisher_unpublish_at = None
+                update_fields.append('publisher_unpublish_at')
+            if self.has_fingerprint:
+                draft.publisher_fingerprint = ''
+                update_fields.append('publisher_fingerprint')
+            draft.save(using=using, update_fields=update_fields)
+        self.reset_snapshot()
+        return refresh_from_db(draft, using=using)
+
+    @atomic_operation
+    def publish_deletion(self, using=None):
+        """
+        Deletes the published version. With publisher_soft_delete it is only
+        marked as deleted (publisher_deleted_at, it keeps its pk) and purged
+        later by the publisher_worker command.
+        """
         assert self.has_pending_deletion_request
-        self.instance.delete()
-        self.instance.id = self.instance.pk = None
+        model = self.instance._meta.model
+        started = signals.send_pre(
+            signals.pre_publish_deletion,
+            sender=model,
+            pairs=[(None, self.instance)],
+        )
+        if self.instance.publisher_soft_delete:
+            assert self.has_soft_delete
+            self.instance.publisher_deleted_at = timezone.now()
+            self.instance.save(update_fields=['publisher_deleted_at'], using=using)
+        else:
+            self.instance.delete(using=using)
+            self.instance.id = self.instance.pk = None
+        self.reset_snapshot()
+        signals.send_post(
+            signals.post_publish_deletion,
+            sender=model,
+            pairs=[(None, self.instance)],
+            started=started,
+            using=using,
+        )
         return self.instance
 
-    def copy_object(self, old_obj, commit=True):
+    # Async variants of the operations for async views. Each returns an
+    # awaitable that runs the operation (and its transaction) in a worker
+    # thread, see utils.aio.run_in_thread(). The result is the same.
+
+    def apublish(self, **kwargs):
+        return aio.run_in_thread(self.publish, **kwargs)
+
+    def acreate_draft(self, **kwargs):
+        return aio.run_in_thread(self.create_draft, **kwargs)
+
+    def adiscard_draft(self, **kwargs):
+        return aio.run_in_thread(self.discard_draft, **kwargs)
+
+    def arequest_deletion(self, **kwargs):
+        return aio.run_in_thread(self.request_deletion, **kwargs)
+
+    def apublish_deletion(self, **kwargs):
+        return aio.run_in_thread(self.publish_deletion, **kwargs)
+
+    def aunpublish(self, **kwargs):
+        return aio.run_in_thread(self.unpublish, **kwargs)
+
+    def copy_object(self, old_obj, commit=True, using=None):
         new_obj = self.instance
         copy_object(
             new_obj=new_obj,
@@ -234,16 +988,74 @@ class Publisher(object):
             exclude_fields=self.copy_object_exclude_fields(),
         )
         if commit:
-            new_obj.save()
+            new_obj.save(using=using)
             self.get_publisher(new_obj).copy_relations(old_obj=old_obj)
 
+    def copy_changes(self, old_obj, extra_values=None, force=False, with_relations=True, using=None):
+        """
+        Like copy_object(), but only saves the fields that differ between
+        old_obj and the instance (with save(update_fields=...)). If no field
+        changed, the instance is not saved at all and extra_values are not
+        applied (unless force is set). The relations are always copied
+        (unless with_relations is False).
+        Returns the list of changed fields.
+        """
+        new_obj = self.instance
+        exclude_fields = self.copy_object_exclude_fields()
+        changed_fields = get_changed_fields(
+            old_obj=old_obj,
+            new_obj=new_obj,
+            exclude_fields=exclude_fields,
+        )
+        if changed_fields or force:
+            extra_values = extra_values or {}
+            copy_object(
+                new_obj=new_obj,
+                old_obj=old_obj,
+                exclude_fields=exclude_fields,
+                extra_values=extra_values,
+            )
+            new_obj.save(
+                update_fields=(
+                    [field.name for field in changed_fields] +
+                    list(extra_values)
+                ),
+                using=using,
+            )
+        if with_relations:
+            self.copy_relations(old_obj=old_obj)
+        return changed_fields
+
     def copy_relations(self, old_obj):
         self.instance.publisher_copy_relations(old_obj=old_obj)
 
+    def get_fingerprint(self):
+        """
+        Returns the fingerprint of the content of the instance (its fields,
+        the relations it copies and publisher_get_fingerprint_data()), or
+        None if the model has no fingerprint
+        (PublisherFingerprintModelMixin).
+        """
+        if not self.has_fingerprint:
+            return None
+        return get_fingerprint(
+            self.instance,
+            exclude_fields=self.copy_object_exclude_fields(),
+            extra_data=[
+                relations.get_copied_relations_data(
+                    self.instance,
+                    exclude=relations.ignore_stuff_to_dict(
+                        self.update_relations_exclude(old_obj=self.instance),
+                    ),
+                    using=self.instance._state.db,
+                ),
+                self.instance.publisher_get_fingerprint_data(),
+            ],
+        )
+
     def copy_object_exclude_fields(self):
-        return (
-            set(DEFAULT_COPY_EXCLUDE_FIELDS) |
-            set(self.instance.publisher_copy_object_exclude_fields)
+        return get_copy_exclude_fields(
+            self.instance.publisher_copy_object_exclude_fields,
         )
 
     def update_relations_exclude(self, old_obj):
@@ -263,6 +1075,8 @@ class Publisher(object):
 
     def available_actions(self, user):
         actions = {}
+        if self.is_deleted:
+            return actions
         if self.has_pending_deletion_request:
             actions['discard_requested_deletion'] = {}
             actions['publish_deletion'] = {}
@@ -323,28 +1137,79 @@ class Publisher(object):
 
     @property
     def state(self):
-        choices = dict(PUBLISHER_STATE_CHOICES)
+        snapshot = self.snapshot
         state_dict = {
-            'is_published': self.has_published_version,
-            'has_pending_changes': self.has_pending_changes,
-            'has_pending_deletion_request': self.has_pending_deletion_request,
+            'is_published': snapshot.has_published_version,
+            'has_pending_changes': snapshot.has_pending_changes,
+            'has_pending_deletion_request': snapshot.has_pending_deletion_request,
         }
-        if self.has_pending_deletion_request:
-            state_id = 'pending_deletion'
-            css_class = 'pending_deletion'
-        elif self.has_published_version and self.has_pending_changes:
-            state_id = 'pending_changes'
-            css_class = 'dirty'
-        elif self.has_published_version and not self.has_pending_changes:
-            state_id = 'published'
-            css_class = 'published'
-        elif not self.has_published_version and self.has_pending_changes:
-            state_id = 'not_published'
-            css_class = 'unpublished'
-        else:
-            state_id = 'empty'
-            css_class = 'empty'
-        state_dict['identifier'] = state_id
-        state_dict['css_class'] = css_class
-        state_dict['text'] = choices[state_id]
+        state_dict.update(get_state_display(snapshot))
         return state_dict
+
+
+def get_state_display(snapshot):
+    if snapshot.has_pending_deletion_request:
+        state_id = 'pending_deletion'
+        css_class = 'pending_deletion'
+    elif snapshot.has_published_version and snapshot.has_pending_changes:
+        state_id = 'pending_changes'
+        css_class = 'dirty'
+    elif snapshot.has_published_version and not snapshot.has_pending_changes:
+        state_id = 'published'
+        css_class = 'published'
+    elif not snapshot.has_published_version and snapshot.has_pending_changes:
+        state_id = 'not_published'
+        css_class = 'unpublished'
+    else:
+        state_id = 'empty'
+        css_class = 'empty'
+    return {
+        'identifier': state_id,
+        'css_class': css_class,
+        'text': dict(PUBLISHER_STATE_CHOICES)[state_id],
+    }
+
+
+def prefetch_counterparts(objs, queryset=None):
+    """
+    Loads the draft/published counterparts of all objs (instances of the same
+    publisher model) with one query and caches them on the objects, so
+    get_draft_version() and get_published_version() don't query anymore.
+    """
+    objs = [obj for obj in objs if obj.pk]
+    if not objs:
+        return
+    opts = objs[0]._meta
+    published_field = opts.get_field('publisher_published_version')
+    draft_rel = opts.get_field('publisher_draft_version')
+    published_pks = set()
+    draft_published_ids = set()
+    for obj in objs:
+        if obj.publisher_is_published_version:
+            published_pks.add(obj.pk)
+        elif obj.publisher_published_version_id:
+            draft_published_ids.add(obj.publisher_published_version_id)
+    if queryset is None:
+        queryset = opts.model._base_manager.all()
+    drafts = {}
+    published = {}
+    if published_pks or draft_published_ids:
+        for counterpart in queryset.filter(
+            Q(publisher_published_version__in=published_pks) |
+            Q(pk__in=draft_published_ids)
+        ):
+            if counterpart.publisher_is_published_version:
+                published[counterpart.pk] = counterpart
+            else:
+                drafts[counterpart.publisher_published_version_id] = counterpart
+    for obj in objs:
+        if obj.publisher_is_published_version:
+            draft = drafts.get(obj.pk)
+            set_cached_value(obj, draft_rel, draft)
+            if draft is not None:
+                set_cached_value(draft, published_field, obj)
+        elif obj.publisher_published_version_id:
+            counterpart = published.get(obj.publisher_published_version_id)
+            if counterpart is not None:
+                set_cached_value(obj, published_field, counterpart)
+                set_cached_value(counterpart, draft_rel, obj)
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import random
+import threading
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS
+
+from .conf import get_setting
+
+_local = threading.local()
+
+
+@contextmanager
+def pin_to_primary():
+    """
+    Keeps PublisherReplicaRouter from sending reads in the block (in this
+    thread) to a replica, e.g. to read what was just written.
+    """
+    _local.pinned = getattr(_local, 'pinned', 0) + 1
+    try:
+        yield
+    finally:
+        _local.pinned -= 1
+
+
+def is_pinned_to_primary():
+    return bool(getattr(_local, 'pinned', 0))
+
+
+class PublisherReplicaRouter(object):
+    """
+    Sends reads of published content (querysets filtered with
+    publisher_published()) to one of PUBLISHER_REPLICA_DATABASES, which are
+    replicas of the default database. Everything else is left to the other
+    routers (or the default database).
+    Writes of instances that were loaded from a replica go to the default
+    database.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = get_setting('REPLICA_DATABASES')
+        if (
+            replicas and
+            hints.get('publisher_published') and
+            not is_pinned_to_primary()
+        ):
+            return random.choice(replicas)
+        return None
+
+    def db_for_write(self, model, **hints):
+        instance = hints.get('instance')
+        if (
+            instance is not None and
+            instance._state.db in get_setting('REPLICA_DATABASES')
+        ):
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas have the same rows as the default database.
+        databases = {DEFAULT_DB_ALIAS}
+        databases.update(get_setting('REPLICA_DATABASES'))
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
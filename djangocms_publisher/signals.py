@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from timeit import default_timer
+
+from django.db import transaction
+from django.dispatch import Signal
+
+# Sent around the publisher operations with the model as the sender and:
+#  - pairs: a list of (draft, published) tuples of the affected objects.
+#    Either one may be None (e.g there is no published version before a
+#    first publish). In the post_* signals, deleted objects have pk None.
+#  - bulk: True if the signal is sent once for a whole queryset (e.g
+#    publisher_publish()), so receivers can batch their own work.
+# The post_* signals also get duration: the time the operation took (in
+# seconds).
+pre_publish = Signal(providing_args=['pairs', 'bulk'])
+post_publish = Signal(providing_args=['pairs', 'bulk', 'duration'])
+pre_create_draft = Signal(providing_args=['pairs', 'bulk'])
+post_create_draft = Signal(providing_args=['pairs', 'bulk', 'duration'])
+pre_discard_draft = Signal(providing_args=['pairs', 'bulk'])
+post_discard_draft = Signal(providing_args=['pairs', 'bulk', 'duration'])
+pre_request_deletion = Signal(providing_args=['pairs', 'bulk'])
+post_request_deletion = Signal(providing_args=['pairs', 'bulk', 'duration'])
+pre_publish_deletion = Signal(providing_args=['pairs', 'bulk'])
+post_publish_deletion = Signal(providing_args=['pairs', 'bulk', 'duration'])
+pre_unpublish = Signal(providing_args=['pairs', 'bulk'])
+post_unpublish = Signal(providing_args=['pairs', 'bulk', 'duration'])
+
+# The post_* signals are sent inside the transaction of the operation: it
+# can still be rolled back and other connections don't see the changes yet.
+# The *_on_commit variants are sent with the same arguments once the
+# transaction is committed, e.g. to notify search indexes or other processes.
+post_publish_on_commit = Signal(providing_args=['pairs', 'bulk', 'duration'])
+post_create_draft_on_commit = Signal(providing_args=['pairs', 'bulk', 'duration'])
+post_discard_draft_on_commit = Signal(providing_args=['pairs', 'bulk', 'duration'])
+post_request_deletion_on_commit = Signal(providing_args=['pairs', 'bulk', 'duration'])
+post_publish_deletion_on_commit = Signal(providing_args=['pairs', 'bulk', 'duration'])
+post_unpublish_on_commit = Signal(providing_args=['pairs', 'bulk', 'duration'])
+
+_on_commit_signals = {
+    post_publish: post_publish_on_commit,
+    post_create_draft: post_create_draft_on_commit,
+    post_discard_draft: post_discard_draft_on_commit,
+    post_request_deletion: post_request_deletion_on_commit,
+    post_publish_deletion: post_publish_deletion_on_commit,
+    post_unpublish: post_unpublish_on_commit,
+}
+
+
+def send_pre(signal, sender, pairs, bulk=False):
+    # Returns the start time to pass to send_post().
+    signal.send(sender=sender, pairs=pairs, bulk=bulk)
+    return default_timer()
+
+
+def send_post(signal, sender, pairs, started, bulk=False, using=None):
+    # using is the database of the transaction to wait for with the
+    # *_on_commit variant of signal.
+    kwargs = {
+        'sender': sender,
+        'pairs': pairs,
+        'bulk': bulk,
+        'duration': default_timer() - started,
+    }
+    signal.send(**kwargs)
+    on_commit_signal = _on_commit_signals[signal]
+    if on_commit_signal.has_listeners(sender):
+        transaction.on_commit(
+            lambda: on_commit_signal.send(**kwargs),
+            using=using,
+        )
@@ -0,0 +1,44 @@
+// Polls the status of a background publisher job and continues to the
+// published object once it is done.
+(function () {
+    'use strict';
+
+    var POLL_INTERVAL = 1000;
+
+    function poll(element) {
+        var request = new XMLHttpRequest();
+
+        request.open('GET', element.getAttribute('data-status-url'));
+        request.setRequestHeader('X-Requested-With', 'XMLHttpRequest');
+        request.onload = function () {
+            var data;
+
+            if (request.status !== 200) {
+                window.setTimeout(function () { poll(element); }, POLL_INTERVAL);
+                return;
+            }
+            data = JSON.parse(request.responseText);
+            element.setAttribute('data-status', data.status);
+            if (data.status === 'done') {
+                window.location.href = data.url;
+            } else if (data.status === 'failed') {
+                element.querySelector('.djangocms-publisher-job-message').textContent = (
+                    element.getAttribute('data-failed-message') + ' ' + data.error
+                );
+            } else {
+                window.setTimeout(function () { poll(element); }, POLL_INTERVAL);
+            }
+        };
+        request.send();
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        var elements = document.querySelectorAll('.djangocms-publisher-job');
+
+        Array.prototype.forEach.call(elements, function (element) {
+            if (element.getAttribute('data-status') !== 'failed') {
+                poll(element);
+            }
+        });
+    });
+}());
@@ -9,6 +9,7 @@ from . import models
 
 
 class ThingAdmin(PublisherAdminMixin, admin.ModelAdmin):
+    publisher_check_revision = True
     list_display = (
         'name',
         'a_boolean',
@@ -29,7 +30,13 @@ class ThingAdmin(PublisherAdminMixin, admin.ModelAdmin):
                 'name',
                 'a_boolean',
             ),
-        })
+        }),
+        ('Scheduling', {
+            'fields': (
+                'publisher_publish_at',
+                'publisher_unpublish_at',
+            ),
+        }),
     ]
 
     def get_changelist(self, request, **kwargs):
@@ -45,6 +52,7 @@ class ThingAdmin(PublisherAdminMixin, admin.ModelAdmin):
                     super(DraftOrLiveOnlyChangeList, self)
                     .get_queryset(request)
                     .publisher_draft_or_published_only_prefer_published()
+                    .publisher_with_state()
                 )
         return DraftOrLiveOnlyChangeList
 
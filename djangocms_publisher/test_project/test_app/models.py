@@ -1,13 +1,19 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import uuid
+
 from django.db import models
 from django.db.models import Q
 from django.utils.encoding import python_2_unicode_compatible
 
 from djangocms_publisher.models import (
+    PublisherFingerprintModelMixin,
     PublisherModelMixin,
     PublisherQuerySetMixin,
+    PublisherRevisionModelMixin,
+    PublisherScheduleModelMixin,
+    PublisherSoftDeleteModelMixin,
 )
 
 
@@ -38,7 +44,14 @@ class ThingQuerySet(PublisherQuerySetMixin, models.QuerySet):
 
 
 @python_2_unicode_compatible
-class Thing(PublisherModelMixin, models.Model):
+class Thing(
+    PublisherFingerprintModelMixin,
+    PublisherRevisionModelMixin,
+    PublisherScheduleModelMixin,
+    PublisherSoftDeleteModelMixin,
+    PublisherModelMixin,
+    models.Model,
+):
     name = models.CharField(max_length=255)
     a_boolean = models.BooleanField(blank=True, default=False)
 
@@ -55,6 +68,9 @@ class Thing(PublisherModelMixin, models.Model):
     def __repr__(self):
         return _repr(self, extra={'type': 'published' if self.publisher_is_published_version else 'draft'})
 
+    def get_absolute_url(self):
+        return '/things/{}/'.format(self.pk)
+
     def can_publish(self):
         assert self.is_draft
         # FOR SUBCLASSES
@@ -100,3 +116,19 @@ class ExternalThing(models.Model):
 
     def __repr__(self):
         return _repr(self)
+
+
+class KeyedThing(PublisherSoftDeleteModelMixin, PublisherModelMixin, models.Model):
+    # Referenced by a ForeignKey with to_field. Every version has its own key.
+    key = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    name = models.CharField(max_length=255)
+
+    publisher_copy_object_exclude_fields = ('key',)
+
+
+class KeyedThingReference(models.Model):
+    keyed_thing = models.ForeignKey(
+        KeyedThing,
+        to_field='key',
+        related_name='references',
+    )
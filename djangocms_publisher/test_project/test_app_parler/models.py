@@ -9,12 +9,12 @@ from parler.models import TranslatableModel
 
 from djangocms_publisher.contrib.parler.models import (
     ParlerPublisherModelMixin,
+    ParlerPublisherQuerySetMixin,
     ParlerPublisherTranslatedFields,
 )
-from djangocms_publisher.models import PublisherQuerySetMixin
 
 
-class ParlerThingQuerySet(PublisherQuerySetMixin, TranslatableQuerySet):
+class ParlerThingQuerySet(ParlerPublisherQuerySetMixin, TranslatableQuerySet):
     def search(self, term):
         return self.filter(
             Q(name__icontains=term) |
@@ -1,11 +1,17 @@
 #-*- coding: utf-8 -*-
 from __future__ import absolute_import
 
+from datetime import timedelta
+
+from django.core.management import call_command
 from django.core.urlresolvers import reverse
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.utils import timezone
 
 from . import helpers
-from ..test_project.test_app.models import Thing
+from ..models import PublisherJob
+from ..test_project.test_app.models import ExternalThing, Thing
+from ..utils import scheduling
 
 
 class PublisherAdminUrlsTests(TestCase):
@@ -31,3 +37,127 @@ class PublisherAdminUrlsTests(TestCase):
         info = obj._meta.app_label, obj._meta.model_name
         response = self.client.get(reverse('admin:{}_{}_change'.format(*info), args=(obj.pk,)))
         self.assertEqual(response.status_code, 200)
+
+    @override_settings(PUBLISHER_ADMIN_ASYNC_PUBLISH=True)
+    def test_publish_async(self):
+        draft = Thing.objects.create(name='Test thing')
+        response = self.client.post(
+            draft.publisher.admin_urls.publish(),
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+        self.assertEqual(response.status_code, 202)
+        data = response.json()
+        self.assertEqual(data['status'], PublisherJob.STATUS_PENDING)
+        self.assertTrue(Thing.objects.filter(pk=draft.pk).exists())
+        response = self.client.get(data['url'])
+        self.assertEqual(response.status_code, 200)
+
+        call_command('publisher_worker', verbosity=0)
+        response = self.client.get(data['status_url'])
+        self.assertEqual(response.json()['status'], PublisherJob.STATUS_DONE)
+        published = Thing.objects.publisher_published().get()
+        self.assertEqual(
+            response.json()['url'],
+            published.publisher.admin_urls.change(),
+        )
+        self.assertFalse(Thing.objects.filter(pk=draft.pk).exists())
+
+    @override_settings(PUBLISHER_ADMIN_ASYNC_PUBLISH=True)
+    def test_publish_async_onsite(self):
+        draft = Thing.objects.create(name='Test thing')
+        session = self.client.session
+        session['cms_edit'] = True
+        session.save()
+        response = self.client.post(
+            draft.publisher.admin_urls.publish() + '?redirect=onsite',
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+        call_command('publisher_worker', verbosity=0)
+        response = self.client.get(response.json()['status_url'])
+        published = Thing.objects.publisher_published().get()
+        self.assertEqual(
+            response.json()['url'],
+            '{}?redirect=onsite&edit_off='.format(published.get_absolute_url()),
+        )
+        # The status requests don't change the edit mode.
+        self.assertTrue(self.client.session['cms_edit'])
+
+    def test_enqueue_pending_job_once(self):
+        draft = Thing.objects.create(name='Test thing')
+        job = PublisherJob.objects.enqueue(draft)
+        self.assertEqual(PublisherJob.objects.enqueue(draft), job)
+        PublisherJob.objects.filter(pk=job.pk).update(
+            status=PublisherJob.STATUS_DONE,
+        )
+        self.assertNotEqual(PublisherJob.objects.enqueue(draft), job)
+
+    def test_process_jobs(self):
+        draft = Thing.objects.create(name='Test thing')
+        job = PublisherJob.objects.enqueue(draft)
+        self.assertEqual(scheduling.process_jobs(10, models=[ExternalThing]), 0)
+        # A job that is running for too long (e.g. its worker died) is
+        # claimed again.
+        PublisherJob.objects.filter(pk=job.pk).update(
+            status=PublisherJob.STATUS_RUNNING,
+            started_at=timezone.now(),
+        )
+        self.assertEqual(scheduling.process_jobs(10), 0)
+        PublisherJob.objects.filter(pk=job.pk).update(
+            started_at=timezone.now() - timedelta(hours=2),
+        )
+        self.assertEqual(scheduling.process_jobs(10, models=[Thing]), 1)
+        self.assertEqual(
+            PublisherJob.objects.get(pk=job.pk).status,
+            PublisherJob.STATUS_DONE,
+        )
+
+    def test_change_post_with_stale_revision(self):
+        draft = Thing.objects.create(name='Test thing')
+        url = draft.publisher.admin_urls.change()
+        response = self.client.get(url)
+        self.assertContains(response, 'name="publisher_expected_revision"')
+        revision = draft.publisher_revision
+        # Someone else saves the draft in the meantime.
+        draft.name = 'Changed by someone else'
+        draft.save()
+        data = {'name': 'My change', 'publisher_expected_revision': revision}
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'changed by someone else in the meantime')
+        self.assertEqual(Thing.objects.get(pk=draft.pk).name, 'Changed by someone else')
+
+        data['publisher_expected_revision'] = draft.publisher_revision
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Thing.objects.get(pk=draft.pk).name, 'My change')
+
+    def test_change_post_schedule(self):
+        draft = Thing.objects.create(name='Test thing')
+        url = draft.publisher.admin_urls.change()
+        response = self.client.get(url)
+        self.assertContains(response, 'name="publisher_publish_at_0"')
+        data = {
+            'name': 'Test thing',
+            'publisher_expected_revision': draft.publisher_revision,
+            'publisher_publish_at_0': '2030-01-01',
+            'publisher_publish_at_1': '12:00:00',
+            'publisher_unpublish_at_0': '',
+            'publisher_unpublish_at_1': '',
+        }
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 302)
+        draft = Thing.objects.get(pk=draft.pk)
+        self.assertEqual(draft.publisher_publish_at.year, 2030)
+        self.assertIsNone(draft.publisher_unpublish_at)
+
+    def test_change_post_publish_with_revision(self):
+        draft = Thing.objects.create(name='Test thing')
+        data = {
+            'name': 'My change',
+            'publisher_expected_revision': draft.publisher_revision,
+            '_publish': '1',
+        }
+        response = self.client.post(draft.publisher.admin_urls.change(), data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Thing.objects.publisher_published().get().name, 'My change')
+        self.assertFalse(Thing.objects.filter(pk=draft.pk).exists())
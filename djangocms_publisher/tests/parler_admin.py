@@ -8,7 +8,7 @@ from . import helpers
 from ..test_project.test_app_parler.models import ParlerThing
 
 
-class PublisherAdminUrlsTests(TestCase):
+class ParlerPublisherAdminUrlsTests(TestCase):
     def setUp(self):
         self.superuser = helpers.create_superuser()
         self.client.login(username='admin', password='secret')
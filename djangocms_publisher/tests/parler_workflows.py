@@ -2,8 +2,13 @@
 from __future__ import absolute_import
 
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import connection
+from django.test import override_settings
 from django.test.testcases import TestCase
+from django.test.utils import CaptureQueriesContext
 
+from djangocms_publisher import instrumentation
+from djangocms_publisher.identity import identity_map
 from djangocms_publisher.test_project.test_app.models import Thing
 from djangocms_publisher.test_project.test_app_parler.models import ParlerThing
 from djangocms_publisher.utils.copying import refresh_from_db
@@ -117,6 +122,143 @@ class ParlerTranslationPublishTestCase(TestCase):
             published_de.get_translation('de').name,
         )
 
+    def test_queryset_publish(self):
+        draft = ParlerThing()
+        draft.save()
+        draft.translations.create(language_code='en', name='EN Translation')
+        draft.translations.create(language_code='de', name='DE Translation')
+
+        result = ParlerThing.objects.all().publisher_publish()
+
+        published = result.get()
+        self.assertTrue(published.publisher_is_published_version)
+        self.assertEqual(
+            set(published.translations.values_list('name', flat=True)),
+            {'EN Translation', 'DE Translation'},
+        )
+        self.assertFalse(ParlerThing.objects.filter(id=draft.pk).exists())
+
+    def test_queryset_publish_existing(self):
+        published_objs = []
+        for i in range(3):
+            published = ParlerThing(publisher_is_published_version=True)
+            published.save()
+            published.translations.create(language_code='en', name='EN {}'.format(i))
+            published.translations.create(language_code='de', name='DE {}'.format(i))
+            published_de = refresh_from_db(published)
+            published_de.set_current_language('de')
+            draft = published_de.publisher.create_draft()
+            draft.name = 'DE {} changed'.format(i)
+            draft.save()
+            published_objs.append(published)
+        # A new language on one of the drafts.
+        draft.translations.create(language_code='fr', name='FR 2')
+
+        with CaptureQueriesContext(connection) as queries:
+            result = ParlerThing.objects.all().publisher_publish()
+        # The translations are written in bulk: one INSERT, one UPDATE and
+        # one DELETE for all of them.
+        self.assertEqual(
+            sorted(
+                query['sql'].split(' ', 1)[0] for query in queries
+                if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE')) and
+                '"test_app_parler_parlerthing_translation"' in query['sql'].split(' WHERE ')[0]
+            ),
+            ['DELETE', 'INSERT', 'UPDATE'],
+        )
+        self.assertEqual(
+            set(result.values_list('pk', flat=True)),
+            {published.pk for published in published_objs},
+        )
+        self.assertEqual(ParlerThing.objects.publisher_drafts().count(), 0)
+        self.assertEqual(
+            sorted(
+                ParlerThing._parler_meta.root_model.objects
+                .values_list('master_id', 'language_code', 'name')
+            ),
+            sorted(
+                [(published.pk, 'en', 'EN {}'.format(i)) for i, published in enumerate(published_objs)] +
+                [(published.pk, 'de', 'DE {} changed'.format(i)) for i, published in enumerate(published_objs)] +
+                [(published_objs[2].pk, 'fr', 'FR 2')]
+            ),
+        )
+
+    def test_instrumentation(self):
+        draft = ParlerThing.objects.create()
+        draft.translations.create(language_code='en', name='EN Translation')
+        draft.translations.create(language_code='de', name='DE Translation')
+        draft_de = refresh_from_db(draft)
+        draft_de.set_current_language('de')
+        instrumentation.aggregator.reset()
+        with override_settings(PUBLISHER_INSTRUMENTATION=True):
+            draft_de.publisher.publish()
+            ParlerThing.objects.filter(pk=draft.pk).publisher_publish()
+        # Publishing a translation publishes the master as well.
+        self.assertEqual(
+            {
+                (label, operation)
+                for label, operation, phase in instrumentation.aggregator.get_stats()
+            },
+            {
+                ('test_app_parler.ParlerThing', 'publish'),
+                ('test_app_parler.ParlerThing', 'publish_translation'),
+                ('test_app_parler.ParlerThing', 'publisher_publish'),
+                ('test_app_parler.ParlerThingTranslation', 'publish_translation'),
+                ('test_app_parler.ParlerThingTranslation', 'publisher_publish'),
+            },
+        )
+
+    def test_publisher_prefetch_counterparts(self):
+        published = ParlerThing(publisher_is_published_version=True)
+        published.save()
+        published.translations.create(language_code='en', name='EN Translation')
+        published.translations.create(language_code='de', name='DE Translation')
+        published_de = refresh_from_db(published)
+        published_de.set_current_language('de')
+        published_de.publisher.create_draft()
+
+        with self.assertNumQueries(4):
+            # things, their translations, counterparts, their translations
+            objs = list(
+                ParlerThing.objects
+                .prefetch_related('translations')
+                .publisher_prefetch_counterparts()
+            )
+            states = {}
+            for obj in objs:
+                for translation in obj.translations.all():
+                    states[(obj.publisher_is_published_version, translation.language_code)] = (
+                        translation.publisher.state['identifier']
+                    )
+        self.assertEqual(states, {
+            (True, 'en'): 'published',
+            (True, 'de'): 'pending_changes',
+            (False, 'de'): 'pending_changes',
+        })
+
+    def test_identity_map_languages(self):
+        published = ParlerThing(publisher_is_published_version=True)
+        published.save()
+        published.translations.create(language_code='en', name='EN Translation')
+        published.translations.create(language_code='de', name='DE Translation')
+        for language_code in ('en', 'de'):
+            obj = refresh_from_db(published)
+            obj.set_current_language(language_code)
+            obj.publisher.create_draft()
+        published_en = refresh_from_db(published)
+        published_en.set_current_language('en')
+        published_de = refresh_from_db(published)
+        published_de.set_current_language('de')
+        with identity_map():
+            # Both share the loaded draft master, but switch the language of
+            # their own copy.
+            draft_en = published_en.publisher.get_draft_version()
+            draft_de = published_de.publisher.get_draft_version()
+            self.assertEqual(draft_en.get_current_language(), 'en')
+            self.assertEqual(draft_de.get_current_language(), 'de')
+            self.assertEqual(draft_en.name, 'EN Translation')
+            self.assertEqual(draft_de.name, 'DE Translation')
+
     # def test_request_translation_deletion(self):
     #     published = ParlerThing(publisher_is_published_version=True)
     #     published.save()
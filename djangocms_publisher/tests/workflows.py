@@ -1,14 +1,51 @@
 #-*- coding: utf-8 -*-
 from __future__ import absolute_import
 
-from django.test.testcases import TestCase
+from collections import OrderedDict
+from datetime import timedelta
+from unittest import skipIf
 
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.utils import ConnectionDoesNotExist
+from django.db.models.signals import post_delete, post_save
+from django.test import override_settings
+from django.test.testcases import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.functional import cached_property
+from django.utils.six import StringIO
+
+from djangocms_publisher import instrumentation, signals
+from djangocms_publisher.exceptions import PublisherRevisionConflict
+from djangocms_publisher.identity import identity_map
+from djangocms_publisher.publisher import Publisher
+from djangocms_publisher.routers import PublisherReplicaRouter, pin_to_primary
 from djangocms_publisher.test_project.test_app.models import (
     ExternalThing,
+    KeyedThing,
+    KeyedThingReference,
     Thing,
     ThingAttachment,
 )
-from djangocms_publisher.utils.copying import refresh_from_db
+from djangocms_publisher.test_project.test_app_parler.models import ParlerThing
+from djangocms_publisher.utils import aio, relations, scheduling
+from djangocms_publisher.utils.copying import (
+    copy_object,
+    get_changed_fields,
+    get_copy_exclude_fields,
+    get_copy_plan,
+    get_fields_to_copy,
+    refresh_from_db,
+)
+
+
+class WriteNowhereRouter(object):
+    # Sends the writes of Thing to a database that does not exist.
+    def db_for_write(self, model, **hints):
+        if model is Thing:
+            return 'nowhere'
+        return None
 
 
 class PublishTestCase(TestCase):
@@ -158,3 +195,937 @@ class PublishTestCase(TestCase):
         self.assertFalse(published.publisher.has_pending_deletion_request)
         published = refresh_from_db(published)
         self.assertFalse(published.publisher.has_pending_deletion_request)
+
+    def test_queryset_publish(self):
+        new_draft = self._create_draft(name='New', attachment_names=('att1',))
+        published, draft = self._create_published_with_draft(name='Existing')
+        draft.name = 'Existing altered'
+        draft.save()
+        external_thing = ExternalThing.objects.create(name='ext thing', thing=draft)
+        external_thing.things = [new_draft]
+
+        result = Thing.objects.all().publisher_publish()
+
+        self.assertEqual(Thing.objects.publisher_drafts().count(), 0)
+        self.assertEqual(Thing.objects.publisher_published().count(), 2)
+        self.assertEqual(
+            set(result.values_list('name', flat=True)),
+            {'New', 'Existing altered'},
+        )
+        self.assertEqual(refresh_from_db(published).name, 'Existing altered')
+        new_published = result.get(name='New')
+        self.assertEqual(
+            list(new_published.attachments.values_list('name', flat=True)),
+            ['att1'],
+        )
+        external_thing = refresh_from_db(external_thing)
+        self.assertEqual(external_thing.thing, published)
+        self.assertEqual(external_thing.things.first(), new_published)
+
+    def test_queryset_publish_update_relations_hook(self):
+        calls = []
+
+        class HookPublisher(Publisher):
+            def update_relations(self, old_obj, using=None):
+                calls.append((old_obj.pk, self.instance.pk))
+                super(HookPublisher, self).update_relations(old_obj, using=using)
+
+        draft = self._create_draft(name='Thing1')
+        self.assertFalse(draft.publisher.overrides_update_relations)
+        publisher = Thing.publisher
+        Thing.publisher = cached_property(
+            lambda obj: HookPublisher(instance=obj, name='publisher')
+        )
+        try:
+            published = Thing.objects.filter(pk=draft.pk).publisher_publish().get()
+        finally:
+            Thing.publisher = publisher
+        self.assertEqual(calls, [(draft.pk, published.pk)])
+
+    def test_queryset_publish_without_delete(self):
+        draft = self._create_draft(name='New')
+        result = Thing.objects.filter(pk=draft.pk).publisher_publish(delete=False)
+        published = result.get()
+        draft = refresh_from_db(draft)
+        self.assertEqual(draft.publisher_published_version, published)
+        self.assertEqual(published.name, 'New')
+
+    def test_update_relations_bulk(self):
+        pairs = [
+            (self._create_draft('draft1'), self._create_published('published1')),
+            (self._create_draft('draft2'), self._create_published('published2')),
+        ]
+        external_things = []
+        for draft, published in pairs:
+            external_thing = ExternalThing.objects.create(name='ext', thing=draft)
+            external_thing.things = [draft]
+            external_things.append(external_thing)
+        with self.assertNumQueries(len(relations.get_related_fields(Thing))):
+            relations.update_relations_bulk(OrderedDict(pairs))
+        for external_thing, (draft, published) in zip(external_things, pairs):
+            external_thing = refresh_from_db(external_thing)
+            self.assertEqual(external_thing.thing, published)
+            self.assertEqual(list(external_thing.things.all()), [published])
+
+    def test_relations_plan(self):
+        plan = relations.get_relations_plan(Thing)
+        self.assertIs(plan, relations.get_relations_plan(Thing))
+        rewrites = {(rewrite.model, rewrite.field_name) for rewrite in plan.rewrites}
+        self.assertIn((ThingAttachment, 'thing'), rewrites)
+        self.assertIn((ExternalThing, 'thing'), rewrites)
+        self.assertIn((ExternalThing.things.through, 'things'), rewrites)
+
+    def test_copy_object_does_not_fetch_foreign_keys(self):
+        draft = self._create_draft('a Thing', attachment_names=('att1',))
+        attachment = ThingAttachment.objects.get()
+        new_attachment = ThingAttachment()
+        with self.assertNumQueries(0):
+            copy_object(old_obj=attachment, new_obj=new_attachment)
+        self.assertEqual(new_attachment.thing_id, draft.pk)
+        self.assertEqual(new_attachment.name, 'att1')
+        self.assertIs(
+            get_copy_plan(ThingAttachment),
+            get_copy_plan(ThingAttachment, exclude_fields=()),
+        )
+        self.assertIs(
+            get_copy_exclude_fields(['name', 'thing']),
+            get_copy_exclude_fields(('thing', 'name')),
+        )
+
+    def test_get_fields_to_copy(self):
+        draft = self._create_draft('a Thing', attachment_names=('att1',))
+        attachment = ThingAttachment.objects.get()
+        with self.assertNumQueries(0):
+            fields = get_fields_to_copy(attachment, by_attname=True)
+        self.assertEqual(fields, {'thing_id': draft.pk, 'name': 'att1'})
+        self.assertEqual(
+            get_fields_to_copy(attachment),
+            {'thing': draft, 'name': 'att1'},
+        )
+
+    def test_state_snapshot(self):
+        published, draft = self._create_published_with_draft(name='Thing')
+        draft = refresh_from_db(draft)
+        with self.assertNumQueries(1):
+            state = draft.publisher.state
+            draft.publisher.status_text
+            draft.publisher.available_actions(user=None)
+            self.assertEqual(draft.publisher.get_published_version(), published)
+        self.assertEqual(state['identifier'], 'pending_changes')
+
+        published = refresh_from_db(published)
+        with self.assertNumQueries(1):
+            self.assertEqual(published.publisher.state['identifier'], 'pending_changes')
+            self.assertEqual(published.publisher.get_draft_version(), draft)
+
+    def test_publisher_with_state(self):
+        self._create_draft(name='draft')
+        self._create_published(name='published')
+        self._create_published_with_draft(name='pending')
+        published = self._create_published(name='deletion')
+        published.publisher.request_deletion()
+        with self.assertNumQueries(1):
+            states = {
+                obj.name + (' draft' if obj.publisher.is_draft_version else ''): obj.publisher.state['identifier']
+                for obj in Thing.objects.publisher_with_state()
+            }
+        self.assertEqual(states, {
+            'draft draft': 'not_published',
+            'published': 'published',
+            'pending': 'pending_changes',
+            'pending draft': 'pending_changes',
+            'deletion': 'pending_deletion',
+        })
+
+    def test_publisher_prefetch_counterparts(self):
+        self._create_draft(name='draft')
+        self._create_published(name='published')
+        self._create_published_with_draft(name='pending')
+        with self.assertNumQueries(2):
+            objs = list(Thing.objects.publisher_prefetch_counterparts())
+            for obj in objs:
+                obj.publisher.state
+                draft = obj.publisher.get_draft_version()
+                published = obj.publisher.get_published_version()
+                if draft and published:
+                    self.assertEqual(draft.publisher_published_version_id, published.pk)
+                    self.assertEqual(draft.name, 'pending')
+                    self.assertEqual(published.name, 'pending')
+
+    def test_create_draft_in_database(self):
+        published = self._create_published(name='Published', attachment_names=('att1',))
+        published.a_boolean = True
+        published.save()
+        published = refresh_from_db(published)
+        draft = published.publisher.create_draft(in_database=True)
+        self.assertTrue(draft.publisher.is_draft_version)
+        self.assertEqual(draft.publisher_published_version_id, published.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(draft.name, 'Published')
+        draft = refresh_from_db(draft)
+        self.assertTrue(draft.a_boolean)
+        self.assertEqual(draft.publisher_published_at, published.publisher_published_at)
+        self.assertEqual(
+            list(draft.attachments.values_list('name', flat=True)),
+            ['att1'],
+        )
+        self.assertEqual(Thing.objects.publisher_drafts().count(), 1)
+
+        # The deferred fields are loaded with one query for comparing.
+        draft.publisher.discard_draft()
+        draft = published.publisher.create_draft(in_database=True)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_changed_fields(draft, published), [])
+
+    def test_publish_in_database(self):
+        draft = self._create_draft(name='Thing1', attachment_names=('att1',))
+        draft.a_boolean = True
+        draft.save()
+        external = ExternalThing.objects.create(name='external', thing=draft)
+        published = draft.publisher.publish(in_database=True)
+        self.assertTrue(published.publisher.is_published_version)
+        with self.assertNumQueries(1):
+            self.assertEqual(published.name, 'Thing1')
+        published = refresh_from_db(published)
+        self.assertTrue(published.a_boolean)
+        self.assertIsNotNone(published.publisher_published_at)
+        self.assertEqual(
+            list(published.attachments.values_list('name', flat=True)),
+            ['att1'],
+        )
+        self.assertEqual(refresh_from_db(external).thing_id, published.pk)
+        self.assertEqual(Thing.objects.publisher_drafts().count(), 0)
+
+        # Publishing again overwrites the existing published row.
+        draft = published.publisher.create_draft()
+        draft.name = 'Thing1 changed'
+        draft.a_boolean = False
+        draft.save()
+        republished = draft.publisher.publish(in_database=True)
+        self.assertEqual(republished.pk, published.pk)
+        republished = refresh_from_db(republished)
+        self.assertEqual(republished.name, 'Thing1 changed')
+        self.assertFalse(republished.a_boolean)
+        self.assertTrue(republished.publisher_is_published_version)
+        self.assertGreater(
+            republished.publisher_published_at,
+            published.publisher_published_at,
+        )
+        self.assertEqual(Thing.objects.publisher_drafts().count(), 0)
+        self.assertEqual(Thing.objects.publisher_published().count(), 1)
+
+    def test_publish_only_saves_changed_fields(self):
+        published = self._create_published(name='Thing1')
+        published_at = published.publisher_published_at
+        draft = published.publisher.create_draft()
+        draft.name = 'Thing1 changed'
+        draft.save()
+        saves = []
+
+        def receiver(sender, instance, update_fields, **kwargs):
+            saves.append((instance.pk, update_fields))
+
+        post_save.connect(receiver, sender=Thing)
+        try:
+            published = draft.publisher.publish()
+            self.assertEqual(
+                saves,
+                [(published.pk, {
+                    'name',
+                    'publisher_published_at',
+                    'publisher_fingerprint',
+                })],
+            )
+            self.assertEqual(published.name, 'Thing1 changed')
+            self.assertNotEqual(published.publisher_published_at, published_at)
+
+            # Nothing changed: the published version is not written at all.
+            published_at = published.publisher_published_at
+            draft = published.publisher.create_draft()
+            del saves[:]
+            published = draft.publisher.publish()
+            self.assertEqual(saves, [])
+            self.assertEqual(published.publisher_published_at, published_at)
+        finally:
+            post_save.disconnect(receiver, sender=Thing)
+
+    def test_publish_unchanged_draft_is_skipped(self):
+        draft = self._create_draft(name='Thing1', attachment_names=('att1',))
+        fingerprint = draft.publisher.get_fingerprint()
+        published = draft.publisher.publish()
+        self.assertEqual(published.publisher_fingerprint, fingerprint)
+        published_at = published.publisher_published_at
+
+        draft = published.publisher.create_draft()
+        self.assertEqual(draft.publisher_fingerprint, '')
+        self.assertEqual(draft.publisher.get_fingerprint(), fingerprint)
+        external = ExternalThing.objects.create(name='external', thing=draft)
+        sent = []
+
+        def receiver(signal, sender, **kwargs):
+            sent.append(signal)
+
+        for signal in (signals.pre_discard_draft, signals.post_discard_draft, signals.post_publish):
+            signal.connect(receiver, sender=Thing)
+        try:
+            result = draft.publisher.publish()
+        finally:
+            for signal in (signals.pre_discard_draft, signals.post_discard_draft, signals.post_publish):
+                signal.disconnect(receiver, sender=Thing)
+        # Only the publish signals are sent.
+        self.assertEqual(sent, [signals.post_publish])
+        self.assertEqual(result.pk, published.pk)
+        self.assertFalse(Thing.objects.filter(pk=draft.pk).exists())
+        self.assertEqual(refresh_from_db(external).thing_id, published.pk)
+        published = refresh_from_db(published)
+        self.assertEqual(published.publisher_published_at, published_at)
+        self.assertEqual(
+            list(published.attachments.values_list('name', flat=True)),
+            ['att1'],
+        )
+
+        # A change in a relation changes the fingerprint.
+        draft = published.publisher.create_draft()
+        draft.related_things.add(self._create_draft(name='Thing2'))
+        self.assertNotEqual(draft.publisher.get_fingerprint(), fingerprint)
+        draft.related_things.clear()
+        self.assertEqual(draft.publisher.get_fingerprint(), fingerprint)
+        draft.attachments.create(name='att2')
+        self.assertNotEqual(draft.publisher.get_fingerprint(), fingerprint)
+        published = draft.publisher.publish()
+        self.assertNotEqual(published.publisher_published_at, published_at)
+        self.assertEqual(
+            published.publisher_fingerprint,
+            published.publisher.get_fingerprint(),
+        )
+        self.assertEqual(
+            list(published.attachments.order_by('name').values_list('name', flat=True)),
+            ['att1', 'att2'],
+        )
+
+        # Models without PublisherFingerprintModelMixin publish every time.
+        keyed_draft = KeyedThing.objects.create(name='Keyed')
+        self.assertIsNone(keyed_draft.publisher.get_fingerprint())
+        KeyedThing.objects.publisher_publish()
+        self.assertTrue(KeyedThing.objects.publisher_published().exists())
+
+    def test_unpublish(self):
+        external = ExternalThing.objects.create(name='external', thing=self._create_published(name='Thing1'))
+        published = external.thing
+        unpublished = published.publisher.unpublish()
+        self.assertEqual(unpublished.pk, published.pk)
+        self.assertTrue(unpublished.publisher.is_draft_version)
+        self.assertIsNone(unpublished.publisher_published_at)
+
+        published = unpublished.publisher.publish()
+        draft = published.publisher.create_draft()
+        draft.name = 'Thing1 changed'
+        draft.save()
+        external.thing = published
+        external.save()
+        unpublished = published.publisher.unpublish()
+        self.assertEqual(unpublished.pk, draft.pk)
+        self.assertIsNone(unpublished.publisher_published_version_id)
+        self.assertEqual(unpublished.name, 'Thing1 changed')
+        self.assertFalse(Thing.objects.filter(pk=published.pk).exists())
+        self.assertEqual(refresh_from_db(external).thing_id, draft.pk)
+
+    def test_signals(self):
+        sent = []
+
+        def receiver(signal, sender, **kwargs):
+            sent.append((signal, sender, kwargs))
+
+        for signal in (signals.pre_publish, signals.post_publish):
+            signal.connect(receiver, sender=Thing)
+        try:
+            draft = self._create_draft(name='Thing1')
+            published = draft.publisher.publish()
+            self.assertEqual(
+                [signal for signal, sender, kwargs in sent],
+                [signals.pre_publish, signals.post_publish],
+            )
+            pre_kwargs, post_kwargs = sent[0][2], sent[1][2]
+            self.assertEqual(pre_kwargs['pairs'], [(draft, None)])
+            self.assertFalse(pre_kwargs['bulk'])
+            self.assertEqual(post_kwargs['pairs'], [(draft, published)])
+            self.assertIsNone(post_kwargs['pairs'][0][0].pk)
+            self.assertGreaterEqual(post_kwargs['duration'], 0)
+
+            # Publishing a queryset sends the signals once for all drafts.
+            del sent[:]
+            drafts = [self._create_draft(name='Thing{}'.format(i)) for i in range(3)]
+            Thing.objects.filter(pk__in=[obj.pk for obj in drafts]).publisher_publish()
+            self.assertEqual(
+                [signal for signal, sender, kwargs in sent],
+                [signals.pre_publish, signals.post_publish],
+            )
+            pairs = sent[1][2]['pairs']
+            self.assertTrue(sent[1][2]['bulk'])
+            self.assertEqual(
+                sorted(published.name for draft, published in pairs),
+                ['Thing0', 'Thing1', 'Thing2'],
+            )
+        finally:
+            for signal in (signals.pre_publish, signals.post_publish):
+                signal.disconnect(receiver, sender=Thing)
+
+    def test_instrumentation(self):
+        records = []
+
+        class Collector(instrumentation.Collector):
+            def record(self, **kwargs):
+                records.append(kwargs)
+
+        collector = Collector()
+        instrumentation.aggregator.reset()
+        instrumentation.register_collector(collector)
+        try:
+            draft = self._create_draft(name='Thing1', attachment_names=('att1',))
+            with CaptureQueriesContext(connection) as queries:
+                draft.publisher.publish()
+            records = []
+            draft = self._create_draft(name='Thing2', attachment_names=('att1',))
+            with override_settings(PUBLISHER_INSTRUMENTATION=True):
+                # The instrumentation does not hide the queries from
+                # assertNumQueries().
+                with self.assertNumQueries(len(queries)):
+                    published = draft.publisher.publish()
+        finally:
+            instrumentation.unregister_collector(collector)
+        self.assertEqual(
+            [record['phase'] for record in records],
+            list(instrumentation.PHASES),
+        )
+        stats = instrumentation.aggregator.get_stats()
+        refetch = stats[('test_app.Thing', 'publish', 'refetch')]
+        self.assertEqual((refetch.count, refetch.queries), (1, 1))
+        self.assertEqual(
+            sum(phase_stats.queries for phase_stats in stats.values()),
+            sum(record['queries'] for record in records),
+        )
+
+        # Every operation is recorded under its own name.
+        instrumentation.aggregator.reset()
+        with override_settings(PUBLISHER_INSTRUMENTATION=True):
+            draft = published.publisher.create_draft()
+            Thing.objects.filter(pk=draft.pk).publisher_publish()
+        self.assertEqual(
+            sorted(
+                (operation, phase)
+                for label, operation, phase in instrumentation.aggregator.get_stats()
+            ),
+            [
+                ('create_draft', 'copy_object'),
+                ('create_draft', 'copy_relations'),
+                ('create_draft', 'refetch'),
+                ('publisher_publish', 'copy_object'),
+                ('publisher_publish', 'copy_relations'),
+                ('publisher_publish', 'delete'),
+                ('publisher_publish', 'update_relations'),
+                ('publisher_publish', 'validate'),
+            ],
+        )
+
+        # Nothing is collected without collectors.
+        instrumentation.aggregator.reset()
+        self._create_draft(name='Thing2').publisher.publish()
+        self.assertEqual(instrumentation.aggregator.get_stats(), {})
+
+    def test_estimate_publish(self):
+        draft = self._create_draft(name='Thing1', attachment_names=('att1', 'att2'))
+        external = ExternalThing.objects.create(name='external', thing=draft)
+        external.things.add(draft)
+        with self.assertNumQueries(1):
+            estimate = draft.publisher.estimate_publish()
+        rewrites = {
+            (relation.model, relation.field_name): relation
+            for relation in estimate.relations
+        }
+        self.assertEqual(rewrites[(ExternalThing, 'thing')].rows, 1)
+        # The ManyToMany row is rewritten once (with the ForeignKey of the
+        # through model, the ManyToMany rewrite finds nothing left).
+        through = ExternalThing.things.through
+        self.assertEqual(
+            rewrites[(through, 'thing')].rows + rewrites[(through, 'things')].rows,
+            1,
+        )
+        attachments = rewrites[(ThingAttachment, 'thing')]
+        self.assertEqual((attachments.rows, attachments.exclude), (0, 'all'))
+        deletions = {
+            (deletion.model, deletion.field_name): deletion.rows
+            for deletion in estimate.deletions
+        }
+        # The excluded attachments are deleted with the draft.
+        self.assertEqual(deletions[(ThingAttachment, 'thing')], 2)
+        self.assertEqual(deletions[(ExternalThing, 'thing')], 0)
+        self.assertEqual(estimate.rows, 4)
+        self.assertGreaterEqual(estimate.payload, len('Thing1'))
+
+        out = StringIO()
+        call_command('publisher_explain', 'test_app.Thing', str(draft.pk), stdout=out)
+        self.assertIn('test_app.Thing {}: 4 rows'.format(draft.pk), out.getvalue())
+        self.assertIn('rewrite test_app.ExternalThing.thing: 1 rows', out.getvalue())
+        self.assertIn('delete test_app.ThingAttachment.thing: 2 rows', out.getvalue())
+
+        published = draft.publisher.publish()
+        self.assertEqual(refresh_from_db(external).thing_id, published.pk)
+        self.assertIsNone(published.publisher.estimate_publish())
+
+    def test_fast_delete_draft(self):
+        external = ExternalThing.objects.create(name='external', thing=self._create_draft(name='Thing1'))
+        with CaptureQueriesContext(connection) as queries:
+            published = external.thing.publisher.publish()
+        deletes = [query['sql'] for query in queries if query['sql'].startswith('DELETE')]
+        # Nothing points to the draft anymore: a single DELETE, no Collector.
+        self.assertEqual(len(deletes), 1)
+        self.assertEqual(refresh_from_db(external).thing_id, published.pk)
+
+        # Attachments of the draft are not switched over, they are deleted
+        # with the draft by the Collector.
+        draft = self._create_draft(name='Thing2', attachment_names=('att1',))
+        draft.publisher.publish()
+        self.assertFalse(ThingAttachment.objects.filter(thing_id=draft.pk).exists())
+
+        # So are drafts with delete receivers.
+        deleted = []
+
+        def receiver(instance, **kwargs):
+            deleted.append(instance.pk)
+
+        post_delete.connect(receiver, sender=Thing)
+        try:
+            draft = self._create_draft(name='Thing3')
+            draft_pk = draft.pk
+            draft.publisher.publish()
+        finally:
+            post_delete.disconnect(receiver, sender=Thing)
+        self.assertEqual(deleted, [draft_pk])
+
+    def test_publisher_worker(self):
+        now = timezone.now()
+        due = [
+            self._create_draft(name='due {}'.format(i), attachment_names=('att',))
+            for i in range(3)
+        ]
+        not_due = self._create_draft(name='not due')
+        Thing.objects.filter(pk__in=[obj.pk for obj in due]).update(
+            publisher_publish_at=now - timedelta(minutes=1),
+        )
+        Thing.objects.filter(pk=not_due.pk).update(
+            publisher_publish_at=now + timedelta(hours=1),
+        )
+        expiring = self._create_published(name='expiring')
+        Thing.objects.filter(pk=expiring.pk).update(
+            publisher_unpublish_at=now - timedelta(minutes=1),
+        )
+        out = StringIO()
+        call_command('publisher_worker', 'test_app.Thing', batch_size=2, stdout=out)
+        self.assertIn('Processed 4 jobs and scheduled objects.', out.getvalue())
+        self.assertEqual(
+            set(Thing.objects.publisher_published().values_list('name', flat=True)),
+            {'due 0', 'due 1', 'due 2'},
+        )
+        self.assertIsNone(
+            Thing.objects.get(name='due 0').publisher_publish_at
+        )
+        self.assertEqual(
+            set(Thing.objects.publisher_drafts().values_list('name', flat=True)),
+            {'not due', 'expiring'},
+        )
+        out = StringIO()
+        call_command('publisher_worker', stdout=out)
+        self.assertIn('Processed 0 jobs and scheduled objects.', out.getvalue())
+
+    def test_soft_delete(self):
+        published = self._create_published(name='Thing1', attachment_names=('att1', 'att2', 'att3'))
+        Thing.publisher_soft_delete = True
+        try:
+            published = published.publisher.request_deletion()
+            deleted = published.publisher.publish_deletion()
+        finally:
+            Thing.publisher_soft_delete = False
+        self.assertEqual(deleted.pk, published.pk)
+        self.assertIsNotNone(deleted.publisher_deleted_at)
+        self.assertFalse(Thing.objects.publisher_published().exists())
+        self.assertFalse(Thing.objects.publisher_draft_or_published_only().exists())
+        self.assertFalse(Thing.objects.publisher_pending_deletion().exists())
+        self.assertEqual(list(Thing.objects.publisher_soft_deleted()), [deleted])
+
+        # The publisher_worker purges it, the attachments in chunks.
+        with override_settings(PUBLISHER_PURGE_CHUNK_SIZE=2):
+            with CaptureQueriesContext(connection) as queries:
+                call_command('publisher_worker', 'test_app.Thing', stdout=StringIO())
+        self.assertFalse(Thing.objects.filter(pk=deleted.pk).exists())
+        self.assertFalse(ThingAttachment.objects.exists())
+        attachment_deletes = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('DELETE FROM "test_app_thingattachment"')
+        ]
+        self.assertEqual(len(attachment_deletes), 2)
+        # A worker that claimed it too late leaves it alone.
+        self.assertFalse(scheduling.purge(deleted, chunk_size=2))
+        self.assertEqual(
+            scheduling.purge_deleted([Thing], batch_size=10, chunk_size=2),
+            0,
+        )
+
+    def test_soft_delete_opt_in(self):
+        # Models without PublisherSoftDeleteModelMixin don't filter on the
+        # column they don't have.
+        self.assertNotIn(
+            'publisher_deleted_at',
+            str(ParlerThing.objects.publisher_draft_or_published_only().query),
+        )
+        self.assertFalse(ParlerThing.objects.publisher_soft_deleted().exists())
+        self.assertEqual(
+            scheduling.purge_deleted([ParlerThing], batch_size=10, chunk_size=2),
+            0,
+        )
+
+    def test_purge_to_field(self):
+        keyed = KeyedThing.objects.create(name='Keyed', publisher_is_published_version=True)
+        other = KeyedThing.objects.create(name='Other', publisher_is_published_version=True)
+        KeyedThingReference.objects.create(keyed_thing=keyed)
+        KeyedThingReference.objects.create(keyed_thing=other)
+        KeyedThing.objects.filter(pk=keyed.pk).update(publisher_deleted_at=timezone.now())
+        keyed = refresh_from_db(keyed)
+        self.assertTrue(scheduling.purge(keyed, chunk_size=1))
+        # Only the references to the purged object (by its key) are gone.
+        self.assertEqual(
+            list(KeyedThingReference.objects.values_list('keyed_thing_id', flat=True)),
+            [other.key],
+        )
+
+    def test_purge_claimed(self):
+        published = self._create_published(name='Thing1')
+        now = timezone.now()
+        Thing.objects.filter(pk=published.pk).update(
+            publisher_deleted_at=now,
+            publisher_purge_started_at=now,
+        )
+        # Another worker is purging it.
+        self.assertEqual(
+            scheduling.purge_deleted([Thing], batch_size=10, chunk_size=2),
+            0,
+        )
+        self.assertTrue(Thing.objects.filter(pk=published.pk).exists())
+        # That worker died.
+        self.assertEqual(
+            scheduling.purge_deleted(
+                [Thing],
+                batch_size=10,
+                chunk_size=2,
+                now=now + timedelta(hours=2),
+            ),
+            1,
+        )
+        self.assertFalse(Thing.objects.filter(pk=published.pk).exists())
+
+    def test_publish_after_soft_delete(self):
+        published = self._create_published(name='Thing1')
+        Thing.publisher_soft_delete = True
+        try:
+            deleted = published.publisher.request_deletion().publisher.publish_deletion()
+        finally:
+            Thing.publisher_soft_delete = False
+        # A soft deleted object is gone.
+        self.assertFalse(deleted.publisher.has_published_version)
+        self.assertFalse(deleted.publisher.has_pending_deletion_request)
+        self.assertEqual(deleted.publisher.available_actions(user=None), {})
+        with self.assertRaises(AssertionError):
+            deleted.publisher.create_draft()
+        with self.assertRaises(AssertionError):
+            deleted.publisher.request_deletion()
+        annotated = Thing.objects.publisher_with_state().get(pk=deleted.pk)
+        self.assertEqual(annotated.publisher.available_actions(user=None), {})
+        self.assertFalse(Thing.objects.publisher_pending_changes().exists())
+
+        # A draft that still points to it gets a new published version,
+        # which survives the purge.
+        draft = self._create_draft(name='Thing1 again', published_version=deleted)
+        draft = refresh_from_db(draft)
+        self.assertFalse(draft.publisher.has_published_version)
+        republished = draft.publisher.publish()
+        self.assertNotEqual(republished.pk, deleted.pk)
+        self.assertIsNone(republished.publisher_deleted_at)
+        call_command('publisher_worker', 'test_app.Thing', stdout=StringIO())
+        self.assertEqual(
+            list(Thing.objects.values_list('pk', 'name')),
+            [(republished.pk, 'Thing1 again')],
+        )
+
+        # The same with publisher_publish().
+        deleted = republished
+        Thing.publisher_soft_delete = True
+        try:
+            deleted = deleted.publisher.request_deletion().publisher.publish_deletion()
+        finally:
+            Thing.publisher_soft_delete = False
+        self._create_draft(name='Thing1 bulk', published_version=deleted)
+        republished = list(Thing.objects.publisher_drafts().publisher_publish())
+        self.assertNotEqual(republished[0].pk, deleted.pk)
+        call_command('publisher_worker', 'test_app.Thing', stdout=StringIO())
+        self.assertEqual(
+            list(Thing.objects.values_list('name', flat=True)),
+            ['Thing1 bulk'],
+        )
+
+    def test_update_relations_to_field(self):
+        # The relations are rewritten with the value of to_field, not the pk.
+        drafts = [
+            KeyedThing.objects.create(name='Keyed{}'.format(i)) for i in range(2)
+        ]
+        references = [
+            KeyedThingReference.objects.create(keyed_thing=draft)
+            for draft in drafts
+        ]
+        published = drafts[0].publisher.publish()
+        self.assertEqual(
+            refresh_from_db(references[0]).keyed_thing_id,
+            published.key,
+        )
+        published_objs = list(
+            KeyedThing.objects.filter(pk=drafts[1].pk).publisher_publish()
+        )
+        self.assertEqual(
+            refresh_from_db(references[1]).keyed_thing_id,
+            published_objs[0].key,
+        )
+
+    def test_using(self):
+        published, draft = self._create_published_with_draft(name='Thing1')
+        self.assertEqual(draft.publisher.get_using(), 'default')
+        # Nothing falls back to the default database when using is given.
+        with self.assertRaises(ConnectionDoesNotExist):
+            draft.publisher.publish(using='nowhere')
+        with self.assertRaises(ConnectionDoesNotExist):
+            Thing.objects.using('nowhere').publisher_publish()
+        with self.assertRaises(ConnectionDoesNotExist):
+            list(relations.get_related_objects(published, using='nowhere'))
+        published = draft.publisher.publish(using='default')
+        self.assertEqual(published._state.db, 'default')
+        self.assertEqual(published.name, 'Thing1')
+
+    def test_using_instrumentation(self):
+        published, draft = self._create_published_with_draft(name='Thing1')
+        other_draft = self._create_draft(name='Thing2')
+        # The phases count the queries on the database that is used, not on
+        # the one the routers pick.
+        with override_settings(
+            PUBLISHER_INSTRUMENTATION=True,
+            DATABASE_ROUTERS=[WriteNowhereRouter()],
+        ):
+            draft.publisher.publish(using='default')
+            Thing.objects.using('default').filter(pk=other_draft.pk).publisher_publish()
+
+    def test_replica_router(self):
+        published, draft = self._create_published_with_draft(name='Thing1')
+        replica_router = PublisherReplicaRouter()
+        published_hints = Thing.objects.publisher_published()._hints
+        with override_settings(PUBLISHER_REPLICA_DATABASES=['replica']):
+            # Only published content is read from the replicas.
+            self.assertEqual(
+                replica_router.db_for_read(Thing, **published_hints),
+                'replica',
+            )
+            self.assertIsNone(replica_router.db_for_read(
+                Thing,
+                **Thing.objects.publisher_drafts()._hints
+            ))
+            with pin_to_primary():
+                self.assertIsNone(
+                    replica_router.db_for_read(Thing, **published_hints)
+                )
+            # Instances read from a replica are written to the primary.
+            published._state.db = 'replica'
+            self.assertEqual(
+                replica_router.db_for_write(Thing, instance=published),
+                'default',
+            )
+            self.assertIsNone(
+                replica_router.db_for_write(Thing, instance=draft)
+            )
+            self.assertTrue(replica_router.allow_relation(published, draft))
+        self.assertIsNone(replica_router.db_for_read(Thing, **published_hints))
+
+    def test_identity_map(self):
+        published, draft = self._create_published_with_draft(name='Thing1')
+        drafts = [refresh_from_db(draft), refresh_from_db(draft)]
+        published_objs = [refresh_from_db(published), refresh_from_db(published)]
+        with identity_map() as objects:
+            # One query per counterpart, no matter how many instances ask.
+            with self.assertNumQueries(2):
+                for obj in drafts:
+                    self.assertEqual(obj.publisher.get_published_version(), published)
+                for obj in published_objs:
+                    self.assertEqual(obj.publisher.get_draft_version(), draft)
+            self.assertEqual(objects.hits, 2)
+            # Every caller gets its own copy.
+            self.assertIsNot(
+                drafts[0].publisher.get_published_version(),
+                drafts[1].publisher.get_published_version(),
+            )
+            drafts[0].publisher.get_published_version().name = 'Changed'
+            self.assertEqual(
+                drafts[1].publisher.get_published_version().name,
+                'Thing1',
+            )
+            # Queryset updates and deletes invalidate it.
+            Thing.objects.filter(pk=published.pk).update(a_boolean=True)
+            self.assertEqual(objects.objects, {})
+            drafts[0].publisher.get_published_version()
+            Thing.objects.filter(pk=0).delete()
+            self.assertEqual(objects.objects, {})
+            # Operations invalidate it.
+            published = draft.publisher.publish()
+            self.assertEqual(objects.objects, {})
+            published_objs = [refresh_from_db(published), refresh_from_db(published)]
+            with self.assertNumQueries(1):
+                for obj in published_objs:
+                    self.assertIsNone(obj.publisher.get_draft_version())
+
+    def test_lock(self):
+        published, draft = self._create_published_with_draft(name='Thing1')
+        other = self._create_published(name='Thing2')
+        self.assertEqual(published.publisher.lock(), {published.pk, draft.pk})
+        self.assertEqual(draft.publisher.lock(), {published.pk, draft.pk})
+        self.assertEqual(other.publisher.lock(), {other.pk})
+
+    def test_concurrent_create_draft_and_publish(self):
+        published = self._create_published(name='Thing1')
+        stale_published = refresh_from_db(published)
+        self.assertFalse(stale_published.publisher.has_pending_changes)
+        draft = published.publisher.create_draft()
+        # A second editor that loaded the published version before the draft
+        # was created gets the existing draft.
+        self.assertEqual(stale_published.publisher.create_draft().pk, draft.pk)
+        self.assertEqual(Thing.objects.publisher_drafts().count(), 1)
+
+        stale_draft = refresh_from_db(draft)
+        self.assertEqual(draft.publisher.publish().pk, published.pk)
+        # Publishing the stale draft again returns the published version.
+        self.assertEqual(stale_draft.publisher.publish().pk, published.pk)
+        self.assertEqual(Thing.objects.publisher_published().count(), 1)
+
+    def test_revision(self):
+        draft = self._create_draft(name='Thing1')
+        self.assertEqual(draft.publisher_revision, 1)
+        draft.name = 'Thing1 changed'
+        draft.save()
+        self.assertEqual(refresh_from_db(draft).publisher_revision, 2)
+        with self.assertRaises(PublisherRevisionConflict):
+            draft.publisher.check_revision(1)
+        draft.publisher.check_revision(2)
+        with self.assertRaises(PublisherRevisionConflict) as cm:
+            draft.publisher.publish(expected_revision=1)
+        self.assertEqual(cm.exception.revision, 2)
+        self.assertTrue(Thing.objects.filter(pk=draft.pk).exists())
+        published = draft.publisher.publish(expected_revision=2)
+        self.assertEqual(published.name, 'Thing1 changed')
+        draft = published.publisher.create_draft()
+        self.assertEqual(refresh_from_db(draft).publisher_revision, 1)
+        draft.publisher.discard_draft()
+        draft = published.publisher.create_draft(in_database=True)
+        self.assertEqual(refresh_from_db(draft).publisher_revision, 1)
+        # The revision is optional.
+        keyed_thing = KeyedThing.objects.create(name='Keyed')
+        self.assertFalse(keyed_thing.publisher.has_revision)
+        self.assertFalse(hasattr(keyed_thing, 'publisher_revision'))
+        keyed_thing.publisher.publish()
+
+
+class OnCommitSignalsTestCase(TransactionTestCase):
+    def test_on_commit_signals(self):
+        sent = []
+
+        def receiver(signal, sender, **kwargs):
+            sent.append((signal, Thing.objects.filter(pk=kwargs['pairs'][0][1].pk).exists()))
+
+        signals.post_publish_on_commit.connect(receiver, sender=Thing)
+        try:
+            draft = Thing.objects.create(name='Thing1')
+            with transaction.atomic():
+                published = draft.publisher.publish()
+                # Not sent before the transaction is committed.
+                self.assertEqual(sent, [])
+            self.assertEqual(sent, [(signals.post_publish_on_commit, True)])
+            with transaction.atomic():
+                published.publisher.create_draft().name = 'Thing1 changed'
+                Thing.objects.filter(pk=published.pk).publisher_publish()
+                transaction.set_rollback(True)
+            # Rolled back: not sent at all.
+            self.assertEqual(len(sent), 1)
+        finally:
+            signals.post_publish_on_commit.disconnect(receiver, sender=Thing)
+
+
+@skipIf(aio.asyncio is None, 'The async API needs asyncio.')
+class AsyncTestCase(TransactionTestCase):
+    # The operations run in worker threads with their own connections, so
+    # they can't see the transaction of a TestCase.
+
+    def setUp(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.loop = aio.asyncio.new_event_loop()
+        # A single worker thread, SQLite can't write from several at once.
+        self.loop.set_default_executor(ThreadPoolExecutor(max_workers=1))
+        aio.asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        aio.asyncio.set_event_loop(None)
+        self.loop.close()
+
+    def run_async(self, awaitable):
+        return self.loop.run_until_complete(awaitable)
+
+    def test_async_operations(self):
+        draft = Thing.objects.create(name='Thing1')
+        published = self.run_async(draft.publisher.apublish())
+        self.assertEqual(published.name, 'Thing1')
+        self.assertEqual(
+            self.run_async(Thing.objects.apublisher_published()),
+            [published],
+        )
+        draft = self.run_async(published.publisher.acreate_draft())
+        self.assertEqual(
+            self.run_async(Thing.objects.apublisher_drafts()),
+            [draft],
+        )
+        self.run_async(draft.publisher.adiscard_draft())
+        self.assertFalse(Thing.objects.publisher_drafts().exists())
+        published = self.run_async(published.publisher.arequest_deletion())
+        self.assertTrue(published.publisher_deletion_requested)
+
+    def test_run_each(self):
+        drafts = [
+            Thing.objects.create(name='Thing{}'.format(i)) for i in range(3)
+        ]
+        published = self.run_async(aio.run_each(drafts, 'publish'))
+        self.assertEqual(
+            [obj.name for obj in published],
+            ['Thing0', 'Thing1', 'Thing2'],
+        )
+        self.assertEqual(Thing.objects.publisher_published().count(), 3)
+        self.assertFalse(Thing.objects.publisher_drafts().exists())
+
+    def test_run_in_executor_closes_connections(self):
+        # Persistent connections are not closed by close_old_connections().
+        settings_dict = connections.databases[DEFAULT_DB_ALIAS]
+        conn_max_age = settings_dict['CONN_MAX_AGE']
+        settings_dict['CONN_MAX_AGE'] = None
+        closed = []
+
+        def count():
+            # The in-memory SQLite test database ignores close(), record it.
+            worker_connection = connections[DEFAULT_DB_ALIAS]
+            worker_connection.close = lambda: closed.append(worker_connection)
+            return Thing.objects.count()
+
+        try:
+            self.assertEqual(self.run_async(aio.run_in_executor(count)), 0)
+        finally:
+            settings_dict['CONN_MAX_AGE'] = conn_max_age
+        self.assertEqual(len(closed), 1)
+        self.assertIsNot(closed[0], connections[DEFAULT_DB_ALIAS])
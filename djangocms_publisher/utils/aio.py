@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from functools import partial
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import close_old_connections, connections
+
+from ..conf import get_setting
+
+try:
+    import asyncio
+except ImportError:
+    # Python 2
+    asyncio = None
+
+try:
+    from asgiref.sync import sync_to_async
+except ImportError:
+    sync_to_async = None
+
+
+def check_asyncio():
+    if asyncio is None:
+        raise ImproperlyConfigured(
+            'The async publisher API needs Python 3 (asyncio).'
+        )
+
+
+def call_in_thread(func, *args, **kwargs):
+    # Runs in the worker thread. Connections that are too old (or broken) are
+    # replaced before and closed afterwards, like around a request.
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+def call_in_executor(func, *args, **kwargs):
+    # Runs in a thread of the executor, which outlives the call. The
+    # connections opened in it are closed, they would stay open (and hold
+    # database connections) as long as the thread exists otherwise.
+    try:
+        return call_in_thread(func, *args, **kwargs)
+    finally:
+        connections.close_all()
+
+
+def run_in_executor(func, *args, **kwargs):
+    """
+    Returns an awaitable that calls func(*args, **kwargs) in a thread of the
+    default executor of the event loop. The connections of the thread are
+    closed afterwards.
+    """
+    check_asyncio()
+    return asyncio.get_event_loop().run_in_executor(
+        None,
+        partial(call_in_executor, func, *args, **kwargs),
+    )
+
+
+def run_in_thread(func, *args, **kwargs):
+    """
+    Returns an awaitable that calls func(*args, **kwargs) in a worker thread,
+    so the event loop is not blocked. Each publisher operation runs its
+    transaction on the connection of that thread.
+    With asgiref this is sync_to_async() with thread_sensitive set to
+    PUBLISHER_ASYNC_THREAD_SENSITIVE (True: all operations run in the same
+    thread, one after the other, like Django's own sync code called from
+    async views). Otherwise run_in_executor() is used.
+    """
+    check_asyncio()
+    if sync_to_async is not None:
+        return sync_to_async(
+            call_in_thread,
+            thread_sensitive=get_setting('ASYNC_THREAD_SENSITIVE'),
+        )(func, *args, **kwargs)
+    return run_in_executor(func, *args, **kwargs)
+
+
+def run_each(objs, operation, **kwargs):
+    """
+    Returns an awaitable that runs the publisher operation (e.g. 'publish')
+    with kwargs on all objs concurrently, each in its own transaction (and
+    thread, unless PUBLISHER_ASYNC_THREAD_SENSITIVE is True). It resolves to
+    the list of the results, in the order of objs. Use it for independent
+    objects only.
+    """
+    check_asyncio()
+    return asyncio.gather(*[
+        run_in_thread(getattr(obj.publisher, operation), **kwargs)
+        for obj in objs
+    ])
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import connections, router
+from django.db.models import Case, Value, When
+
+
+def chunked(items, size):
+    items = list(items)
+    if not size:
+        size = len(items) or 1
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def bulk_create(model, objs, using=None):
+    """
+    Inserts objs and makes sure they all have a pk afterwards.
+    Django only sets the pk after bulk_create on backends that can return ids
+    from a bulk insert (PostgreSQL). Everywhere else we fall back to saving
+    the objects one by one.
+    """
+    using = using or router.db_for_write(model)
+    if connections[using].features.can_return_ids_from_bulk_insert:
+        return model._base_manager.using(using).bulk_create(objs)
+    for obj in objs:
+        obj.save(force_insert=True, using=using)
+    return objs
+
+
+def bulk_update(model, objs, field_names, batch_size=None, using=None):
+    """
+    Writes the current value of field_names on all objs to the database with
+    one UPDATE per batch using CASE/WHEN on the pk (like bulk_update in newer
+    Django versions).
+    """
+    if not objs or not field_names:
+        return 0
+    using = using or router.db_for_write(model)
+    fields = [model._meta.get_field(name) for name in field_names]
+    if batch_size is None:
+        batch_size = connections[using].ops.bulk_batch_size(
+            ['pk', 'pk'] + fields,
+            objs,
+        )
+    count = 0
+    for batch in chunked(objs, batch_size):
+        updates = {}
+        for field in fields:
+            updates[field.attname] = Case(
+                *[
+                    When(
+                        pk=obj.pk,
+                        then=Value(
+                            getattr(obj, field.attname),
+                            output_field=field,
+                        ),
+                    )
+                    for obj in batch
+                ],
+                output_field=field
+            )
+        count += (
+            model._base_manager
+            .using(using)
+            .filter(pk__in=[obj.pk for obj in batch])
+            .update(**updates)
+        )
+    return count
@@ -3,8 +3,44 @@ from __future__ import print_function, unicode_literals
 
 from django.conf import settings
 
-__all__ = ['CMS_IS_INSTALLED', 'PARLER_IS_INSTALLED']
+__all__ = [
+    'CMS_IS_INSTALLED',
+    'PARLER_IS_INSTALLED',
+    'delete_cached_value',
+    'get_cached_value',
+    'set_cached_value',
+]
 
 
 PARLER_IS_INSTALLED = 'parler' in settings.INSTALLED_APPS
 CMS_IS_INSTALLED = 'cms' in settings.INSTALLED_APPS
+
+
+def delete_cached_value(obj, field):
+    # Removes the cached related object of a relation field (or a reverse
+    # relation) from obj.
+    if hasattr(field, 'delete_cached_value'):
+        # Django >= 2.0
+        if field.is_cached(obj):
+            field.delete_cached_value(obj)
+    else:
+        obj.__dict__.pop(field.get_cache_name(), None)
+
+
+def get_cached_value(obj, field, default=None):
+    # Returns the cached related object of a relation field (or a reverse
+    # relation) or default if nothing is cached.
+    if hasattr(field, 'get_cached_value'):
+        # Django >= 2.0
+        return field.get_cached_value(obj, default=default)
+    return obj.__dict__.get(field.get_cache_name(), default)
+
+
+def set_cached_value(obj, field, value):
+    # Caches value as the related object of a relation field (or a reverse
+    # relation) on obj.
+    if hasattr(field, 'set_cached_value'):
+        # Django >= 2.0
+        field.set_cached_value(obj, value)
+    else:
+        setattr(obj, field.get_cache_name(), value)
@@ -1,7 +1,12 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function, unicode_literals
 
-from .compat import CMS_IS_INSTALLED
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .compat import CMS_IS_INSTALLED, delete_cached_value
 
 DEFAULT_COPY_EXCLUDE_FIELDS = (
     'pk',
@@ -11,6 +16,11 @@ DEFAULT_COPY_EXCLUDE_FIELDS = (
     'publisher_draft_version',
     'publisher_published_at',
     'publisher_deletion_requested',
+    'publisher_fingerprint',
+    'publisher_publish_at',
+    'publisher_revision',
+    'publisher_deleted_at',
+    'publisher_purge_started_at',
 )
 
 
@@ -24,13 +34,39 @@ else:
         return False
 
 
-def get_fields_to_copy(obj, exclude_fields=None):
-    all_exclude_fields = set(DEFAULT_COPY_EXCLUDE_FIELDS)
-    if exclude_fields:
-        all_exclude_fields |= set(exclude_fields)
+_copy_exclude_fields = {}
+_copy_plans = {}
 
-    fields = {}
-    for field in obj._meta._get_fields(forward=True, reverse=False):
+
+def get_copy_exclude_fields(exclude_fields=None):
+    """
+    Returns a frozenset of DEFAULT_COPY_EXCLUDE_FIELDS and exclude_fields.
+    The result is cached so the same set is reused for every copy, no matter
+    the order (or type) of exclude_fields.
+    """
+    key = frozenset(exclude_fields or ())
+    try:
+        return _copy_exclude_fields[key]
+    except KeyError:
+        value = _copy_exclude_fields[key] = (
+            frozenset(DEFAULT_COPY_EXCLUDE_FIELDS).union(key)
+        )
+        return value
+
+
+def get_copy_plan(model, exclude_fields=None):
+    """
+    Returns a tuple of the fields of model that are copied from one version
+    to another. Cached per model and set of excluded fields.
+    """
+    all_exclude_fields = get_copy_exclude_fields(exclude_fields)
+    key = (model, all_exclude_fields)
+    try:
+        return _copy_plans[key]
+    except KeyError:
+        pass
+    fields = []
+    for field in model._meta._get_fields(forward=True, reverse=False):
         if (
             not field.concrete or
             field.auto_created or
@@ -47,13 +83,74 @@ def get_fields_to_copy(obj, exclude_fields=None):
             continue
         elif is_placeholder_field(field):
             # Don't copy PlaceholderFields
-            print("NOT COPYING PLACEHOLDER")
             continue
         else:
             # Non-relation fields.
             # many_to_one: ForeignKeys to other models
-            fields[field.name] = getattr(obj, field.name)
-    return fields
+            fields.append(field)
+    plan = _copy_plans[key] = tuple(fields)
+    return plan
+
+
+def get_fields_to_copy(obj, exclude_fields=None, by_attname=False):
+    """
+    Returns a dict of the values of the copy plan fields of obj, keyed by
+    field name. With by_attname=True, the keys are the attnames and
+    ForeignKeys are copied by their id, so the related objects are never
+    fetched.
+    """
+    if by_attname:
+        return {
+            field.attname: getattr(obj, field.attname)
+            for field in get_copy_plan(obj._meta.model, exclude_fields)
+        }
+    return {
+        field.name: getattr(obj, field.name)
+        for field in get_copy_plan(obj._meta.model, exclude_fields)
+    }
+
+
+def load_deferred_fields(obj, fields):
+    # Loads the fields that are deferred on obj (e.g on the instance
+    # create_draft(in_database=True) returns) with one query, instead of one
+    # query per field when they are accessed.
+    deferred = obj.get_deferred_fields()
+    attnames = [field.attname for field in fields if field.attname in deferred]
+    if attnames:
+        obj.refresh_from_db(fields=attnames)
+
+
+def get_changed_fields(old_obj, new_obj, exclude_fields=None):
+    # The fields of the copy plan that have a different value on new_obj than
+    # on old_obj. Compared by attname, so related objects are never fetched.
+    copy_plan = get_copy_plan(old_obj._meta.model, exclude_fields)
+    load_deferred_fields(old_obj, copy_plan)
+    load_deferred_fields(new_obj, copy_plan)
+    return [
+        field
+        for field in copy_plan
+        if getattr(old_obj, field.attname) != getattr(new_obj, field.attname)
+    ]
+
+
+def get_fingerprint(obj, exclude_fields=None, extra_data=None):
+    """
+    Returns a sha1 hexdigest of the values of the copy plan fields of obj and
+    extra_data (anything DjangoJSONEncoder can serialize). Two objects with
+    the same fingerprint have the same content.
+    """
+    copy_plan = get_copy_plan(obj._meta.model, exclude_fields)
+    load_deferred_fields(obj, copy_plan)
+    data = [
+        [field.attname, field.value_to_string(obj)]
+        for field in copy_plan
+    ]
+    payload = json.dumps(
+        [data, extra_data],
+        cls=DjangoJSONEncoder,
+        sort_keys=True,
+    )
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
 
 
 def copy_object(
@@ -62,10 +159,12 @@ def copy_object(
     exclude_fields=None,
     extra_values=None,
 ):
-    extra_values = extra_values or {}
-    fields_to_copy = get_fields_to_copy(old_obj, exclude_fields=exclude_fields)
-    fields_to_copy.update(extra_values)
-    for name, value in fields_to_copy.items():
+    for field in get_copy_plan(old_obj._meta.model, exclude_fields):
+        setattr(new_obj, field.attname, getattr(old_obj, field.attname))
+        if field.is_relation:
+            # Drop any related object cached for the old value.
+            delete_cached_value(new_obj, field)
+    for name, value in (extra_values or {}).items():
         setattr(new_obj, name, value)
 
 
@@ -89,6 +188,7 @@ def copy_parler_translations(
         fields_to_copy = get_fields_to_copy(
             old_translation,
             exclude_fields=exclude_fields,
+            by_attname=True,
         )
         if extra_values is not None:
             fields_to_copy.update(extra_values)
@@ -132,8 +232,8 @@ def copy_placeholder(
     copy_plugins_to(plugins, new_placeholder)
 
 
-def refresh_from_db(obj):
+def refresh_from_db(obj, using=None):
     # This is more aggressive than djangos built in .refresh_from_db. It is
     # necessary for parler models, because parler has a bunch of caches on
     # the obj.
-    return obj._meta.model.objects.get(pk=obj.pk)
+    return obj._meta.model.objects.using(using).get(pk=obj.pk)
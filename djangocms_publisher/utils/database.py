@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from contextlib import contextmanager
+
+from django.db import DatabaseError, connections, router
+from django.db.models import AutoField
+
+
+def get_deferred_instance(model, values, using=None):
+    """
+    Returns an instance of model that only knows the given values (keyed by
+    attname). All the other fields are deferred and only loaded from the
+    database when they are accessed.
+    """
+    using = using or router.db_for_read(model)
+    field_names = [
+        field.attname
+        for field in model._meta.concrete_fields
+        if field.attname in values
+    ]
+    return model.from_db(
+        using,
+        field_names,
+        [values[name] for name in field_names],
+    )
+
+
+def clone_row(model, pk, copy_fields, values, using=None):
+    """
+    Inserts a copy of the row with pk with a single INSERT ... SELECT, so the
+    field values never travel through python.
+    copy_fields are copied from the existing row. values (keyed by attname)
+    are set on the new row. All the other fields get their default (like on
+    a regular save, including auto_now). Signals are not sent.
+    Returns the pk of the new row.
+    """
+    opts = model._meta
+    if opts.parents:
+        raise ValueError(
+            'Can not clone rows of models with multi-table inheritance in '
+            'the database ({}).'.format(opts.label)
+        )
+    using = using or router.db_for_write(model)
+    connection = connections[using]
+    qn = connection.ops.quote_name
+
+    new_obj = model(**values)
+    copy_fields = [
+        field for field in copy_fields
+        if not getattr(field, 'auto_now', False)
+    ]
+    value_fields = [
+        field for field in opts.local_concrete_fields
+        if field not in copy_fields and not (
+            field.primary_key and isinstance(field, AutoField)
+        )
+    ]
+    params = [
+        field.get_db_prep_save(
+            field.pre_save(new_obj, add=True),
+            connection=connection,
+        )
+        for field in value_fields
+    ]
+    sql = 'INSERT INTO {table} ({columns}) SELECT {select} FROM {table} WHERE {pk} = %s'.format(
+        table=qn(opts.db_table),
+        columns=', '.join(
+            qn(field.column) for field in copy_fields + value_fields
+        ),
+        select=', '.join(
+            [qn(field.column) for field in copy_fields] +
+            ['%s'] * len(value_fields)
+        ),
+        pk=qn(opts.pk.column),
+    )
+    params.append(pk)
+
+    with connection.cursor() as cursor:
+        if opts.pk in value_fields:
+            # Not an AutoField, the pk was set by its default.
+            cursor.execute(sql, params)
+            return new_obj.pk
+        if connection.features.can_return_id_from_insert:
+            r_fmt, r_params = connection.ops.return_insert_id()
+            sql = '{} {}'.format(sql, r_fmt % qn(opts.pk.column))
+            cursor.execute(sql, params + list(r_params))
+            return connection.ops.fetch_returned_insert_id(cursor)
+        cursor.execute(sql, params)
+        return connection.ops.last_insert_id(
+            cursor,
+            opts.db_table,
+            opts.pk.column,
+        )
+
+
+def copy_row(model, from_pk, to_pk, copy_fields, values, using=None):
+    """
+    Overwrites the row with to_pk with the copy_fields of the row with
+    from_pk with a single UPDATE, so the field values never travel through
+    python. values (keyed by attname) are set as well. auto_now fields are
+    set to now instead of being copied. Signals are not sent.
+    """
+    opts = model._meta
+    if opts.parents:
+        raise ValueError(
+            'Can not copy rows of models with multi-table inheritance in '
+            'the database ({}).'.format(opts.label)
+        )
+    using = using or router.db_for_write(model)
+    connection = connections[using]
+    qn = connection.ops.quote_name
+
+    new_obj = model(**values)
+    value_fields = [
+        field for field in opts.local_concrete_fields
+        if field.attname in values or (
+            field in copy_fields and getattr(field, 'auto_now', False)
+        )
+    ]
+    copy_fields = [field for field in copy_fields if field not in value_fields]
+    value_params = [
+        field.get_db_prep_save(
+            field.pre_save(new_obj, add=False),
+            connection=connection,
+        )
+        for field in value_fields
+    ]
+    table = qn(opts.db_table)
+    pk_column = qn(opts.pk.column)
+    source = qn('publisher_source')
+    if connection.vendor == 'postgresql':
+        sql = 'UPDATE {table} SET {set} FROM {table} AS {source} WHERE {table}.{pk} = %s AND {source}.{pk} = %s'.format(
+            table=table,
+            source=source,
+            pk=pk_column,
+            set=', '.join(
+                ['{0} = {1}.{0}'.format(qn(field.column), source) for field in copy_fields] +
+                ['{} = %s'.format(qn(field.column)) for field in value_fields]
+            ),
+        )
+        params = value_params + [to_pk, from_pk]
+    elif connection.vendor == 'mysql':
+        sql = 'UPDATE {table} INNER JOIN {table} AS {source} ON {source}.{pk} = %s SET {set} WHERE {table}.{pk} = %s'.format(
+            table=table,
+            source=source,
+            pk=pk_column,
+            set=', '.join(
+                ['{0}.{1} = {2}.{1}'.format(table, qn(field.column), source) for field in copy_fields] +
+                ['{}.{} = %s'.format(table, qn(field.column)) for field in value_fields]
+            ),
+        )
+        params = [from_pk] + value_params + [to_pk]
+    else:
+        # Correlated subqueries work everywhere else (e.g SQLite).
+        sql = 'UPDATE {table} SET {set} WHERE {pk} = %s'.format(
+            table=table,
+            pk=pk_column,
+            set=', '.join(
+                [
+                    '{0} = (SELECT {1}.{0} FROM {2} AS {1} WHERE {1}.{3} = %s)'.format(
+                        qn(field.column), source, table, pk_column,
+                    )
+                    for field in copy_fields
+                ] +
+                ['{} = %s'.format(qn(field.column)) for field in value_fields]
+            ),
+        )
+        params = [from_pk] * len(copy_fields) + value_params + [to_pk]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+@contextmanager
+def lock_timeout(timeout, using):
+    """
+    Limits how long (in seconds) statements in the block wait for row locks
+    held by other transactions. Only PostgreSQL and MySQL support this, it
+    is a no-op everywhere else (and for timeout=None). On PostgreSQL the
+    limit applies until the end of the transaction.
+    """
+    connection = connections[using]
+    if timeout is None or connection.vendor not in ('postgresql', 'mysql'):
+        yield
+        return
+    if connection.vendor == 'postgresql':
+        # SET LOCAL ends with the transaction, there is nothing to reset.
+        # (After a timeout the transaction is aborted and would not accept a
+        # reset anyway.)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SET LOCAL lock_timeout = '{}ms'".format(int(timeout * 1000))
+            )
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT @@SESSION.innodb_lock_wait_timeout')
+        previous = cursor.fetchone()[0]
+        cursor.execute(
+            'SET SESSION innodb_lock_wait_timeout = {}'.format(
+                max(int(timeout), 1)
+            )
+        )
+    failed = False
+    try:
+        yield
+    except DatabaseError:
+        # Don't risk hiding the error behind another one from the reset. The
+        # session keeps the shorter timeout until the connection is closed.
+        failed = True
+        raise
+    finally:
+        if not failed:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SET SESSION innodb_lock_wait_timeout = {}'.format(
+                        int(previous)
+                    )
+                )
+
+
+def lock(queryset, fields=(), nowait=False, timeout=None):
+    """
+    Locks the rows of queryset (SELECT ... FOR UPDATE) until the end of the
+    current transaction. Rows are locked in pk order, so concurrent callers
+    don't deadlock. Returns a list of (pk, *fields) tuples of the locked rows.
+    """
+    using = queryset.db
+    with lock_timeout(timeout, using=using):
+        return list(
+            queryset
+            .select_for_update(nowait=nowait)
+            .order_by('pk')
+            .values_list('pk', *fields)
+        )
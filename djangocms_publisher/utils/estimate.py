@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from collections import namedtuple
+
+from django.db import connections, router
+from django.db.models import CASCADE, F, IntegerField, TextField, Value
+from django.db.models.deletion import get_candidate_relations_to_delete
+from django.db.models.functions import Cast, Coalesce, Length
+from django.utils.encoding import force_text
+
+from .relations import get_relations_plan, get_value_map
+
+PAYLOAD_ALIAS = 'publisher_payload'
+
+
+class RelationEstimate(namedtuple('RelationEstimate', [
+    'model',
+    'field_name',
+    'rows',
+    'exclude',
+])):
+    """
+    rows of model point to the draft with field_name and would be switched
+    over to the published version. exclude describes the
+    update_relations_exclude() rules for the field: None, 'all' or a list of
+    the excluded Q objects.
+    """
+    __slots__ = ()
+
+
+class DeletionEstimate(namedtuple('DeletionEstimate', [
+    'model',
+    'field_name',
+    'rows',
+])):
+    """
+    rows of model would be deleted together with the draft (on_delete=CASCADE
+    of field_name, directly or through other deleted rows).
+    """
+    __slots__ = ()
+
+
+class PublishEstimate(namedtuple('PublishEstimate', [
+    'relations',
+    'deletions',
+    'payload',
+])):
+    """
+    What publishing a draft would do. payload is the size (in characters) of
+    the fields that would be copied to the published version.
+    """
+    __slots__ = ()
+
+    @property
+    def rows(self):
+        # The total number of rows that would be written or deleted.
+        return (
+            sum(estimate.rows for estimate in self.relations) +
+            sum(estimate.rows for estimate in self.deletions)
+        )
+
+
+def describe_exclude(model, field_name, exclude):
+    q_list = exclude.get(model, {}).get(field_name)
+    if q_list is None:
+        return None
+    if q_list is True:
+        return 'all'
+    return [force_text(q) for q in q_list]
+
+
+def aggregate(querysets, using):
+    """
+    Runs the list of (function, queryset) in a single query (UNION ALL) and
+    returns the results in the same order. function is 'COUNT' (the number
+    of rows of queryset) or 'SUM' (the sum of the PAYLOAD_ALIAS column of
+    queryset).
+    """
+    if not querysets:
+        return []
+    qn = connections[using].ops.quote_name
+    parts = []
+    params = []
+    for index, (function, queryset) in enumerate(querysets):
+        sql, query_params = (
+            queryset.using(using).order_by()
+            .query.get_compiler(using=using).as_sql()
+        )
+        alias = qn('publisher_estimate_{}'.format(index))
+        if function == 'COUNT':
+            expression = 'COUNT(*)'
+        else:
+            expression = 'SUM({}.{})'.format(alias, qn(PAYLOAD_ALIAS))
+        parts.append('SELECT {}, {} FROM ({}) {}'.format(
+            index,
+            expression,
+            sql,
+            alias,
+        ))
+        params.extend(query_params)
+    with connections[using].cursor() as cursor:
+        cursor.execute(' UNION ALL '.join(parts), params)
+        results = dict(cursor.fetchall())
+    return [int(results.get(index) or 0) for index in range(len(querysets))]
+
+
+def exclude_rows(queryset, querysets):
+    for other in querysets:
+        queryset = queryset.exclude(pk__in=other.values('pk'))
+    return queryset
+
+
+def get_cascades(model, queryset, rewritten, seen):
+    """
+    Yields (model, field_name, queryset) of the rows that are deleted
+    together with the rows of queryset (of model). Rows in rewritten (lists
+    of querysets keyed by field) point elsewhere by then and are left out.
+    """
+    for related in get_candidate_relations_to_delete(model._meta):
+        field = related.field
+        if field.remote_field.on_delete is not CASCADE:
+            continue
+        related_model = related.related_model
+        related_queryset = related_model._base_manager.filter(
+            **{'{}__in'.format(field.name): queryset.values('pk')}
+        )
+        related_queryset = exclude_rows(related_queryset, rewritten.get(field, []))
+        yield related_model, field.name, related_queryset
+        if related_model not in seen:
+            for cascade in get_cascades(
+                related_model,
+                related_queryset,
+                rewritten={},
+                seen=seen | {related_model},
+            ):
+                yield cascade
+
+
+def get_payload_queryset(obj, copy_fields):
+    # The size of the copied fields of obj as PAYLOAD_ALIAS.
+    size = Value(0)
+    for field in copy_fields:
+        size = size + Coalesce(
+            Length(Cast(F(field.attname), TextField())),
+            Value(0),
+        )
+    return (
+        obj._meta.model._base_manager
+        .filter(pk=obj.pk)
+        .annotate(**{PAYLOAD_ALIAS: Cast(size, IntegerField())})
+        .values(PAYLOAD_ALIAS)
+    )
+
+
+def estimate_publish(draft, copy_fields, exclude, update_relations=True, delete=True, using=None):
+    """
+    Returns a PublishEstimate for publishing draft (see
+    Publisher.estimate_publish()). Everything is counted in a single query
+    on the database using (default: where publishing would write to).
+    exclude is the update_relations_exclude() of the draft as a dict (see
+    relations.ignore_stuff_to_dict()).
+    """
+    model = draft._meta.model
+    using = using or router.db_for_write(model, instance=draft)
+    querysets = [('SUM', get_payload_queryset(draft, copy_fields))]
+    rewrites = []
+    rewritten = {}
+    if update_relations:
+        for rewrite in get_relations_plan(model).rewrites:
+            # Only the old value matters for counting the rows.
+            queryset = rewrite.get_queryset(
+                value_map=get_value_map({draft: draft}, rewrite.field),
+                exclude=exclude,
+            )
+            rewrites.append((rewrite, queryset is not None))
+            if queryset is not None:
+                # Rows of auto created ManyToMany through models are rewritten
+                # for the ForeignKey and for the ManyToMany. The second
+                # rewrite only finds the rows the first one left.
+                queryset = exclude_rows(queryset, rewritten.get(rewrite.field, []))
+                rewritten.setdefault(rewrite.field, []).append(queryset)
+                querysets.append(('COUNT', queryset))
+    cascades = []
+    if delete:
+        cascades = list(get_cascades(
+            model,
+            model._base_manager.filter(pk=draft.pk),
+            rewritten=rewritten,
+            seen={model},
+        ))
+        querysets.extend(
+            ('COUNT', queryset) for cascade_model, field_name, queryset in cascades
+        )
+    results = iter(aggregate(querysets, using=using))
+    payload = next(results)
+    relations = [
+        RelationEstimate(
+            model=rewrite.model,
+            field_name=rewrite.field_name,
+            rows=next(results) if counted else 0,
+            exclude=describe_exclude(rewrite.model, rewrite.field_name, exclude),
+        )
+        for rewrite, counted in rewrites
+    ]
+    deletions = [
+        DeletionEstimate(model=cascade_model, field_name=field_name, rows=next(results))
+        for cascade_model, field_name, queryset in cascades
+    ]
+    return PublishEstimate(
+        relations=relations,
+        deletions=deletions,
+        payload=payload,
+    )
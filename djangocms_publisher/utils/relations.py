@@ -2,49 +2,352 @@
 from __future__ import unicode_literals
 
 import itertools
+from collections import namedtuple
 
+from django.db import connections, router
+from django.db.models import Case, Value, When, signals
+from django.db.models.deletion import get_candidate_relations_to_delete
+from django.utils.encoding import force_text
+
+from .. import identity
 from .compat import PARLER_IS_INSTALLED
+from .copying import get_copy_plan
 
 
-def get_related_objects(obj, excludes=None, using='default'):
+def get_related_objects(obj, excludes=None, using=None):
     """
     Given a model instance will find all fields that have a ForeignKey,
     OneToOne or ManyToMany relationship to it.
-    Returns a generator that yields all related model instances.
+    Returns a generator that yields all related model instances (from the
+    database using, or wherever the routers send the reads).
     """
     querysets = []
     for related_field in get_related_fields(obj._meta.model):
         querysets.append(
-            related_field.field.model.objects.filter(
-                **{related_field.field.name: obj}
-            )
+            related_field.field.model.objects
+            .using(using)
+            .filter(**{related_field.field.name: obj})
         )
     return itertools.chain(*[queryset.iterator() for queryset in querysets])
 
 
-def update_one_to_many_relation(old_obj, new_obj, field, exclude):
-    # A ForeignKey pointing to this model.
-    if PARLER_IS_INSTALLED:
-        from parler.models import TranslatableModelMixin
-        # Don't update the relationship from the transated model to the master.
-        if (
-            field.field.name == 'master' and
-            issubclass(field.model, TranslatableModelMixin) and
-            field.model._parler_meta.root_model == field.field.model
-        ):
+def get_value_map(objs, field):
+    # Maps the values field (pointing to the publisher model) has for the old
+    # objects to the ones for the new objects. These are the pks, unless the
+    # field has a to_field.
+    attname = field.target_field.attname
+    return {
+        getattr(old_obj, attname): getattr(new_obj, attname)
+        for old_obj, new_obj in objs.items()
+    }
+
+
+class ForeignKeyRewrite(namedtuple('ForeignKeyRewrite', ['model', 'field_name', 'field'])):
+    """
+    A ForeignKey or OneToOne on model pointing to the publisher model.
+    """
+    __slots__ = ()
+
+    def get_queryset(self, value_map, exclude, using=None):
+        # The rows that are rewritten (None if the field is excluded).
+        # value_map maps old to new values of the field (see
+        # get_value_map()).
+        queryset = self.model.objects.using(using).filter(
+            **{'{}__in'.format(self.field_name): list(value_map)}
+        )
+        return apply_exclude(queryset, self.model, self.field_name, exclude)
+
+    def execute(self, objs, exclude, using=None):
+        value_map = get_value_map(objs, self.field)
+        queryset = self.get_queryset(value_map=value_map, exclude=exclude, using=using)
+        if queryset is None:
             return 0
-    model = field.field.model
-    field_name = field.field.name
-    queryset = model.objects.filter(**{field_name: old_obj})
-    if model in exclude and field_name in exclude[model]:
-        q_list = exclude[model][field_name]
-        if q_list is True:
-            # Ignore the whole field
+        return queryset.update(**{
+            self.field_name: get_value_map_expression(
+                value_map,
+                self.field_name,
+                self.field,
+            ),
+        })
+
+
+class ManyToManyRewrite(namedtuple('ManyToManyRewrite', [
+    'model',
+    'field_name',
+    'from_field_name',
+    'to_field_name',
+    'to_field',
+    'is_self',
+])):
+    """
+    A ManyToMany pointing to the publisher model. model is the through model.
+    """
+    __slots__ = ()
+
+    @property
+    def field(self):
+        # The ForeignKey of the through model that is rewritten.
+        return self.to_field
+
+    def get_queryset(self, value_map, exclude, using=None):
+        # The rows that are rewritten (None if the field is excluded).
+        # value_map maps old to new values of to_field (see
+        # get_value_map()).
+        queryset = apply_exclude(
+            self.model.objects.using(using),
+            self.model,
+            self.field_name,
+            exclude,
+        )
+        if queryset is None:
+            return None
+        if self.is_self:
+            # This is a ManyToMany to itself. We should exclude our selves as
+            # the source.
+            queryset = queryset.exclude(**{
+                '{}__in'.format(self.from_field_name): (
+                    set(value_map) | set(value_map.values())
+                ),
+            })
+        return queryset.filter(
+            **{'{}__in'.format(self.to_field_name): list(value_map)}
+        )
+
+    def execute(self, objs, exclude, using=None):
+        value_map = get_value_map(objs, self.to_field)
+        queryset = self.get_queryset(value_map=value_map, exclude=exclude, using=using)
+        if queryset is None:
             return 0
-        for q in q_list:
-            queryset = queryset.exclude(q)
-    count = queryset.update(**{field_name: new_obj})
-    return count
+        return queryset.update(**{
+            self.to_field_name: get_value_map_expression(
+                value_map,
+                self.to_field_name,
+                self.to_field,
+            ),
+        })
+
+
+class RelationsPlan(namedtuple('RelationsPlan', [
+    'model',
+    'rewrites',
+    'references',
+    'can_fast_delete',
+])):
+    """
+    All the relations that must be switched over from a draft to its
+    published version (and the other way around) for a publisher model.
+    references are the (model, field) of all the relations pointing to the
+    model (that the deletion Collector would follow). can_fast_delete tells
+    whether rows of the model can be deleted without the Collector once
+    nothing references them anymore (see fast_delete()).
+    """
+    __slots__ = ()
+
+    def execute(self, objs, exclude, using=None):
+        # objs maps old objects to new objects.
+        count = 0
+        for rewrite in self.rewrites:
+            count += rewrite.execute(objs=objs, exclude=exclude, using=using)
+        return count
+
+    def is_referenced(self, pks, using):
+        """
+        Returns whether any row still points to one of pks. All relations are
+        checked with a single query (EXISTS).
+        """
+        if not self.references:
+            return False
+        connection = connections[using]
+        parts = []
+        params = []
+        for model, field in self.references:
+            values = pks
+            if not field.target_field.primary_key:
+                # A ForeignKey with to_field points to another column.
+                values = (
+                    field.target_field.model._base_manager.using(using)
+                    .filter(pk__in=pks)
+                    .values(field.target_field.attname)
+                )
+            sql, query_params = (
+                model._base_manager.using(using)
+                .filter(**{'{}__in'.format(field.attname): values})
+                .values('pk')
+                .query.get_compiler(using=using).as_sql()
+            )
+            parts.append('EXISTS ({})'.format(sql))
+            params.extend(query_params)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT CASE WHEN {} THEN 1 ELSE 0 END'.format(' OR '.join(parts)),
+                params,
+            )
+            return bool(cursor.fetchone()[0])
+
+
+def is_parler_master_relation(field):
+    # The relationship from the translated model to the master.
+    if not PARLER_IS_INSTALLED:
+        return False
+    from parler.models import TranslatableModelMixin
+    return (
+        field.field.name == 'master' and
+        issubclass(field.model, TranslatableModelMixin) and
+        field.model._parler_meta.root_model == field.field.model
+    )
+
+
+def get_relation_rewrite(field):
+    if field.one_to_many or field.one_to_one:
+        # A ForeignKey or OneToOne pointing to this model.
+        if is_parler_master_relation(field):
+            # Don't update the relationship from the transated model to the
+            # master.
+            return None
+        return ForeignKeyRewrite(
+            model=field.field.model,
+            field_name=field.field.name,
+            field=field.field,
+        )
+    elif field.many_to_many:
+        # A ManyToMany pointing to this model.
+        through = field.through
+        to_field_name = field.field.m2m_reverse_field_name()
+        return ManyToManyRewrite(
+            model=through,
+            field_name=field.field.name,
+            from_field_name=field.field.m2m_field_name(),
+            to_field_name=to_field_name,
+            to_field=through._meta.get_field(to_field_name),
+            is_self=field.model == field.field.model,
+        )
+    return None
+
+
+def compile_relations_plan(model):
+    rewrites = []
+    for field in get_related_fields(model):
+        rewrite = get_relation_rewrite(field)
+        if rewrite is not None:
+            rewrites.append(rewrite)
+    opts = model._meta
+    return RelationsPlan(
+        model=model,
+        rewrites=tuple(rewrites),
+        references=tuple(
+            (related.related_model, related.field)
+            for related in get_candidate_relations_to_delete(opts)
+        ),
+        # The Collector is needed for multi-table inheritance (parents) and
+        # generic relations (private fields).
+        can_fast_delete=not opts.parents and not opts.private_fields,
+    )
+
+
+_relations_plans = {}
+
+
+def build_relations_plans(models):
+    # Called on startup (PublisherConfig.ready()).
+    for model in models:
+        _relations_plans[model] = compile_relations_plan(model)
+
+
+def get_relations_plan(model):
+    try:
+        return _relations_plans[model]
+    except KeyError:
+        # Not registered on startup (e.g a model that is not a publisher
+        # model). Compile it now and keep it around.
+        plan = _relations_plans[model] = compile_relations_plan(model)
+        return plan
+
+
+def get_copied_relations_data(obj, exclude, using=None):
+    """
+    Describes the content of the relations that are copied together with obj
+    (by publisher_copy_relations()) instead of being switched over to the
+    other version, as a list of json serializable values:
+     - the rows of the ForeignKeys of the relations plan that exclude leaves
+       out completely (see ignore_stuff_to_dict()), without their pks
+     - the pks of the targets of the ManyToManyFields of obj
+    Makes one query per relation.
+    """
+    model = obj._meta.model
+    data = []
+    for rewrite in get_relations_plan(model).rewrites:
+        if (
+            not isinstance(rewrite, ForeignKeyRewrite) or
+            rewrite.model._meta.auto_created or
+            exclude.get(rewrite.model, {}).get(rewrite.field_name) is not True
+        ):
+            # Switched over, or the through table of a ManyToManyField.
+            continue
+        attnames = [
+            field.attname
+            for field in get_copy_plan(rewrite.model, exclude_fields=(rewrite.field_name,))
+        ]
+        rows = (
+            rewrite.model._base_manager.using(using)
+            .filter(**{
+                rewrite.field.attname: getattr(obj, rewrite.field.target_field.attname),
+            })
+            .order_by(*attnames)
+            .values_list(*attnames)
+        )
+        data.append([rewrite.model._meta.label, rewrite.field_name, [list(row) for row in rows]])
+    for field in model._meta.many_to_many:
+        if not field.concrete:
+            continue
+        data.append([
+            field.name,
+            list(
+                getattr(obj, field.name).using(using)
+                .order_by('pk')
+                .values_list('pk', flat=True)
+            ),
+        ])
+    return data
+
+
+def fast_delete(model, pks, using=None):
+    """
+    Deletes the rows of model with pks with a single DELETE instead of going
+    through django's deletion Collector. Only possible if nothing points to
+    them anymore (e.g a draft after publishing), there are no pre_delete or
+    post_delete receivers and the model has no parents or generic relations.
+    Returns False (without deleting anything) if the Collector is needed.
+    """
+    using = using or router.db_for_write(model)
+    plan = get_relations_plan(model)
+    if (
+        not plan.can_fast_delete or
+        signals.pre_delete.has_listeners(model) or
+        signals.post_delete.has_listeners(model) or
+        plan.is_referenced(pks, using=using)
+    ):
+        return False
+    model._base_manager.using(using).filter(pk__in=pks)._raw_delete(using)
+    identity.invalidate()
+    return True
+
+
+def delete_object(obj, using=None):
+    # obj.delete(), with fast_delete() if possible.
+    model = obj._meta.model
+    using = using or router.db_for_write(model, instance=obj)
+    if fast_delete(model, [obj.pk], using=using):
+        setattr(obj, model._meta.pk.attname, None)
+    else:
+        obj.delete(using=using)
+
+
+def update_one_to_many_relation(old_obj, new_obj, field, exclude):
+    # A ForeignKey pointing to this model.
+    rewrite = get_relation_rewrite(field)
+    if rewrite is None:
+        return 0
+    return rewrite.execute(objs={old_obj: new_obj}, exclude=exclude)
 
 
 def update_one_to_one_relation(old_obj, new_obj, field, exclude):
@@ -54,35 +357,36 @@ def update_one_to_one_relation(old_obj, new_obj, field, exclude):
 
 def update_many_to_many_relation(old_obj, new_obj, field, exclude):
     # A ManyToMany pointing to this model.
-    model = field.through
-    field_name = field.field.name
-    queryset = model.objects.all()
+    return update_one_to_many_relation(old_obj=old_obj, new_obj=new_obj, field=field, exclude=exclude)
+
+
+def apply_exclude(queryset, model, field_name, exclude):
+    # Returns None if the whole field should be ignored.
     if model in exclude and field_name in exclude[model]:
         q_list = exclude[model][field_name]
         if q_list is True:
             # Ignore the whole field
-            return 0
+            return None
         for q in q_list:
             queryset = queryset.exclude(q)
+    return queryset
 
-    queryset = model.objects
-    from_field_name = field.field.m2m_field_name()
-    to_field_name = field.field.m2m_reverse_field_name()
-    if field.model == field.field.model:
-        # This is a ManyToMany to itself. We should exclude our selves as the
-        # source.
-        queryset = queryset.exclude(
-            **{'{}__in'.format(from_field_name): [old_obj, new_obj]}
-        )
-    count = (
-        queryset
-        .filter(**{to_field_name: old_obj})
-        .update(**{to_field_name: new_obj})
+
+def get_value_map_expression(value_map, field_name, field):
+    # The new value for field_name for rows pointing to any of the old
+    # values.
+    if len(value_map) == 1:
+        return list(value_map.values())[0]
+    return Case(
+        *[
+            When(**{field_name: old_value, 'then': Value(new_value)})
+            for old_value, new_value in value_map.items()
+        ],
+        output_field=field
     )
-    return count
 
 
-def update_relations(old_obj, new_obj, exclude=None):
+def update_relations(old_obj, new_obj, exclude=None, using=None):
     """
     Given an obj and a new_obj (must be the same model) will change all
     relationships pointing to obj to point to new_obj.
@@ -106,24 +410,27 @@ def update_relations(old_obj, new_obj, exclude=None):
     # not matter. It would only be a problem if we'd have a draft that points to
     # itself as live.
     assert old_obj.__class__ == new_obj.__class__
-    exclude = exclude or {}
-    count = 0
-    for field in get_related_fields(old_obj._meta.model):
-        kwargs = dict(
-            old_obj=old_obj,
-            new_obj=new_obj,
-            field=field,
-            exclude=exclude,
-        )
-        if field.one_to_many:
-            # A ForeignKey pointing to this model.
-            count += update_one_to_many_relation(**kwargs)
-        elif field.one_to_one:
-            count += update_one_to_one_relation(**kwargs)
-        elif field.many_to_many:
-            # A ManyToMany pointing to this model.
-            count += update_many_to_many_relation(**kwargs)
-    return count
+    return update_relations_bulk({old_obj: new_obj}, exclude=exclude, using=using)
+
+
+def update_relations_bulk(objs, exclude=None, using=None):
+    """
+    Same as update_relations, but for many objects at once. objs is a
+    mapping of old objects to new objects (all of the same model).
+    Each relation pointing to the model is rewritten with a single UPDATE,
+    no matter how many objects there are. The UPDATEs run on the database
+    using (default: where the routers send the writes).
+    """
+    if not objs:
+        return 0
+    models = {obj.__class__ for pair in objs.items() for obj in pair}
+    assert len(models) == 1
+    model = models.pop()
+    return get_relations_plan(model).execute(
+        objs=objs,
+        exclude=exclude or {},
+        using=using,
+    )
 
 
 def get_related_fields(model):
@@ -154,3 +461,19 @@ def ignore_stuff_to_dict(ignore):
             excludes = fields.setdefault(field_name, [])
             excludes.append(excludes_q)
     return stuff
+
+
+def ignore_stuff_key(ignore):
+    # A hashable representation of the rows passed to ignore_stuff_to_dict.
+    # Used to group objects that share the same excludes.
+    key = []
+    for row in ignore:
+        if len(row) == 2:
+            model, field_name = row
+            excludes_q = True
+        elif len(row) == 3:
+            model, field_name, excludes_q = row
+        if excludes_q is not True:
+            excludes_q = force_text(excludes_q)
+        key.append((model, field_name, excludes_q))
+    return tuple(key)
@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import logging
+import threading
+from datetime import timedelta
+
+from django.apps import apps
+from django.db import connections, router, transaction
+from django.db.models import CASCADE, Q
+from django.db.models.deletion import get_candidate_relations_to_delete
+from django.utils import timezone
+
+from ..conf import get_setting
+from . import relations
+
+logger = logging.getLogger(__name__)
+
+
+def get_publisher_models(labels=None):
+    # All publisher models or the ones with the given "app_label.ModelName".
+    from ..models import PublisherModelMixin
+
+    if labels:
+        return [apps.get_model(label) for label in labels]
+    return [
+        model for model in apps.get_models()
+        if issubclass(model, PublisherModelMixin)
+    ]
+
+
+def claim(queryset, batch_size):
+    """
+    Locks up to batch_size rows of queryset and returns their pks. Rows that
+    are locked by another worker are skipped (SELECT ... FOR UPDATE SKIP
+    LOCKED) where the database supports it. Must be called in a transaction.
+    """
+    features = connections[queryset.db].features
+    return list(
+        queryset
+        .select_for_update(
+            skip_locked=features.has_select_for_update_skip_locked,
+        )
+        .order_by('pk')
+        .values_list('pk', flat=True)[:batch_size]
+    )
+
+
+def process_batch(queryset, action, field_name, batch_size, failed):
+    """
+    Claims a batch of queryset and calls action with a queryset of the
+    claimed rows. If that fails, the rows are processed one by one and the
+    pks of the rows that fail are added to failed (and not claimed again).
+    field_name (the schedule field) is cleared on the claimed rows that still
+    exist afterwards, so they are never processed twice.
+    Returns the number of claimed rows.
+    """
+    model = queryset.model
+    using = router.db_for_write(model)
+    with transaction.atomic(using=using):
+        pks = claim(
+            queryset.using(using).exclude(pk__in=failed),
+            batch_size=batch_size,
+        )
+        if not pks:
+            return 0
+        try:
+            with transaction.atomic(using=using):
+                action(model.objects.using(using).filter(pk__in=pks))
+        except Exception:
+            # Find the rows that can't be processed, so the others still go
+            # through.
+            for pk in pks:
+                try:
+                    with transaction.atomic(using=using):
+                        action(model.objects.using(using).filter(pk=pk))
+                except Exception:
+                    logger.exception(
+                        'Scheduled publishing failed for %s %s',
+                        model._meta.label,
+                        pk,
+                    )
+                    failed.add(pk)
+        (
+            model._base_manager
+            .using(using)
+            .filter(pk__in=set(pks) - failed)
+            .update(**{field_name: None})
+        )
+    return len(pks)
+
+
+def process_due(models, batch_size, failed=None, now=None):
+    """
+    Publishes all drafts of models that are due to be published
+    (publisher_publish_at) and unpublishes all published versions that are
+    due to be unpublished (publisher_unpublish_at), batch_size at a time.
+    Models without PublisherScheduleModelMixin are skipped.
+    Returns the number of processed objects.
+    """
+    from ..publisher import has_schedule
+
+    now = now or timezone.now()
+    if failed is None:
+        failed = {}
+    count = 0
+    for model in models:
+        if not has_schedule(model):
+            continue
+        tasks = (
+            (
+                model._base_manager.filter(
+                    publisher_is_published_version=False,
+                    publisher_publish_at__lte=now,
+                ),
+                lambda queryset: queryset.publisher_publish(now=now),
+                'publisher_publish_at',
+            ),
+            (
+                model._base_manager.filter(
+                    publisher_is_published_version=True,
+                    publisher_unpublish_at__lte=now,
+                ),
+                lambda queryset: queryset.publisher_unpublish(),
+                'publisher_unpublish_at',
+            ),
+        )
+        for queryset, action, field_name in tasks:
+            while True:
+                processed = process_batch(
+                    queryset,
+                    action=action,
+                    field_name=field_name,
+                    batch_size=batch_size,
+                    failed=failed.setdefault(model, set()),
+                )
+                if not processed:
+                    break
+                count += processed
+    return count
+
+
+def process_jobs(batch_size, models=None):
+    """
+    Runs all pending PublisherJobs (e.g. publishing requested in the admin),
+    batch_size at a time. With models, only the jobs for objects of these
+    models are run. Returns the number of jobs that were run.
+    """
+    from django.contrib.contenttypes.models import ContentType
+    from ..models import PublisherJob
+
+    jobs_queryset = PublisherJob.objects.all()
+    if models is not None:
+        jobs_queryset = jobs_queryset.filter(
+            content_type__in=(
+                ContentType.objects.get_for_models(*models).values()
+            ),
+        )
+    count = 0
+    while True:
+        jobs = jobs_queryset.claim(batch_size)
+        if not jobs:
+            break
+        for job in jobs:
+            job.run()
+        count += len(jobs)
+    return count
+
+
+def purge(obj, chunk_size):
+    """
+    Deletes a soft deleted obj. The rows that would cascade are deleted
+    first, chunk_size at a time and in a transaction per chunk, so no
+    transaction holds a lot of locks for long. Then obj itself is deleted.
+    Every transaction claims the row of obj first. If another worker holds
+    it (or it is gone already), the purge is left to that worker.
+    Returns whether obj was deleted.
+    """
+    model = obj._meta.model
+    using = router.db_for_write(model)
+    obj_queryset = model._base_manager.using(using).filter(
+        pk=obj.pk,
+        publisher_deleted_at__isnull=False,
+    )
+    for related in get_candidate_relations_to_delete(model._meta):
+        if related.field.remote_field.on_delete is not CASCADE:
+            continue
+        related_manager = related.related_model._base_manager.using(using)
+        # Filtered by obj, not its pk: the ForeignKey can have a to_field.
+        queryset = related_manager.filter(**{related.field.name: obj})
+        while True:
+            with transaction.atomic(using=using):
+                if not claim(obj_queryset, batch_size=1):
+                    return False
+                pks = list(
+                    queryset.order_by('pk').values_list('pk', flat=True)[:chunk_size]
+                )
+                if not pks:
+                    break
+                related_manager.filter(pk__in=pks).delete()
+    with transaction.atomic(using=using):
+        if not claim(obj_queryset, batch_size=1):
+            return False
+        relations.delete_object(obj, using=using)
+    return True
+
+
+def purge_deleted(models, batch_size, chunk_size, now=None):
+    """
+    Purges up to batch_size soft deleted objects (publisher_deleted_at) of
+    each of models. Models without PublisherSoftDeleteModelMixin are
+    skipped. The claimed objects are marked (publisher_purge_started_at)
+    before they are purged, so other workers skip them for the whole purge
+    (or until PUBLISHER_JOB_TIMEOUT has passed, if this worker dies).
+    Returns the number of purged objects.
+    """
+    from ..publisher import has_soft_delete
+
+    now = now or timezone.now()
+    timeout = timedelta(seconds=get_setting('JOB_TIMEOUT'))
+    count = 0
+    for model in models:
+        if not has_soft_delete(model):
+            continue
+        using = router.db_for_write(model)
+        queryset = model._base_manager.using(using).filter(
+            publisher_deleted_at__isnull=False,
+        )
+        with transaction.atomic(using=using):
+            pks = claim(
+                queryset.filter(
+                    Q(publisher_purge_started_at__isnull=True) |
+                    Q(publisher_purge_started_at__lt=now - timeout)
+                ),
+                batch_size=batch_size,
+            )
+            queryset.filter(pk__in=pks).update(publisher_purge_started_at=now)
+        for obj in queryset.filter(pk__in=pks):
+            try:
+                purged = purge(obj, chunk_size=chunk_size)
+            except Exception:
+                logger.exception(
+                    'Purging failed for %s %s',
+                    model._meta.label,
+                    obj.pk,
+                )
+            else:
+                count += int(purged)
+    return count
+
+
+def run_workers(models, batch_size, concurrency=1, now=None):
+    """
+    Runs purge_deleted(), process_jobs() and process_due() in concurrency
+    threads. The threads compete for the same rows, SKIP LOCKED keeps them
+    from blocking each other.
+    Returns the number of purged objects and processed jobs and objects.
+    """
+    now = now or timezone.now()
+    failed = {}
+
+    def process():
+        return (
+            purge_deleted(
+                models,
+                batch_size=batch_size,
+                chunk_size=get_setting('PURGE_CHUNK_SIZE'),
+            ) +
+            process_jobs(batch_size, models=models) +
+            process_due(models, batch_size, failed=failed, now=now)
+        )
+
+    if concurrency <= 1:
+        return process()
+
+    counts = []
+
+    def work():
+        try:
+            counts.append(process())
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=work) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts)